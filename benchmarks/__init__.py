@@ -0,0 +1,4 @@
+"""Benchmarks of the PyArlo hot paths.
+
+Run with ``python -m benchmarks.run``. See benchmarks/run.py for options.
+"""
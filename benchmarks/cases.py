@@ -0,0 +1,233 @@
+"""Benchmark cases of the PyArlo hot paths.
+
+Every case is a function building its fixtures offline and returning the
+callable to time. Cases are registered with @case in run order.
+"""
+import base64
+import copy
+import struct
+import time
+import zlib
+
+import requests_mock
+
+from pyarlo.const import LOGIN_ENDPOINT
+from tests.common import load_fixture, load_fixture_json
+
+CASES = []
+
+
+def case(name, number=1):
+    """Register a benchmark case.
+
+    :param name: Name of the case in the results and baseline
+    :param number: Calls of the returned callable per timing
+    """
+    def decorator(func):
+        CASES.append((name, number, func))
+        return func
+    return decorator
+
+
+def make_devices(cameras):
+    """Return the devices endpoint data with the given number of cameras."""
+    devices = load_fixture_json('pyarlo_devices.json')['data']
+    template = [dev for dev in devices if dev['deviceType'] == 'camera'][0]
+    base = [dev for dev in devices if dev['deviceType'] == 'basestation']
+    data = []
+    for i in range(cameras):
+        camera = copy.deepcopy(template)
+        camera['deviceId'] = '48B14C{0:07d}'.format(i)
+        camera['deviceName'] = 'Camera {0}'.format(i)
+        data.append(camera)
+    return data + base
+
+
+def make_videos(count, devices):
+    """Return the library endpoint data with count videos."""
+    template = load_fixture_json('pyarlo_videos.json')['data'][0]
+    cameras = [dev['deviceId'] for dev in devices
+               if dev['deviceType'] == 'camera']
+    now = int(time.time() * 1000)
+    videos = []
+    for i in range(count):
+        video = dict(template)
+        video['name'] = str(now - i * 1000)
+        video['localCreatedDate'] = now - i * 1000
+        video['deviceId'] = cameras[i % len(cameras)]
+        videos.append(video)
+    return videos
+
+
+def make_camera_properties(devices):
+    """Return the cameras resource matching the camera devices."""
+    template = load_fixture_json(
+        'pyarlo_camera_properties.json')['properties'][0]
+    properties = []
+    for device in devices:
+        if device['deviceType'] == 'camera':
+            prop = copy.deepcopy(template)
+            prop['serialNumber'] = device['deviceId']
+            properties.append(prop)
+    return properties
+
+
+def make_sensor_history(points):
+    """Return an ambient sensor history payload with the given points."""
+    data = b''
+    started = int(time.time()) - points * 60
+    for i in range(points):
+        data += struct.pack('>I4xH4xH4xH', started + i * 60,
+                            200 + i % 50, 450 + i % 30, 10 + i % 5)
+    payload = base64.b64encode(zlib.compress(data)).decode()
+    return {'payload': [payload[i:i + 1024]
+                        for i in range(0, len(payload), 1024)]}
+
+
+def make_session(devices, videos=None):
+    """Return a PyArlo session answering queries from memory."""
+    from pyarlo import PyArlo
+
+    with requests_mock.Mocker() as mock:
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+        arlo = PyArlo('foo', 'bar', preload=False, metrics=False)
+
+    responses = {
+        'devices': {'data': devices, 'success': True},
+        'library': {'data': videos or [], 'success': True}}
+
+    def query(url, **kwargs):
+        """Return the in-memory response of url."""
+        return responses['library' if 'library' in url else 'devices']
+
+    arlo.query = query
+    return arlo
+
+
+@case('devices_100_cameras', number=100)
+def devices_construction():
+    """PyArlo.devices building cameras and base stations."""
+    arlo = make_session(make_devices(100))
+
+    def run():
+        arlo._all_devices = {}
+        arlo._devices_cache = None
+        return arlo.devices
+    return run
+
+
+def library_load(count, cameras=20):
+    """ArloMediaLibrary.load() on count videos of the given cameras."""
+    devices = make_devices(cameras)
+    arlo = make_session(devices, make_videos(count, devices))
+    arlo.devices
+
+    def run():
+        return arlo.ArloMediaLibrary.load()
+    return run
+
+
+@case('library_load_1k', number=20)
+def library_load_1k():
+    """ArloMediaLibrary.load() on 1k videos."""
+    return library_load(1000)
+
+
+@case('library_load_10k', number=2)
+def library_load_10k():
+    """ArloMediaLibrary.load() on 10k videos."""
+    return library_load(10000)
+
+
+@case('library_load_100k')
+def library_load_100k():
+    """ArloMediaLibrary.load() on 100k videos."""
+    return library_load(100000)
+
+
+@case('library_load_50k_100_cameras')
+def library_load_50k_100_cameras():
+    """ArloMediaLibrary.load() on 50k videos of 100 cameras."""
+    return library_load(50000, cameras=100)
+
+
+@case('video_accessors_100k')
+def video_accessors():
+    """ArloVideo property accessors on 100k videos."""
+    devices = make_devices(20)
+    arlo = make_session(devices, make_videos(100000, devices))
+    arlo.devices
+    videos = arlo.ArloMediaLibrary.load()
+
+    def run():
+        for video in videos:
+            video.id
+            video.created_at
+            video.created_today
+            video.datetime
+            video.triggered_by
+            video.video_url
+    return run
+
+
+@case('decode_sensor_data_10k', number=2)
+def decode_sensor_data():
+    """ArloBaseStation._decode_sensor_data() on 10k history points."""
+    from pyarlo.base_station import ArloBaseStation
+
+    properties = make_sensor_history(10000)
+
+    def run():
+        return ArloBaseStation._decode_sensor_data(properties)
+    return run
+
+
+@case('event_matching_1k_pending', number=2000)
+def event_matching():
+    """publish_and_get_event() getting its event with 1k others pending."""
+    arlo = make_session(make_devices(2))
+    base = arlo.base_stations[0]
+
+    def publish(**kwargs):
+        """Answer a get with its event like the stream thread does."""
+        base._receive_event({'action': 'is', 'resource': kwargs['resource'],
+                             'transId': kwargs['trans_id']})
+        return 'success'
+
+    base.publish = publish
+    for i in range(1000):
+        base._receive_event({'action': 'is',
+                             'resource': 'cameras/{0}'.format(i)})
+
+    # the stream is held by another reader
+    arlo.event_hub.acquire = lambda base_station: True
+    arlo.event_hub.release = lambda: False
+
+    def run():
+        return base.publish_and_get_event('modes')
+    return run
+
+
+@case('camera_accessors_20_cameras', number=20)
+def camera_accessors():
+    """ArloCamera property accessors on every camera."""
+    devices = make_devices(20)
+    arlo = make_session(devices)
+    arlo.base_stations[0]._camera_properties = \
+        make_camera_properties(devices)
+    cameras = arlo.cameras
+
+    def run():
+        for camera in cameras:
+            camera.device_id
+            camera.base_station
+            camera.properties
+            camera.capabilities
+            camera.battery_level
+            camera.signal_strength
+            camera.brightness
+            camera.powersave_mode
+            camera.is_camera_connected
+            camera.motion_detection_sensitivity
+    return run
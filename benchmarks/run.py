@@ -0,0 +1,143 @@
+"""Run the PyArlo benchmarks and compare them to the recorded baseline.
+
+Timings are divided by the time of a fixed pure Python calibration loop
+so a baseline recorded on one machine can be checked on another.
+
+    python -m benchmarks.run                # print the results
+    python -m benchmarks.run --check        # exit 1 on regressions
+    python -m benchmarks.run --record       # update baseline.json
+    python -m benchmarks.run -k library     # only matching cases
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+from benchmarks.cases import CASES
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# a tracked case fails --check when slower than baseline * (1 + THRESHOLD)
+# and slower by more than MIN_DELTA, 0.5% of the calibration loop, so the
+# timer noise of sub-millisecond cases never fails the check
+THRESHOLD = 0.25
+MIN_DELTA = 0.005
+REPEAT = 5
+
+
+def calibrate(repeat=REPEAT):
+    """Return seconds taken by a fixed pure Python workload."""
+    def workload():
+        data = [{'deviceId': str(i), 'value': i} for i in range(20000)]
+        return sorted((item['value'] % 97, item['deviceId'])
+                      for item in data if item['value'] % 3)
+    return timeit(workload, 1, repeat * 2)
+
+
+def timeit(func, number, repeat=REPEAT):
+    """Return the best seconds per call of func over repeat timings."""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            for _ in range(number):
+                func()
+            elapsed = (time.perf_counter() - started) / number
+        finally:
+            gc.enable()
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def run(pattern=None, repeat=REPEAT):
+    """Return {case: {'seconds', 'relative'}} of the matching cases."""
+    results = {}
+    for name, number, setup in CASES:
+        if pattern and pattern not in name:
+            continue
+        func = setup()
+        # calibrate next to every case to follow the machine load
+        unit = calibrate(repeat)
+        seconds = timeit(func, number, repeat)
+        unit = min(unit, calibrate(repeat))
+        results[name] = {'seconds': seconds, 'relative': seconds / unit}
+    return results
+
+
+def load_baseline(path=BASELINE):
+    """Return the recorded baseline or an empty one."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as baseline:
+        return json.load(baseline)
+
+
+def save_baseline(results, path=BASELINE):
+    """Record the relative timings of results as the baseline."""
+    baseline = load_baseline(path)
+    for name, result in results.items():
+        baseline[name] = result['relative']
+    with open(path, 'w') as output:
+        json.dump(baseline, output, indent=2, sort_keys=True)
+        output.write('\n')
+
+
+def compare(results, baseline, threshold=THRESHOLD, min_delta=MIN_DELTA):
+    """Return the names of the cases regressing beyond threshold.
+
+    :param min_delta: Smallest relative slowdown counted as a regression
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        expected = baseline.get(name)
+        if expected and \
+                result['relative'] > expected * (1 + threshold) and \
+                result['relative'] - expected > min_delta:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-k', dest='pattern',
+                        help='only run cases containing this text')
+    parser.add_argument('--check', action='store_true',
+                        help='exit 1 when a case regresses')
+    parser.add_argument('--record', action='store_true',
+                        help='save the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='allowed slowdown ratio (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=REPEAT,
+                        help='timings per case (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    results = run(args.pattern, args.repeat)
+    baseline = load_baseline()
+    regressions = compare(results, baseline, args.threshold)
+
+    print('{0:32} {1:>12} {2:>10} {3:>10}'.format(
+        'case', 'ms', 'relative', 'baseline'))
+    for name, result in sorted(results.items()):
+        expected = baseline.get(name)
+        print('{0:32} {1:12.3f} {2:10.3f} {3:>10} {4}'.format(
+            name, result['seconds'] * 1000, result['relative'],
+            '-' if expected is None else '{0:.4f}'.format(expected),
+            'REGRESSION' if name in regressions else ''))
+
+    if args.record:
+        save_baseline(results)
+    if args.check and regressions:
+        print('{0} case(s) slower than baseline by more than {1:.0%}'.format(
+            len(regressions), args.threshold))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
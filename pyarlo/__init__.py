@@ -1,16 +1,26 @@
 # coding: utf-8
 """Base Python Class file for Netgear Arlo camera module."""
 import logging
+import threading
+import time
 import requests
 import base64
+from requests.adapters import HTTPAdapter
 
 from pyarlo.base_station import ArloBaseStation
 from pyarlo.camera import ArloCamera
+from pyarlo.events import ArloEventBuffer, ArloEventHub
 from pyarlo.media import ArloMediaLibrary
+from pyarlo.media_index import ArloMediaIndex
+from pyarlo.metrics import ArloMetrics
+from pyarlo.retry import RetryPolicy
+from pyarlo.token_cache import ArloTokenCache
+from pyarlo.utils import rebase_url
 from pyarlo.const import (
-    API_URL, BILLING_ENDPOINT, DEVICES_ENDPOINT,
-    FRIENDS_ENDPOINT, LOGIN_ENDPOINT, PROFILE_ENDPOINT,
-    PRELOAD_DAYS, RESET_ENDPOINT)
+    API_URL, BILLING_ENDPOINT, DEVICES_ENDPOINT, DEVICES_TTL,
+    EVENT_BUFFER_SIZE, EVENT_DROP_OLDEST, FRIENDS_ENDPOINT, LOGIN_ENDPOINT,
+    PROFILE_ENDPOINT, POOL_CONNECTIONS, POOL_MAXSIZE, PRELOAD_DAYS,
+    RESET_ENDPOINT, TOKEN_EXPIRATION)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -19,30 +29,94 @@ class PyArlo(object):
     """Base object for Netgar Arlo camera."""
 
     def __init__(self, username=None, password=None,
-                 preload=True, days=PRELOAD_DAYS):
+                 preload=True, days=PRELOAD_DAYS, retry_policy=None,
+                 token_cache=None, pool_connections=POOL_CONNECTIONS,
+                 pool_maxsize=POOL_MAXSIZE, pool_block=False,
+                 keep_alive=True, devices_ttl=DEVICES_TTL, metrics=True,
+                 base_url=None, persistent_events=False,
+                 event_buffer_size=EVENT_BUFFER_SIZE,
+                 event_buffer_policy=EVENT_DROP_OLDEST, media_index=None):
         """Create a PyArlo object.
 
         :param username: Arlo user email
         :param password: Arlo user password
-        :param preload: Boolean to preload video library.
+        :param preload: Boolean to preload video library, 'lazy' to load it
+                        on first access or 'background' to load it on a
+                        thread without blocking the constructor.
         :param days: If preload, number of days to lookup.
+        :param retry_policy: <RetryPolicy> used by query(). Default policy
+                             retries idempotent queries 3 times.
+        :param token_cache: Directory or <ArloTokenCache> used to reuse
+                            the session token across restarts.
+        :param pool_connections: Number of hosts kept in the connection
+                                 pool shared by queries and media I/O.
+        :param pool_maxsize: Max connections kept open per host.
+        :param pool_block: Boolean to block instead of opening extra
+                           connections when a host pool is exhausted.
+        :param keep_alive: Boolean to reuse connections between requests.
+        :param devices_ttl: Seconds a device list is shared by refreshes.
+        :param metrics: Boolean to record request and event metrics.
+        :param base_url: Scheme and host replacing the Arlo cloud URLs,
+                         e.g. a local stand-in server for tests.
+        :param persistent_events: Boolean to keep the event stream open
+                                  between reads, see ArloEventHub.
+        :param event_buffer_size: Unclaimed events kept per base station.
+        :param event_buffer_policy: EVENT_DROP_OLDEST or EVENT_COALESCE
+                                    applied when the buffer is full.
+        :param media_index: SQLite file or <ArloMediaIndex> keeping the
+                            loaded videos across restarts.
 
         :returns PyArlo base object
         """
+        started = time.time()
         self.authenticated = None
         self.country_code = None
         self.date_created = None
         self.userid = None
         self.__token = None
-        self.__headers = None
-        self.__params = None
+        self._token_expires = None
 
         self._all_devices = {}
+        self._all_devices_lock = threading.Lock()
+        self._devices_cache = None
+        self._devices_lock = threading.Lock()
+        self.devices_ttl = devices_ttl
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.metrics = ArloMetrics(enabled=metrics)
+        self.base_url = base_url
+        self.event_hub = ArloEventHub(self, persistent=persistent_events)
+        self.event_buffer_size = event_buffer_size
+        self.event_buffer_policy = event_buffer_policy
+
+        if token_cache is not None and \
+                not isinstance(token_cache, ArloTokenCache):
+            token_cache = ArloTokenCache(token_cache)
+        if token_cache is not None and not token_cache.available:
+            _LOGGER.warning("Token cache requires the cryptography package")
+            token_cache = None
+        self._token_cache = token_cache
+
+        if media_index is not None and \
+                not isinstance(media_index, ArloMediaIndex):
+            media_index = ArloMediaIndex(media_index)
+        self.media_index = media_index
 
         # set username and password
         self.__password = password
         self.__username = username
         self.session = requests.Session()
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+
+        # one pool for the API and the presigned media URLs
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=pool_block)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
 
         # login user
         self.login()
@@ -50,7 +124,11 @@ class PyArlo(object):
         # pylint: disable=invalid-name
         self.ArloMediaLibrary = ArloMediaLibrary(self,
                                                  preload=preload,
-                                                 days=days)
+                                                 days=days,
+                                                 index=media_index)
+
+        # seconds spent by the constructor, see ArloMediaLibrary.load_time
+        self.startup_time = time.time() - started
 
     def __repr__(self):
         """Object representation."""
@@ -59,11 +137,42 @@ class PyArlo(object):
     def login(self):
         """Login to the Arlo account."""
         _LOGGER.debug("Creating Arlo session")
+        if self._load_cached_token():
+            return
         self._authenticate()
 
+    def _load_cached_token(self):
+        """Restore a valid session token from the token cache."""
+        if self._token_cache is None:
+            return False
+
+        data = self._token_cache.load(self.__username, self.__password)
+        if not data:
+            self.metrics.incr('token_cache_misses')
+            return False
+
+        self.metrics.incr('token_cache_hits')
+        _LOGGER.debug("Reusing cached Arlo session token")
+        self._set_session(data)
+        self._token_expires = data.get('expires')
+        return True
+
+    def _set_session(self, data):
+        """Set session attributes from the authentication data."""
+        self.authenticated = data.get('authenticated')
+        self.country_code = data.get('countryCode')
+        self.date_created = data.get('dateCreated')
+        self.__token = data.get('token')
+        self.userid = data.get('userId')
+
+    def _ensure_token(self):
+        """Authenticate again only if the token is missing or expired."""
+        if self.__token is None or self._token_expires is None or \
+                self._token_expires <= time.time():
+            self._authenticate()
+
     def _authenticate(self):
         """Authenticate user and generate token."""
-        self.cleanup_headers()
         url = LOGIN_ENDPOINT
         data = self.query(
             url,
@@ -72,36 +181,48 @@ class PyArlo(object):
                 'email': self.__username,
                 'password': base64.b64encode(self.__password.encode()).decode()},
             extra_headers={
-                'Referer': API_URL})
+                'Referer': API_URL},
+            idempotent=True)
 
         if isinstance(data, dict) and data.get('meta') and data['meta']['code'] == 200:
             data = data.get('data')
-            self.authenticated = data.get('authenticated')
-            self.country_code = data.get('countryCode')
-            self.date_created = data.get('dateCreated')
-            self.__token = data.get('token')
-            self.userid = data.get('userId')
+            self._set_session(data)
+            self._token_expires = \
+                time.time() + (data.get('expiresIn') or TOKEN_EXPIRATION)
+
+            if self._token_cache is not None:
+                self._token_cache.save(self.__username, self.__password, {
+                    'authenticated': self.authenticated,
+                    'countryCode': self.country_code,
+                    'dateCreated': self.date_created,
+                    'token': self.__token,
+                    'userId': self.userid,
+                    'expires': self._token_expires})
 
-            # update header with the generated token
-            self.__headers['Authorization'] = self.__token
+    @property
+    def token(self):
+        """Return the session token."""
+        return self.__token
 
     def cleanup_headers(self):
-        """Reset the headers and params."""
+        """Return new headers carrying the current session token."""
         headers = {
             'Content-Type': 'application/json',
             'Auth-Version': '2'}
         headers['Authorization'] = self.__token
-        self.__headers = headers
-        self.__params = {}
+        return headers
 
     def query(self,
               url,
               method='GET',
               extra_params=None,
               extra_headers=None,
-              retry=3,
+              retry=None,
               raw=False,
-              stream=False):
+              stream=False,
+              idempotent=None,
+              deadline=None,
+              read_timeout=None):
         """
         Return a JSON object or raw session.
 
@@ -109,47 +230,73 @@ class PyArlo(object):
         :param method: Specify the method GET, POST or PUT. Default is GET.
         :param extra_params: Dictionary to be appended on request.body
         :param extra_headers: Dictionary to be apppended on request.headers
-        :param retry: Attempts to retry a query. Default is 3.
+        :param retry: Attempts to retry a query. Default from retry_policy.
         :param raw: Boolean if query() will return request object instead JSON.
         :param stream: Boolean if query() will return a stream object.
+        :param idempotent: Boolean if the query can be safely repeated.
+                           Default is based on the method.
+        :param deadline: Max seconds spent on the query including retries.
+                         Default from retry_policy.
+        :param read_timeout: Max seconds a stream may stay silent, reading
+                             it then raises IOError. Default: forever
         """
         response = None
-        loop = 0
-
-        # always make sure the headers and params are clean
-        self.cleanup_headers()
-
-        while loop <= retry:
-
-            # override request.body or request.headers dictionary
-            if extra_params:
-                params = self.__params
-                params.update(extra_params)
-            else:
-                params = self.__params
-            _LOGGER.debug("Params: %s", params)
-
+        target = rebase_url(url, self.base_url)
+        policy = self.retry_policy
+        retries = policy.retries if retry is None else retry
+        if idempotent is None:
+            idempotent = policy.is_idempotent(method)
+        if deadline is None:
+            deadline = policy.deadline
+        started = time.time()
+        attempt = 0
+        status = None
+        nbytes = 0
+        reauthenticated = False
+
+        # built for each call, queries run from several threads
+        params = dict(extra_params) if extra_params else {}
+        _LOGGER.debug("Params: %s", params)
+
+        while True:
+
+            # the token may change when authenticating again
+            headers = self.cleanup_headers()
             if extra_headers:
-                headers = self.__headers
                 headers.update(extra_headers)
-            else:
-                headers = self.__headers
             _LOGGER.debug("Headers: %s", headers)
 
-            _LOGGER.debug("Querying %s on attempt: %s/%s", url, loop, retry)
-            loop += 1
+            attempt += 1
+            _LOGGER.debug("Querying %s on attempt: %s/%s",
+                          url, attempt, retries + 1)
+
+            # streams are long lived, only bound each read
+            timeout = read_timeout if stream else None
+            if deadline is not None and not stream:
+                timeout = max(0.001, deadline - (time.time() - started))
 
             # define connection method
             req = None
-
-            if method == 'GET':
-                req = self.session.get(url, headers=headers, stream=stream)
-            elif method == 'PUT':
-                req = self.session.put(url, json=params, headers=headers)
-            elif method == 'POST':
-                req = self.session.post(url, json=params, headers=headers)
-
-            if req and (req.status_code == 200):
+            error = None
+
+            try:
+                if method == 'GET':
+                    req = self.session.get(target, headers=headers,
+                                           stream=stream, timeout=timeout)
+                elif method == 'PUT':
+                    req = self.session.put(target, json=params,
+                                           headers=headers, timeout=timeout)
+                elif method == 'POST':
+                    req = self.session.post(target, json=params,
+                                            headers=headers, timeout=timeout)
+            except requests.exceptions.RequestException as err:
+                error = err
+                _LOGGER.debug("Query %s failed: %s", url, err)
+
+            status = req.status_code if req is not None else None
+            if status == 200:
+                if not stream:
+                    nbytes = len(req.content)
                 if raw:
                     _LOGGER.debug("Required raw object.")
                     response = req
@@ -159,6 +306,38 @@ class PyArlo(object):
                 # leave if everything worked fine
                 break
 
+            # the token expired or was revoked, login again only once
+            if status == 401 and url != LOGIN_ENDPOINT and \
+                    not reauthenticated:
+                _LOGGER.debug("Token rejected, authenticating again")
+                reauthenticated = True
+                if self._token_cache is not None:
+                    self._token_cache.clear(self.__username)
+                self._authenticate()
+                continue
+
+            if attempt > retries or not idempotent or \
+                    not policy.is_retryable(status, error):
+                break
+
+            delay = policy.backoff(
+                attempt,
+                req.headers.get('Retry-After') if req is not None else None)
+            if deadline is not None and \
+                    (time.time() - started + delay) >= deadline:
+                _LOGGER.debug("Deadline of %ss reached for %s", deadline, url)
+                break
+
+            _LOGGER.debug("Retrying %s (status %s) in %.2fs",
+                          url, status, delay)
+            time.sleep(delay)
+
+        policy.record(attempt, response is not None)
+        self.metrics.record_request(url, status, time.time() - started,
+                                    attempt, nbytes)
+        if response is None:
+            _LOGGER.debug("Query %s gave up after %s attempts", url, attempt)
+
         return response
 
     @property
@@ -173,32 +352,41 @@ class PyArlo(object):
 
     @property
     def devices(self):
-        """Return all devices on Arlo account."""
+        """Return all devices on Arlo account.
+
+        The devices are built once and published whole, callers on other
+        threads, e.g. the background preload, wait for them.
+        """
         if self._all_devices:
             return self._all_devices
 
-        self._all_devices = {}
-        self._all_devices['cameras'] = []
-        self._all_devices['base_station'] = []
-
-        url = DEVICES_ENDPOINT
-        data = self.query(url)
-
-        for device in data.get('data'):
-            name = device.get('deviceName')
-            if ((device.get('deviceType') == 'camera' or
-                 device.get('deviceType') == 'arloq' or
-                 device.get('deviceType') == 'arloqs') and
-                    device.get('state') == 'provisioned'):
-                camera = ArloCamera(name, device, self)
-                self._all_devices['cameras'].append(camera)
-
-            if (device.get('state') == 'provisioned' and
-                    (device.get('deviceType') == 'basestation' or
-                     device.get('modelId') == 'ABC1000')):
-                base = ArloBaseStation(name, device, self.__token, self)
-                self._all_devices['base_station'].append(base)
-
+        with self._all_devices_lock:
+            if self._all_devices:
+                return self._all_devices
+
+            devices = {'cameras': [], 'base_station': []}
+            data = self._fetch_devices()
+
+            for device in data.get('devices'):
+                name = device.get('deviceName')
+                if ((device.get('deviceType') == 'camera' or
+                     device.get('deviceType') == 'arloq' or
+                     device.get('deviceType') == 'arloqs') and
+                        device.get('state') == 'provisioned'):
+                    camera = ArloCamera(name, device, self)
+                    devices['cameras'].append(camera)
+
+                if (device.get('state') == 'provisioned' and
+                        (device.get('deviceType') == 'basestation' or
+                         device.get('modelId') == 'ABC1000')):
+                    base = ArloBaseStation(
+                        name, device, self.__token, self,
+                        event_buffer=ArloEventBuffer(
+                            self.event_buffer_size,
+                            self.event_buffer_policy))
+                    devices['base_station'].append(base)
+
+            self._all_devices = devices
         return self._all_devices
 
     def lookup_camera_by_id(self, device_id):
@@ -209,19 +397,51 @@ class PyArlo(object):
             return camera
         return None
 
+    def _fetch_devices(self, force=False):
+        """Return the device list indexed by deviceName and deviceId.
+
+        Concurrent and back-to-back callers within devices_ttl seconds
+        share a single query to the devices endpoint.
+
+        :param force: Query the devices endpoint even if cached
+        """
+        with self._devices_lock:
+            cache = self._devices_cache
+            if not force and cache and \
+                    time.time() - cache['timestamp'] < self.devices_ttl:
+                self.metrics.incr('devices_cache_hits')
+                return cache
+
+            self.metrics.incr('devices_cache_misses')
+            response = self.query(DEVICES_ENDPOINT)
+            if not response or not isinstance(response, dict):
+                return {'devices': [], 'by_name': {}, 'by_id': {}}
+
+            devices = response.get('data') or []
+            by_name = {}
+            by_id = {}
+            for device in devices:
+                by_name.setdefault(device.get('deviceName'), device)
+                by_id.setdefault(device.get('deviceId'), device)
+
+            self._devices_cache = {
+                'timestamp': time.time(),
+                'devices': devices,
+                'by_name': by_name,
+                'by_id': by_id}
+            return self._devices_cache
+
     def refresh_attributes(self, name):
-        """Refresh attributes from a given Arlo object."""
-        url = DEVICES_ENDPOINT
-        response = self.query(url)
+        """Refresh attributes from a given Arlo object.
 
-        if not response or not isinstance(response, dict):
+        :param name: deviceName or deviceId of the Arlo object
+        """
+        data = self._fetch_devices()
+        try:
+            return data['by_name'].get(name) or data['by_id'].get(name)
+        except TypeError:
             return None
 
-        for device in response.get('data'):
-            if device.get('deviceName') == name:
-                return device
-        return None
-
     @property
     def unseen_videos_reset(self):
         """Reset the unseen videos counter for all cameras."""
@@ -245,6 +465,58 @@ class PyArlo(object):
         url = PROFILE_ENDPOINT
         return self.query(url)
 
+    def events(self, device=None, resource=None, action=None,
+               maxsize=EVENT_BUFFER_SIZE, loop=None):
+        """Return an asynchronous iterator over the session events.
+
+        Requires Python 3.5+, see pyarlo.event_iterator.ArloEventIterator.
+
+        :param device: Device, deviceId or list of them to keep events of
+        :param resource: Resource or list of resources to keep events of
+        :param action: Action or list of actions to keep, e.g. 'is'
+        :param maxsize: Number of events kept until they are consumed
+        :param loop: Event loop to deliver to. Default: the current one
+        """
+        from pyarlo.event_iterator import ArloEventIterator
+        return ArloEventIterator(self, device, resource, action,
+                                 maxsize, loop)
+
+    def sync_videos(self, days=None):
+        """Sync the library once and share the videos with the cameras.
+
+        ArloMediaLibrary.videos holds the videos of the whole account and
+        every camera caches its own share of them.
+
+        :param days: number of days to keep. Default: the largest
+                     min_days_vdo_cache of the cameras
+        """
+        cameras = self.cameras
+        if days is None:
+            days = max([camera.min_days_vdo_cache for camera in cameras] or
+                       [PRELOAD_DAYS])
+        try:
+            self.ArloMediaLibrary.sync(days)
+        except (AttributeError, IndexError) as error:
+            _LOGGER.error("Unable to sync video library: %s", error)
+            return
+
+        by_camera = {}
+        for video in self.ArloMediaLibrary.videos:
+            by_camera.setdefault(video.camera.device_id, []).append(video)
+        for camera in cameras:
+            camera.make_video_cache(
+                videos=by_camera.get(camera.device_id, []))
+
+    def stats(self):
+        """Return latency, status, retry and event metrics."""
+        # only account for devices already loaded, never query them here
+        self.metrics.set_gauge('event_queue_depth', sum(
+            base.pending_events
+            for base in self._all_devices.get('base_station', [])))
+        stats = self.metrics.snapshot()
+        stats['retry_policy'] = self.retry_policy.stats
+        return stats
+
     @property
     def is_connected(self):
         """Connection status of client with Arlo system."""
@@ -252,25 +524,24 @@ class PyArlo(object):
 
     def update(self, update_cameras=False, update_base_station=False):
         """Refresh object."""
-        self._authenticate()
+        self._ensure_token()
 
         # update attributes in all cameras to avoid duped queries
         if update_cameras:
-            url = DEVICES_ENDPOINT
-            response = self.query(url)
-            if not response or not isinstance(response, dict):
+            data = self._fetch_devices(force=True)
+            if not data.get('devices'):
                 return
 
             for camera in self.cameras:
-                for dev_info in response.get('data'):
-                    if dev_info.get('deviceName') == camera.name:
-                        _LOGGER.debug("Refreshing %s attributes", camera.name)
-                        camera.attrs = dev_info
-
-                # preload cached videos
-                # the user is still able to force a new query by
-                # calling the Arlo.video()
-                camera.make_video_cache()
+                dev_info = data['by_name'].get(camera.name)
+                if dev_info:
+                    _LOGGER.debug("Refreshing %s attributes", camera.name)
+                    camera.attrs = dev_info
+
+            # preload cached videos
+            # the user is still able to force a new query by
+            # calling the Arlo.video()
+            self.sync_videos()
 
         # force update base_station
         if update_base_station:
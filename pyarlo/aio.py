@@ -0,0 +1,685 @@
+# coding: utf-8
+"""Asyncio implementation of the Arlo client.
+
+Requires Python 3.6+ and aiohttp. Every coroutine runs on the caller
+event loop so many accounts and devices can be polled concurrently
+without spawning a thread per request or per event stream.
+"""
+import asyncio
+import base64
+import json
+import logging
+
+import aiohttp
+
+from pyarlo.base_station import ArloBaseStationBase
+from pyarlo.camera import ArloCameraBase
+from pyarlo.media import ArloMediaLibrary
+from pyarlo.metrics import ArloMetrics
+from pyarlo.retry import RetryPolicy
+from pyarlo.utils import rebase_url
+from pyarlo.const import (
+    API_URL, DEVICES_ENDPOINT, EVENT_TIMEOUT,
+    LIBRARY_ENDPOINT,
+    LOGIN_ENDPOINT, PRELOAD_DAYS, SUBSCRIBE_ENDPOINT, UNSUBSCRIBE_ENDPOINT)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_http_get(url, filename=None, session=None):
+    """Download HTTP data.
+
+    :param url: URL to download
+    :param filename: File to save data. Default: return bytes
+    :param session: aiohttp.ClientSession to use. Default: new session
+    """
+    close_session = session is None
+    if close_session:
+        session = aiohttp.ClientSession()
+
+    try:
+        async with session.get(url) as ret:
+            if ret.status != 200:
+                return False
+            content = await ret.read()
+    except aiohttp.ClientError as error:
+        _LOGGER.error(error)
+        return False
+    finally:
+        if close_session:
+            await session.close()
+
+    if filename is None:
+        return content
+
+    with open(filename, 'wb') as data:
+        data.write(content)
+    return True
+
+
+async def async_http_stream(url, chunk=4096, session=None):
+    """Generate stream for a given record video.
+
+    :param chunk: chunk bytes to read per time
+    :param session: aiohttp.ClientSession to use. Default: new session
+    :returns async generator object
+    """
+    close_session = session is None
+    if close_session:
+        session = aiohttp.ClientSession()
+
+    try:
+        async with session.get(url) as ret:
+            ret.raise_for_status()
+            async for data in ret.content.iter_chunked(chunk):
+                yield data
+    finally:
+        if close_session:
+            await session.close()
+
+
+async def _iter_sse(response):
+    """Yield the data field of each Server-Sent Event of a response."""
+    buf = []
+    async for line in response.content:
+        line = line.decode('utf-8').rstrip('\r\n')
+        if not line:
+            if buf:
+                yield '\n'.join(buf)
+                buf = []
+            continue
+        if line.startswith('data:'):
+            buf.append(line[5:].lstrip(' '))
+
+
+class AsyncPyArlo(object):
+    """Asyncio object for Netgear Arlo camera."""
+
+    def __init__(self, username=None, password=None,
+                 preload=True, days=PRELOAD_DAYS, websession=None,
+                 retry_policy=None, base_url=None):
+        """Create an AsyncPyArlo object.
+
+        Nothing is queried until login() is awaited.
+
+        :param username: Arlo user email
+        :param password: Arlo user password
+        :param preload: Boolean to preload video library on login.
+        :param days: If preload, number of days to lookup.
+        :param websession: aiohttp.ClientSession shared with the caller
+        :param retry_policy: <RetryPolicy> used by query()
+        :param base_url: Scheme and host replacing the Arlo cloud URLs
+
+        :returns AsyncPyArlo base object
+        """
+        self.authenticated = None
+        self.country_code = None
+        self.date_created = None
+        self.userid = None
+        self.__token = None
+        self.__username = username
+        self.__password = password
+        self._preload = preload
+        self._days = days
+        self._all_devices = {}
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.metrics = ArloMetrics()
+        self.base_url = base_url
+
+        self._close_websession = websession is None
+        self.websession = websession
+
+        # blocking media helpers of the shared device classes
+        # fall back to requests without a pooled session
+        self.session = None
+
+        # pylint: disable=invalid-name
+        self.ArloMediaLibrary = AsyncArloMediaLibrary(self, days=days)
+
+    def __repr__(self):
+        """Object representation."""
+        return "<{0}: {1}>".format(self.__class__.__name__, self.userid)
+
+    async def login(self):
+        """Login to the Arlo account and preload the media library."""
+        _LOGGER.debug("Creating Arlo async session")
+        if self.websession is None:
+            self.websession = aiohttp.ClientSession()
+
+        await self._authenticate()
+        if self._preload and self._days:
+            self.ArloMediaLibrary.videos = \
+                await self.ArloMediaLibrary.load(self._days)
+
+    async def close(self):
+        """Close the aiohttp session if owned by this object."""
+        if self._close_websession and self.websession is not None:
+            await self.websession.close()
+            self.websession = None
+
+    async def _authenticate(self):
+        """Authenticate user and generate token."""
+        data = await self.query(
+            LOGIN_ENDPOINT,
+            method='POST',
+            extra_params={
+                'email': self.__username,
+                'password': base64.b64encode(
+                    self.__password.encode()).decode()},
+            extra_headers={
+                'Referer': API_URL},
+            idempotent=True)
+
+        if isinstance(data, dict) and data.get('meta') and \
+                data['meta']['code'] == 200:
+            data = data.get('data')
+            self.authenticated = data.get('authenticated')
+            self.country_code = data.get('countryCode')
+            self.date_created = data.get('dateCreated')
+            self.__token = data.get('token')
+            self.userid = data.get('userId')
+
+    def _headers(self, extra_headers=None):
+        """Return the headers used on every request."""
+        headers = {
+            'Content-Type': 'application/json',
+            'Auth-Version': '2'}
+        if self.__token:
+            headers['Authorization'] = self.__token
+        if extra_headers:
+            headers.update(extra_headers)
+        return headers
+
+    async def query(self,
+                    url,
+                    method='GET',
+                    extra_params=None,
+                    extra_headers=None,
+                    retry=None,
+                    raw=False,
+                    stream=False,
+                    idempotent=None,
+                    deadline=None):
+        """
+        Return a JSON object or raw response.
+
+        :param url:  Arlo API URL
+        :param method: Specify the method GET, POST or PUT. Default is GET.
+        :param extra_params: Dictionary to be appended on request.body
+        :param extra_headers: Dictionary to be apppended on request.headers
+        :param retry: Attempts to retry a query. Default from retry_policy.
+        :param raw: Boolean if query() will return response instead JSON.
+        :param stream: Boolean if query() will return a stream response.
+        :param idempotent: Boolean if the query can be safely repeated.
+                           Default is based on the method.
+        :param deadline: Max seconds spent on the query including retries.
+                         Default from retry_policy.
+        """
+        response = None
+        policy = self.retry_policy
+        retries = policy.retries if retry is None else retry
+        if idempotent is None:
+            idempotent = policy.is_idempotent(method)
+        if deadline is None:
+            deadline = policy.deadline
+        loop = asyncio.get_event_loop()
+        started = loop.time()
+        attempt = 0
+        params = extra_params if extra_params else {}
+        headers = self._headers(extra_headers)
+
+        while True:
+            attempt += 1
+            _LOGGER.debug("Querying %s on attempt: %s/%s",
+                          url, attempt, retries + 1)
+
+            kwargs = {'headers': headers}
+            if method in ('PUT', 'POST'):
+                kwargs['json'] = params
+            if stream:
+                kwargs['timeout'] = aiohttp.ClientTimeout(total=None)
+            elif deadline is not None:
+                kwargs['timeout'] = aiohttp.ClientTimeout(
+                    total=max(0.001, deadline - (loop.time() - started)))
+
+            req = None
+            error = None
+            try:
+                req = await self.websession.request(
+                    method, rebase_url(url, self.base_url), **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+                error = err
+                _LOGGER.debug("Query %s failed: %s", url, err)
+
+            status = req.status if req is not None else None
+            if status == 200:
+                if raw or stream:
+                    _LOGGER.debug("Required raw object.")
+                    response = req
+                else:
+                    response = await req.json(content_type=None)
+                    req.release()
+
+                # leave if everything worked fine
+                break
+
+            retry_after = None
+            if req is not None:
+                retry_after = req.headers.get('Retry-After')
+                req.release()
+
+            if attempt > retries or not idempotent or \
+                    not policy.is_retryable(status, error):
+                break
+
+            delay = policy.backoff(attempt, retry_after)
+            if deadline is not None and \
+                    (loop.time() - started + delay) >= deadline:
+                _LOGGER.debug("Deadline of %ss reached for %s", deadline, url)
+                break
+
+            _LOGGER.debug("Retrying %s (status %s) in %.2fs",
+                          url, status, delay)
+            await asyncio.sleep(delay)
+
+        policy.record(attempt, response is not None)
+        self.metrics.record_request(url, status, loop.time() - started,
+                                    attempt)
+        return response
+
+    def stats(self):
+        """Return latency, status, retry and event metrics."""
+        stats = self.metrics.snapshot()
+        stats['retry_policy'] = self.retry_policy.stats
+        return stats
+
+    @property
+    def token(self):
+        """Return the session token."""
+        return self.__token
+
+    @property
+    def cameras(self):
+        """Return cameras loaded by get_devices()."""
+        return self._all_devices.get('cameras', [])
+
+    @property
+    def base_stations(self):
+        """Return base stations loaded by get_devices()."""
+        return self._all_devices.get('base_station', [])
+
+    async def get_devices(self, force=False):
+        """Return all devices on Arlo account.
+
+        Devices already loaded are kept and their attributes refreshed,
+        so references held by the caller stay current.
+
+        :param force: Query the devices again even if already loaded
+        """
+        if self._all_devices and not force:
+            return self._all_devices
+
+        data = await self.query(DEVICES_ENDPOINT)
+        if not data or not isinstance(data, dict):
+            return self._all_devices
+
+        loaded = dict((device.device_id, device)
+                      for device in self.cameras + self.base_stations)
+        self._all_devices = {}
+        self._all_devices['cameras'] = []
+        self._all_devices['base_station'] = []
+
+        for device in data.get('data'):
+            name = device.get('deviceName')
+            known = loaded.get(device.get('deviceId'))
+            if known is not None:
+                known.name = name
+                known._attrs = device  # pylint: disable=protected-access
+
+            if ((device.get('deviceType') == 'camera' or
+                 device.get('deviceType') == 'arloq' or
+                 device.get('deviceType') == 'arloqs') and
+                    device.get('state') == 'provisioned'):
+                camera = known if isinstance(known, AsyncArloCamera) \
+                    else AsyncArloCamera(name, device, self)
+                self._all_devices['cameras'].append(camera)
+
+            if (device.get('state') == 'provisioned' and
+                    (device.get('deviceType') == 'basestation' or
+                     device.get('modelId') == 'ABC1000')):
+                base = known if isinstance(known, AsyncArloBaseStation) \
+                    else AsyncArloBaseStation(name, device, self.__token,
+                                              self)
+                self._all_devices['base_station'].append(base)
+
+        return self._all_devices
+
+    def lookup_camera_by_id(self, device_id):
+        """Return camera object by device_id."""
+        for camera in self.cameras:
+            if camera.device_id == device_id:
+                return camera
+        return None
+
+    @property
+    def is_connected(self):
+        """Connection status of client with Arlo system."""
+        return bool(self.authenticated)
+
+
+class AsyncArloCamera(ArloCameraBase):
+    """Arlo Camera of an AsyncPyArlo session.
+
+    The camera properties are served from the base station cache filled
+    by async_update().
+    """
+
+    async def async_update(self):
+        """Update the camera attributes and the base station properties."""
+        if self.base_station:
+            await self.base_station.async_update()
+        else:
+            await self._session.get_devices(force=True)
+
+    async def async_videos(self, days=None):
+        """Return all <ArloVideo> objects from camera given days range.
+
+        :param days: number of days to retrieve
+        """
+        if days is None:
+            days = self._min_days_vdo_cache
+        return await self._session.ArloMediaLibrary.load(
+            days=days, only_cameras=[self])
+
+
+class AsyncArloBaseStation(ArloBaseStationBase):
+    """Arlo Base Station with asyncio publish and event stream.
+
+    The cloud is only queried by the coroutines, the properties are
+    served from the state cached by async_update() and the events.
+    """
+
+    def __init__(self, name, attrs, session_token, arlo_session,
+                 **kwargs):
+        """Initialize Arlo Base Station object.
+
+        :param name: Base Station name
+        :param attrs: Attributes
+        :param session_token: Session token passed by camera class
+        :param arlo_session: AsyncPyArlo shared session
+        """
+        super(AsyncArloBaseStation, self).__init__(
+            name, attrs, session_token, arlo_session, **kwargs)
+        self._stream_task = None
+        self._stream_lock = None
+        self._stream_users = 0
+        self._waiters = {}
+        self._trans_waiters = {}
+
+    async def _event_stream(self, connected):
+        """Read the Arlo Event Stream until cancelled or logged out."""
+        url = SUBSCRIBE_ENDPOINT + "?token=" + self.session_token
+        data = await self._session.query(
+            url, method='GET', raw=True, stream=True)
+        if data is None:
+            _LOGGER.debug("Did not receive a valid response. Aborting..")
+            connected.set_result(False)
+            return None
+
+        connected.set_result(True)
+        try:
+            async for event in _iter_sse(data):
+                event = json.loads(event)
+                if event.get('status') == "connected":
+                    _LOGGER.debug("Successfully subscribed this base station")
+                elif event.get('action'):
+                    action = event.get('action')
+                    resource = event.get('resource')
+                    self._session.metrics.record_event(resource)
+                    if action == "logout":
+                        _LOGGER.debug("Logged out by some other entity")
+                        break
+                    elif action == "is" and \
+                            "subscriptions/" not in resource:
+                        self._receive_event(event)
+        finally:
+            data.release()
+        return True
+
+    def _receive_event(self, event):
+        """Complete the reads waiting for an event of the stream.
+
+        The event is first merged into the cached state. It completes the
+        read that published its transId and every read of its resource.
+        """
+        self._apply_event(event)
+        trans_ids = list(self._waiters.get(event.get('resource'), []))
+        trans_id = event.get('transId')
+        if trans_id in self._trans_waiters and trans_id not in trans_ids:
+            trans_ids.append(trans_id)
+        for trans_id in trans_ids:
+            future = self._trans_waiters[trans_id][1]
+            self._remove_waiter(trans_id)
+            if not future.done():
+                future.set_result(event)
+
+    def _add_waiter(self, resource, trans_id):
+        """Return a future completed by the event of a read."""
+        future = asyncio.get_event_loop().create_future()
+        self._waiters.setdefault(resource, []).append(trans_id)
+        self._trans_waiters[trans_id] = (resource, future)
+        return future
+
+    def _remove_waiter(self, trans_id):
+        """Forget a read, e.g. after its timeout."""
+        resource = self._trans_waiters.pop(trans_id, (None, None))[0]
+        waiters = self._waiters.get(resource, [])
+        if trans_id in waiters:
+            waiters.remove(trans_id)
+            if not waiters:
+                del self._waiters[resource]
+
+    async def _start_event_stream(self):
+        """Start the event stream task and wait for the connection."""
+        connected = asyncio.get_event_loop().create_future()
+        self._stream_task = asyncio.ensure_future(
+            self._event_stream(connected))
+        return await connected
+
+    async def _stop_event_stream(self):
+        """Cancel the event stream task."""
+        if self._stream_task is not None:
+            self._stream_task.cancel()
+            try:
+                await self._stream_task
+            except asyncio.CancelledError:
+                pass
+            self._stream_task = None
+
+    async def _acquire_event_stream(self):
+        """Hold the event stream, opening and subscribing it if needed.
+
+        Every successful call must be paired with _release_event_stream(),
+        the stream is closed when the last read releases it.
+        """
+        if self._stream_lock is None:
+            self._stream_lock = asyncio.Lock()
+        async with self._stream_lock:
+            task = self._stream_task
+            if not self._stream_users or (task is not None and task.done()):
+                if not await self._start_event_stream():
+                    await self._stop_event_stream()
+                    return False
+                await self.publish(
+                    action='set',
+                    resource='subscribe',
+                    mode=None,
+                    publish_response=False)
+            self._stream_users += 1
+            return True
+
+    async def _release_event_stream(self):
+        """Release the event stream, closing it if no longer used."""
+        async with self._stream_lock:
+            self._stream_users -= 1
+            if not self._stream_users:
+                await self._session.query(UNSUBSCRIBE_ENDPOINT)
+                await self._stop_event_stream()
+
+    async def publish_and_get_event(self, resource, timeout=EVENT_TIMEOUT):
+        """Publish and get the event from base station.
+
+        Concurrent reads share the event stream, each one completed by
+        the event answering its own get.
+
+        :param resource: Resource to fetch
+        :param timeout: Seconds to wait for the event
+        """
+        this_event = None
+        if not await self._acquire_event_stream():
+            return None
+
+        try:
+            # registered before publishing, the event may beat the response
+            trans_id = self._next_trans_id()
+            future = self._add_waiter(resource, trans_id)
+            status = await self.publish(
+                action='get',
+                resource=resource,
+                mode=None,
+                publish_response=False,
+                trans_id=trans_id)
+
+            if status == 'success':
+                loop = asyncio.get_event_loop()
+                started = loop.time()
+                try:
+                    this_event = await asyncio.wait_for(future, timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._session.metrics.record_event_wait(
+                    resource, loop.time() - started, this_event is not None)
+            self._remove_waiter(trans_id)
+        finally:
+            await self._release_event_stream()
+
+        return this_event
+
+    async def publish(
+            self,
+            action='get',
+            resource=None,
+            camera_id=None,
+            mode=None,
+            publish_response=None,
+            properties=None,
+            trans_id=None):
+        """Run action.
+
+        :param resource: Specify one of the resources to fetch from arlo.
+        :param camera_id: Specify the camera ID involved with this action
+        :param mode: Specify the mode to set, else None for GET operations
+        :param publish_response: Set to True for SETs. Default False
+        :param trans_id: transId echoed by the event. Default unique
+        """
+        mode_ids = None
+        if action != 'get' and resource == 'modes':
+            mode_ids = await self.async_available_modes_with_ids()
+
+        url, body = self._publish_body(
+            action, resource, camera_id, mode, publish_response,
+            properties, mode_ids, trans_id)
+
+        ret = await self._session.query(
+            url, method='POST', extra_params=body,
+            extra_headers={"xCloudId": self.xcloud_id},
+            idempotent=(action == 'get'))
+
+        if ret and ret.get('success'):
+            return 'success'
+
+        return None
+
+    async def async_available_modes_with_ids(self):
+        """Return dict of available mode name and id."""
+        if not self._available_mode_ids:
+            event = await self.publish_and_get_event('modes')
+            modes = event.get('properties', {}).get('modes') \
+                if event else None
+            self._available_mode_ids = self._parse_mode_ids(modes)
+        return self._available_mode_ids
+
+    async def async_get_mode(self):
+        """Return current mode key."""
+        schedule = await self.publish_and_get_event('schedule')
+        if schedule and schedule.get('properties', {}).get('active'):
+            return 'schedule'
+
+        mode_event = await self.publish_and_get_event('modes')
+        if mode_event:
+            return self._parse_active_mode(mode_event.get('properties'))
+        return None
+
+    async def async_set_mode(self, mode):
+        """Set Arlo camera mode.
+
+        :param mode: arm, disarm
+        """
+        modes = await self.async_available_modes_with_ids()
+        if mode not in modes:
+            return None
+        status = await self.publish(
+            action='set',
+            resource='modes' if mode != 'schedule' else 'schedule',
+            mode=mode,
+            publish_response=True)
+        if status == 'success':
+            self._apply_mode(mode)
+        return status
+
+    async def async_update(self):
+        """Update camera properties and device attributes."""
+        event = await self.publish_and_get_event('cameras')
+        self._set_cameras_properties(event)
+        # refreshes the attributes of this object in place
+        await self._session.get_devices(force=True)
+
+
+class AsyncArloMediaLibrary(ArloMediaLibrary):
+    """Arlo Library Media module with an asyncio load()."""
+
+    def __init__(self, arlo_session, days=PRELOAD_DAYS):
+        """Initialiaze Arlo Media Library object.
+
+        Videos are loaded when the AsyncPyArlo session logs in.
+
+        :param arlo_session: AsyncPyArlo shared session
+        :param days: number of days to lookup.
+        """
+        super(AsyncArloMediaLibrary, self).__init__(
+            arlo_session, preload=False, days=days)
+
+    async def load(self, days=PRELOAD_DAYS, only_cameras=None,
+                   date_from=None, date_to=None, limit=None):
+        """Load  Arlo videos from the given criteria
+
+        :param days: number of days to retrieve
+        :param only_cameras: retrieve only <ArloCamera> on that list
+        :param date_from: refine from initial date
+        :param date_to: refine final date
+        :param limit: define number of objects to return
+        """
+        params = self._library_params(days, date_from, date_to)
+        data = await self._session.query(LIBRARY_ENDPOINT,
+                                         method='POST',
+                                         extra_params=params,
+                                         idempotent=True)
+        if not data:
+            return []
+
+        await self._session.get_devices()
+        all_cameras = self._session.cameras
+        return self._build_videos(
+            data.get('data'), all_cameras, only_cameras, limit)
+
+# vim:sw=4:ts=4:et:
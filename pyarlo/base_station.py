@@ -1,24 +1,30 @@
 # coding: utf-8
 """Generic Python Class file for Netgear Arlo Base Station module."""
-import json
+import itertools
 import threading
 import logging
 import time
 import base64
 import zlib
-import sseclient
 from pyarlo.const import (
-    ACTION_BODY, SUBSCRIBE_ENDPOINT, UNSUBSCRIBE_ENDPOINT,
-    FIXED_MODES, NOTIFY_ENDPOINT, RESOURCES)
+    ACTION_BODY, EVENT_TIMEOUT, FIXED_MODES, NOTIFY_ENDPOINT, RESOURCES)
+from pyarlo.events import ArloEventBuffer, ArloEventFuture
 from pyarlo.utils import assert_is_dict
 
 _LOGGER = logging.getLogger(__name__)
 
 REFRESH_RATE = 15
 
+# makes every transId sent by this process unique
+_TRANS_IDS = itertools.count(1)
 
-class ArloBaseStation(object):
-    """Arlo Base Station module implementation."""
+
+class ArloBaseStationBase(object):
+    """Attributes and cached state shared by the Arlo base stations.
+
+    Nothing here queries the cloud, the state is filled by the events
+    merged with _apply_event() and read back by the properties.
+    """
 
     def __init__(self, name, attrs, session_token, arlo_session,
                  refresh_rate=REFRESH_RATE):
@@ -38,13 +44,12 @@ class ArloBaseStation(object):
         self._available_mode_ids = None
         self._camera_properties = None
         self._camera_extended_properties = None
+        self._modes_properties = None
+        self._schedule_properties = None
+        self._modes_refresh = None
         self._ambient_sensor_data = None
         self._last_refresh = None
         self._refresh_rate = refresh_rate
-        self.__sseclient = None
-        self.__subscribed = False
-        self.__events = []
-        self.__event_handle = None
 
         self._attrs = assert_is_dict(self._attrs)
 
@@ -52,119 +57,58 @@ class ArloBaseStation(object):
         """Representation string of object."""
         return "<{0}: {1}>".format(self.__class__.__name__, self.name)
 
-    def thread_function(self):
-        """Thread function."""
-
-        self.__subscribed = True
-        url = SUBSCRIBE_ENDPOINT + "?token=" + self._session_token
-
-        data = self._session.query(url, method='GET', raw=True, stream=True)
-        if not data or not data.ok:
-            _LOGGER.debug("Did not receive a valid response. Aborting..")
-            return None
-
-        self.__sseclient = sseclient.SSEClient(data)
-
-        try:
-            for event in (self.__sseclient).events():
-                if not self.__subscribed:
-                    break
-                data = json.loads(event.data)
-                if data.get('status') == "connected":
-                    _LOGGER.debug("Successfully subscribed this base station")
-                elif data.get('action'):
-                    action = data.get('action')
-                    resource = data.get('resource')
-                    if action == "logout":
-                        _LOGGER.debug("Logged out by some other entity")
-                        self.__subscribed = False
-                        break
-                    elif action == "is" and "subscriptions/" not in resource:
-                        self.__events.append(data)
-                        self.__event_handle.set()
-
-        except TypeError as error:
-            _LOGGER.debug("Got unexpected error: %s", error)
-            return None
-
-        return True
-
-    def _get_event_stream(self):
-        """Spawn a thread and monitor the Arlo Event Stream."""
-        self.__event_handle = threading.Event()
-        event_thread = threading.Thread(target=self.thread_function)
-        event_thread.start()
-
-    def _subscribe_myself(self):
-        """Subscribe this base station for all events."""
-        return self.publish(
-            action='set',
-            resource='subscribe',
-            mode=None,
-            publish_response=False)
-
-    def _unsubscribe_myself(self):
-        """Unsubscribe this base station for all events."""
-        url = UNSUBSCRIBE_ENDPOINT
-        return self._session.query(url, method='GET', raw=True, stream=False)
-
-    def _close_event_stream(self):
-        """Stop the Event stream thread."""
-        self.__subscribed = False
-        del self.__events[:]
-        self.__event_handle.clear()
-
-    def publish_and_get_event(self, resource):
-        """Publish and get the event from base station."""
-        l_subscribed = False
-        this_event = None
+    @property
+    def session_token(self):
+        """Return the current session token."""
+        return self._session.token or self._session_token
 
-        if not self.__subscribed:
-            self._get_event_stream()
-            self._subscribe_myself()
-            l_subscribed = True
+    def _apply_event(self, event):
+        """Merge the properties carried by an event into the cached state.
 
-        status = self.publish(
-            action='get',
-            resource=resource,
-            mode=None,
-            publish_response=False)
+        Full 'cameras' lists replace the camera properties while partial
+        'cameras/<deviceId>', 'modes' and 'schedule' updates are merged.
+        """
+        resource = event.get('resource') or ''
+        properties = event.get('properties')
 
-        if status == 'success':
-            i = 0
-            while not this_event and i < 2:
-                self.__event_handle.wait(5.0)
-                self.__event_handle.clear()
-                _LOGGER.debug("Instance %s resource: %s", str(i), resource)
-                for event in self.__events:
-                    if event['resource'] == resource:
-                        this_event = event
-                        self.__events.remove(event)
-                        break
-                i = i + 1
-
-        if l_subscribed:
-            self._unsubscribe_myself()
-            self._close_event_stream()
-            l_subscribed = False
-
-        return this_event
+        if resource == 'cameras' and isinstance(properties, list):
+            self._last_refresh = int(time.time())
+            self._camera_properties = properties
+            return
 
-    def publish(
-            self,
-            action='get',
-            resource=None,
-            camera_id=None,
-            mode=None,
-            publish_response=None,
-            properties=None):
-        """Run action.
+        if not isinstance(properties, dict):
+            return
 
-        :param method: Specify the method GET, POST or PUT. Default is GET.
-        :param resource: Specify one of the resources to fetch from arlo.
-        :param camera_id: Specify the camera ID involved with this action
-        :param mode: Specify the mode to set, else None for GET operations
-        :param publish_response: Set to True for SETs. Default False
+        segments = resource.split('/')
+        if resource == 'modes':
+            self._modes_properties = dict(self._modes_properties or {},
+                                          **properties)
+            if properties.get('modes'):
+                self._available_mode_ids = \
+                    self._parse_mode_ids(properties['modes'])
+                self._available_modes = list(self._available_mode_ids)
+        elif resource == 'schedule':
+            self._schedule_properties = dict(
+                self._schedule_properties or {}, **properties)
+        elif len(segments) == 2 and segments[0] == 'cameras':
+            if segments[1] == self.device_id:
+                self._camera_extended_properties = dict(
+                    self._camera_extended_properties or {}, **properties)
+            for camera in self._camera_properties or []:
+                if camera.get('serialNumber') == segments[1]:
+                    camera.update(properties)
+
+    def _next_trans_id(self):
+        """Return a transId unique to this process."""
+        return "web!{0}.{1}".format(self.xcloud_id, next(_TRANS_IDS))
+
+    def _publish_body(self, action, resource, camera_id, mode,
+                      publish_response, properties, mode_ids=None,
+                      trans_id=None):
+        """Return the notify URL and body used to run an action.
+
+        :param mode_ids: Available modes with ids, required to set modes
+        :param trans_id: transId of the action. Default unique
         """
         url = NOTIFY_ENDPOINT.format(self.device_id)
 
@@ -189,7 +133,7 @@ class ArloBaseStation(object):
                 dev.append(self.device_id)
                 properties.update({'devices': dev})
             elif resource == 'modes':
-                available_modes = self.available_modes_with_ids
+                available_modes = assert_is_dict(mode_ids)
                 properties.update({'active': available_modes.get(mode)})
             elif resource == 'privacy':
                 properties.update({'privacyActive': not mode})
@@ -201,20 +145,13 @@ class ArloBaseStation(object):
 
         body['from'] = "{0}_web".format(self.user_id)
         body['to'] = self.device_id
-        body['transId'] = "web!{0}".format(self.xcloud_id)
+        body['transId'] = trans_id or self._next_trans_id()
 
         _LOGGER.debug("Action body: %s", body)
-
-        ret = \
-            self._session.query(url, method='POST', extra_params=body,
-                                extra_headers={"xCloudId": self.xcloud_id})
-
-        if ret and ret.get('success'):
-            return 'success'
-
-        return None
+        return url, body
 
     # pylint: disable=invalid-name
+
     @property
     def device_id(self):
         """Return device_id."""
@@ -301,94 +238,49 @@ class ArloBaseStation(object):
         if isinstance(value, (int, float)):
             self._refresh_rate = value
 
-    @property
-    def available_modes(self):
-        """Return list of available mode names."""
-        if not self._available_modes:
-            modes = self.available_modes_with_ids
-            if not modes:
-                return None
-            self._available_modes = list(modes.keys())
-        return self._available_modes
-
-    @property
-    def available_modes_with_ids(self):
-        """Return list of objects containing available mode name and id."""
-        if not self._available_mode_ids:
-            all_modes = FIXED_MODES.copy()
-            self._available_mode_ids = all_modes
-            modes = self.get_available_modes()
-            try:
-                if modes:
-                    # pylint: disable=consider-using-dict-comprehension
-                    simple_modes = dict(
-                        [(m.get("type", m.get("name")), m.get("id"))
-                         for m in modes]
-                    )
-                    all_modes.update(simple_modes)
-                    self._available_mode_ids = all_modes
-            except TypeError:
-                _LOGGER.debug("Did not receive a valid response. Passing..")
-        return self._available_mode_ids
+    @staticmethod
+    def _parse_mode_ids(modes):
+        """Return dict of mode name and id from a list of mode objects."""
+        all_modes = FIXED_MODES.copy()
+        try:
+            if modes:
+                # pylint: disable=consider-using-dict-comprehension
+                simple_modes = dict(
+                    [(m.get("type", m.get("name")), m.get("id"))
+                     for m in modes]
+                )
+                all_modes.update(simple_modes)
+        except (TypeError, AttributeError):
+            _LOGGER.debug("Did not receive a valid response. Passing..")
+        return all_modes
 
     @property
     def available_resources(self):
         """Return list of available resources."""
         return list(RESOURCES.keys())
 
-    @property
-    def mode(self):
-        """Return current mode key."""
-
-        if self.is_in_schedule_mode:
-            return "schedule"
-
-        resource = "modes"
-        mode_event = self.publish_and_get_event(resource)
-        if mode_event:
-            properties = mode_event.get('properties')
-            active_mode = properties.get('active')
-            modes = properties.get('modes')
-            if not modes:
-                return None
-
-            for mode in modes:
-                if mode.get('id') == active_mode:
-                    return mode.get('type') \
-                        if mode.get('type') is not None else mode.get('name')
-        return None
-
-    @property
-    def is_in_schedule_mode(self):
-        """Returns True if base_station is currently on a scheduled mode."""
-        resource = "schedule"
-        mode_event = self.publish_and_get_event(resource)
-        if mode_event and mode_event.get("resource", None) == "schedule":
-            properties = mode_event.get('properties')
-            return properties.get("active", False)
-        return False
-
-    def get_available_modes(self):
-        """Return a list of available mode objects for an Arlo user."""
-        resource = "modes"
-        resource_event = self.publish_and_get_event(resource)
-        if resource_event:
-            properties = resource_event.get("properties")
-            return properties.get("modes")
+    @staticmethod
+    def _parse_active_mode(properties):
+        """Return the active mode key from the modes properties."""
+        properties = assert_is_dict(properties)
+        active_mode = properties.get('active')
+        modes = properties.get('modes')
+        if not modes:
+            return None
 
+        for mode in modes:
+            if mode.get('id') == active_mode:
+                return mode.get('type') \
+                    if mode.get('type') is not None else mode.get('name')
         return None
 
     @property
     def camera_properties(self):
-        """Return _camera_properties"""
-        if self._camera_properties is None:
-            self.get_cameras_properties()
+        """Return the camera properties cached from the events."""
         return self._camera_properties
 
-    def get_cameras_properties(self):
-        """Return camera properties."""
-        resource = "cameras"
-        resource_event = self.publish_and_get_event(resource)
+    def _set_cameras_properties(self, resource_event):
+        """Store the camera properties of a 'cameras' event."""
         if resource_event:
             self._last_refresh = int(time.time())
             self._camera_properties = resource_event.get('properties')
@@ -419,16 +311,16 @@ class ArloBaseStation(object):
 
     @property
     def camera_extended_properties(self):
-        """Return _camera_extended_properties."""
-        if self._camera_extended_properties is None:
-            self.get_camera_extended_properties()
+        """Return the extended properties cached from the events."""
         return self._camera_extended_properties
 
-    def get_camera_extended_properties(self):
-        """Return camera extended properties."""
-        resource = 'cameras/{}'.format(self.device_id)
-        resource_event = self.publish_and_get_event(resource)
+    @property
+    def _extended_properties_resource(self):
+        """Return the resource of the camera extended properties."""
+        return 'cameras/{}'.format(self.device_id)
 
+    def _set_camera_extended_properties(self, resource_event):
+        """Store the extended properties of a 'cameras/<id>' event."""
         if resource_event is None:
             return None
 
@@ -482,44 +374,9 @@ class ArloBaseStation(object):
 
         return night_light.get('brightness')
 
-    @property
-    def properties(self):
-        """Return the base station info."""
-        resource = "basestation"
-        basestn_event = self.publish_and_get_event(resource)
-        if basestn_event:
-            return basestn_event.get('properties')
-
-        return None
-
-    def get_cameras_rules(self):
-        """Return the camera rules."""
-        resource = "rules"
-        rules_event = self.publish_and_get_event(resource)
-        if rules_event:
-            return rules_event.get('properties')
-
-        return None
-
-    def get_cameras_schedule(self):
-        """Return the schedule set for cameras."""
-        resource = "schedule"
-        schedule_event = self.publish_and_get_event(resource)
-        if schedule_event:
-            return schedule_event.get('properties')
-
-        return None
-
-    @property
-    def is_motion_detection_enabled(self):
-        """Return Boolean if motion is enabled."""
-        return self.mode == "armed"
-
     @property
     def ambient_sensor_data(self):
-        """Return _ambient_sensor_data"""
-        if self._ambient_sensor_data is None:
-            self.get_ambient_sensor_data()
+        """Return the ambient sensor history cached from the events."""
         return self._ambient_sensor_data
 
     @property
@@ -540,18 +397,20 @@ class ArloBaseStation(object):
         history entry (in VOC PPM)"""
         return self.get_latest_ambient_sensor_statistic('airQuality')
 
-    def get_ambient_sensor_data(self):
-        """Refresh ambient sensor history"""
-        resource = 'cameras/{}/ambientSensors/history'.format(self.device_id)
-        history_event = self.publish_and_get_event(resource)
+    @property
+    def _ambient_sensors_resource(self):
+        """Return the resource of the ambient sensor history."""
+        return 'cameras/{}/ambientSensors/history'.format(self.device_id)
 
+    def _set_ambient_sensor_data(self, history_event):
+        """Decode and store the history of an ambient sensors event."""
         if history_event is None:
             return None
 
         properties = history_event.get('properties')
 
         self._ambient_sensor_data = \
-            ArloBaseStation._decode_sensor_data(properties)
+            ArloBaseStationBase._decode_sensor_data(properties)
 
         return self._ambient_sensor_data
 
@@ -570,13 +429,13 @@ class ArloBaseStation(object):
 
         while i < len(data):
             points.append({
-                'timestamp': int(1e3 * ArloBaseStation._parse_statistic(
+                'timestamp': int(1e3 * ArloBaseStationBase._parse_statistic(
                     data[i:(i + 4)], 0)),
-                'temperature': ArloBaseStation._parse_statistic(
+                'temperature': ArloBaseStationBase._parse_statistic(
                     data[(i + 8):(i + 10)], 1),
-                'humidity': ArloBaseStation._parse_statistic(
+                'humidity': ArloBaseStationBase._parse_statistic(
                     data[(i + 14):(i + 16)], 1),
-                'airQuality': ArloBaseStation._parse_statistic(
+                'airQuality': ArloBaseStationBase._parse_statistic(
                     data[(i + 20):(i + 22)], 1)
             })
             i += 22
@@ -600,13 +459,397 @@ class ArloBaseStation(object):
 
     def get_latest_ambient_sensor_statistic(self, statistic):
         """Gets the most recent ambient sensor history entry"""
-        if self._ambient_sensor_data is None:
-            self.get_ambient_sensor_data()
+        data = self.ambient_sensor_data
+        if not data:
+            return None
+
+        return data[-1].get(statistic)
+
+    def _apply_mode(self, mode):
+        """Cache a mode that was just set until its event confirms it.
+
+        :param mode: Mode key set on the base station
+        """
+        schedule = mode == 'schedule'
+        self._schedule_properties = dict(self._schedule_properties or {},
+                                         active=schedule)
+        if not schedule:
+            self._modes_properties = dict(
+                self._modes_properties or {},
+                active=(self._available_mode_ids or {}).get(mode))
+        self._modes_refresh = time.time()
+
+
+class ArloBaseStation(ArloBaseStationBase):
+    """Arlo Base Station module implementation."""
+
+    def __init__(self, name, attrs, session_token, arlo_session,
+                 refresh_rate=REFRESH_RATE, event_buffer=None):
+        """Initialize Arlo Base Station object.
 
+        :param name: Base Station name
+        :param attrs: Attributes
+        :param session_token: Session token passed by camera class
+        :param arlo_session: PyArlo shared session
+        :param refresh_rate: Attributes refresh rate. Defaults to 15
+        :param event_buffer: <ArloEventBuffer> keeping unclaimed events
+        """
+        super(ArloBaseStation, self).__init__(
+            name, attrs, session_token, arlo_session, refresh_rate)
+        self.__events = event_buffer if event_buffer is not None \
+            else ArloEventBuffer()
+        self.__lock = threading.Lock()
+        self.__waiters = {}
+        self.__trans_waiters = {}
+
+    def _receive_event(self, event):
+        """Complete the reads waiting for an event routed by the hub.
+
+        The event is first merged into the cached state. It completes the
+        read that published its transId and every read of its resource.
+        Unclaimed events are kept in the queue.
+        """
+        self._apply_event(event)
+        with self.__lock:
+            futures = self.__waiters.pop(event.get('resource'), [])
+            future = self.__trans_waiters.get(event.get('transId'))
+            if future is not None and future not in futures:
+                futures.append(future)
+            for future in futures:
+                self.__trans_waiters.pop(future.trans_id, None)
+                if future.resource in self.__waiters:
+                    self.__waiters[future.resource].remove(future)
+                    if not self.__waiters[future.resource]:
+                        del self.__waiters[future.resource]
+        if not futures:
+            dropped = self.__events.append(event)
+            if dropped:
+                self._session.metrics.incr('events_dropped', dropped)
+
+        for future in futures:
+            future.set_result(event)
+
+    def _add_waiter(self, future):
+        """Register a read waiting for an event."""
+        with self.__lock:
+            self.__waiters.setdefault(future.resource, []).append(future)
+            self.__trans_waiters[future.trans_id] = future
+
+    def _remove_waiter(self, future):
+        """Forget a read, e.g. after its timeout."""
+        with self.__lock:
+            self.__trans_waiters.pop(future.trans_id, None)
+            waiters = self.__waiters.get(future.resource, [])
+            if future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self.__waiters[future.resource]
+
+    def register_callback(self, callback, key=None):
+        """Call callback(base, resource, properties) on changes.
+
+        Callbacks run on the event stream thread. The event stream is
+        kept open until every callback is unregistered.
+
+        :param callback: Function to call
+        :param key: Resource or property to watch, e.g. 'mode' or
+                    'ambient'. Default: every change
+        """
+        hub = self._session.event_hub
+        hub.add_callback(self, callback, key)
+        hub.hold(self)
+
+    def unregister_callback(self, callback):
+        """Stop calling callback on changes."""
+        hub = self._session.event_hub
+        for _ in range(hub.remove_callback(self, callback)):
+            hub.release()
+
+    @property
+    def pending_events(self):
+        """Return number of received events not yet consumed."""
+        return len(self.__events)
+
+    @property
+    def dropped_events(self):
+        """Return number of unclaimed events dropped by the buffer."""
+        return self.__events.dropped
+
+    def pop_events(self):
+        """Return and remove the received events nobody was waiting for.
+
+        Events pushed by the base station, e.g. motion or mode changes,
+        are kept while the stream is open, oldest first.
+        """
+        return self.__events.pop_all()
+
+    def _get_event_stream(self):
+        """Attach to the Arlo Event Stream shared by the session.
+
+        The hub opens the stream if needed and subscribes this base station.
+        Every call must be paired with _close_event_stream().
+        """
+        return self._session.event_hub.acquire(self)
+
+    def _subscribe_myself(self):
+        """Subscribe this base station for all events."""
+        return self.publish(
+            action='set',
+            resource='subscribe',
+            mode=None,
+            publish_response=False)
+
+    def _close_event_stream(self):
+        """Detach from the Event stream, closing it if no longer used."""
+        if self._session.event_hub.release():
+            self.__events.clear()
+
+    def publish_and_get_event(self, resource, timeout=EVENT_TIMEOUT):
+        """Publish and get the event from base station.
+
+        :param resource: Resource to fetch
+        :param timeout: Seconds to wait for the event
+        """
+        return self.publish_and_get_events([resource], timeout).get(resource)
+
+    def publish_and_get_events(self, resources, timeout=EVENT_TIMEOUT):
+        """Publish the gets of several resources and collect their events.
+
+        Every get is published before waiting, so the events are awaited
+        concurrently and the call takes as long as the slowest resource.
+
+        :param resources: List of resources to fetch
+        :param timeout: Seconds to wait for all the events
+        :returns: Dictionary of resource to event, None if not received
+        """
+        l_subscribed = False
+        events = dict.fromkeys(resources)
+
+        # every read holds the stream, so a concurrent read finishing
+        # first does not close it under this one
+        if self._session.event_hub.persistent:
+            self._session.event_hub.subscribe(self)
+        else:
+            self._get_event_stream()
+            l_subscribed = True
+
+        try:
+            futures = []
+            for resource in events:
+                # registered before publishing, the event may beat the response
+                future = ArloEventFuture(resource, self._next_trans_id())
+                self._add_waiter(future)
+                status = self.publish(
+                    action='get',
+                    resource=resource,
+                    mode=None,
+                    publish_response=False,
+                    trans_id=future.trans_id)
+                if status == 'success':
+                    futures.append(future)
+                else:
+                    self._remove_waiter(future)
+
+            started = time.time()
+            deadline = started + timeout
+            for future in futures:
+                event = future.result(max(0, deadline - time.time()))
+                events[future.resource] = event
+                _LOGGER.debug("Event for resource %s: %s", future.resource,
+                              event is not None)
+                self._session.metrics.record_event_wait(
+                    future.resource,
+                    (future.received or time.time()) - started,
+                    event is not None)
+                self._remove_waiter(future)
+        finally:
+            if l_subscribed:
+                self._close_event_stream()
+
+        return events
+
+    def publish(
+            self,
+            action='get',
+            resource=None,
+            camera_id=None,
+            mode=None,
+            publish_response=None,
+            properties=None,
+            trans_id=None):
+        """Run action.
+
+        :param method: Specify the method GET, POST or PUT. Default is GET.
+        :param resource: Specify one of the resources to fetch from arlo.
+        :param camera_id: Specify the camera ID involved with this action
+        :param mode: Specify the mode to set, else None for GET operations
+        :param publish_response: Set to True for SETs. Default False
+        :param trans_id: transId echoed by the event. Default unique
+        """
+        mode_ids = None
+        if action != 'get' and resource == 'modes':
+            mode_ids = self.available_modes_with_ids
+
+        url, body = self._publish_body(
+            action, resource, camera_id, mode, publish_response,
+            properties, mode_ids, trans_id)
+
+        ret = \
+            self._session.query(url, method='POST', extra_params=body,
+                                extra_headers={"xCloudId": self.xcloud_id},
+                                idempotent=(action == 'get'))
+
+        if ret and ret.get('success'):
+            return 'success'
+
+        return None
+
+    @property
+    def available_modes(self):
+        """Return list of available mode names."""
+        if not self._available_modes:
+            modes = self.available_modes_with_ids
+            if not modes:
+                return None
+            self._available_modes = list(modes.keys())
+        return self._available_modes
+
+    @property
+    def available_modes_with_ids(self):
+        """Return list of objects containing available mode name and id."""
+        if not self._available_mode_ids:
+            self.get_modes_state()
+        if not self._available_mode_ids:
+            self._available_mode_ids = self._parse_mode_ids(None)
+        return self._available_mode_ids
+
+    @property
+    def mode(self):
+        """Return current mode key.
+
+        Served from the modes state cached by get_modes_state() and kept
+        current by the events.
+        """
+        if not self._modes_cached:
+            self.get_modes_state()
+        if self.is_in_schedule_mode:
+            return "schedule"
+        return self._parse_active_mode(self._modes_properties)
+
+    @property
+    def _modes_cached(self):
+        """Return True if the cached modes state can be trusted."""
+        if self._modes_properties is None or \
+                self._schedule_properties is None:
+            return False
+        if self._session.event_hub.is_subscribed(self):
+            return True
+        return self._modes_refresh is not None and \
+            time.time() < self._modes_refresh + self._refresh_rate
+
+    def get_modes_state(self):
+        """Fetch the modes and the schedule in one round-trip.
+
+        Both events are cached, a missing one counts as empty.
+        """
+        events = self.publish_and_get_events(['modes', 'schedule'])
+        for event in events.values():
+            if event:
+                self._apply_event(event)
+        if self._modes_properties is None:
+            self._modes_properties = {}
+        if self._schedule_properties is None:
+            self._schedule_properties = {}
+        self._modes_refresh = time.time()
+
+    @property
+    def is_in_schedule_mode(self):
+        """Returns True if base_station is currently on a scheduled mode."""
+        if not self._modes_cached:
+            self.get_modes_state()
+        return bool(self._schedule_properties.get("active", False))
+
+    def get_available_modes(self):
+        """Return a list of available mode objects for an Arlo user."""
+        resource = "modes"
+        resource_event = self.publish_and_get_event(resource)
+        if resource_event:
+            properties = resource_event.get("properties")
+            return properties.get("modes")
+
+        return None
+
+    @property
+    def camera_properties(self):
+        """Return _camera_properties"""
+        if self._camera_properties is None:
+            self.get_cameras_properties()
+        return self._camera_properties
+
+    def get_cameras_properties(self):
+        """Return camera properties."""
+        resource = "cameras"
+        resource_event = self.publish_and_get_event(resource)
+        self._set_cameras_properties(resource_event)
+
+    @property
+    def camera_extended_properties(self):
+        """Return _camera_extended_properties."""
+        if self._camera_extended_properties is None:
+            self.get_camera_extended_properties()
+        return self._camera_extended_properties
+
+    def get_camera_extended_properties(self):
+        """Return camera extended properties."""
+        resource = self._extended_properties_resource
+        resource_event = self.publish_and_get_event(resource)
+        return self._set_camera_extended_properties(resource_event)
+
+    @property
+    def properties(self):
+        """Return the base station info."""
+        resource = "basestation"
+        basestn_event = self.publish_and_get_event(resource)
+        if basestn_event:
+            return basestn_event.get('properties')
+
+        return None
+
+    def get_cameras_rules(self):
+        """Return the camera rules."""
+        resource = "rules"
+        rules_event = self.publish_and_get_event(resource)
+        if rules_event:
+            return rules_event.get('properties')
+
+        return None
+
+    def get_cameras_schedule(self):
+        """Return the schedule set for cameras."""
+        resource = "schedule"
+        schedule_event = self.publish_and_get_event(resource)
+        if schedule_event:
+            return schedule_event.get('properties')
+
+        return None
+
+    @property
+    def is_motion_detection_enabled(self):
+        """Return Boolean if motion is enabled."""
+        return self.mode == "armed"
+
+    @property
+    def ambient_sensor_data(self):
+        """Return _ambient_sensor_data"""
         if self._ambient_sensor_data is None:
-            return None
+            self.get_ambient_sensor_data()
+        return self._ambient_sensor_data
 
-        return self._ambient_sensor_data[-1].get(statistic)
+    def get_ambient_sensor_data(self):
+        """Refresh ambient sensor history"""
+        resource = self._ambient_sensors_resource
+        history_event = self.publish_and_get_event(resource)
+        return self._set_ambient_sensor_data(history_event)
 
     def get_audio_playback_status(self):
         """Gets the current playback status and available track list"""
@@ -716,12 +959,10 @@ class ArloBaseStation(object):
     def subscribe(self):
         """Subscribe this session with Arlo system."""
         self._get_event_stream()
-        self._subscribe_myself()
 
     @property
     def unsubscribe(self):
         """Unsubscribe this session."""
-        self._unsubscribe_myself()
         self._close_event_stream()
 
     @mode.setter
@@ -733,12 +974,13 @@ class ArloBaseStation(object):
         modes = self.available_modes
         if (not modes) or (mode not in modes):
             return
-        self.publish(
+        status = self.publish(
             action='set',
             resource='modes' if mode != 'schedule' else 'schedule',
             mode=mode,
             publish_response=True)
-        self.update()
+        if status == 'success':
+            self._apply_mode(mode)
 
     def set_camera_enabled(self, camera_id, is_enabled):
         """Turn Arlo camera On/Off.
@@ -759,9 +1001,13 @@ class ArloBaseStation(object):
         last_refresh = 0 if self._last_refresh is None else self._last_refresh
 
         if current_time >= (last_refresh + self._refresh_rate):
-            self.get_cameras_properties()
-            self.get_ambient_sensor_data()
-            self.get_camera_extended_properties()
+            cameras = 'cameras'
+            ambient = self._ambient_sensors_resource
+            extended = self._extended_properties_resource
+            events = self.publish_and_get_events([cameras, ambient, extended])
+            self._set_cameras_properties(events.get(cameras))
+            self._set_ambient_sensor_data(events.get(ambient))
+            self._set_camera_extended_properties(events.get(extended))
             self._attrs = self._session.refresh_attributes(self.name)
             self._attrs = assert_is_dict(self._attrs)
             _LOGGER.debug("Called base station update of camera properties: "
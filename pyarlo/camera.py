@@ -11,8 +11,12 @@ from pyarlo.utils import assert_is_dict
 _LOGGER = logging.getLogger(__name__)
 
 
-class ArloCamera(object):
-    """Arlo Camera module implementation."""
+class ArloCameraBase(object):
+    """Attributes and cached properties shared by the Arlo cameras.
+
+    Nothing here queries the cloud, the properties are read from the
+    device attributes and the camera properties of the base station.
+    """
 
     def __init__(self, name, attrs, arlo_session,
                  min_days_vdo_cache=PRELOAD_DAYS):
@@ -26,7 +30,6 @@ class ArloCamera(object):
         self.name = name
         self._attrs = attrs
         self._session = arlo_session
-        self._cached_videos = None
         self._min_days_vdo_cache = min_days_vdo_cache
 
         # make sure self._attrs is a dict
@@ -57,6 +60,7 @@ class ArloCamera(object):
         self._min_days_vdo_cache = value
 
     # pylint: disable=invalid-name
+
     @property
     def device_id(self):
         """Return device_id."""
@@ -125,12 +129,6 @@ class ArloCamera(object):
             return self._attrs.get('mediaObjectCount')
         return None
 
-    def unseen_videos_reset(self):
-        """Reset the unseen videos counter."""
-        url = RESET_CAM_ENDPOINT.format(self.unique_id)
-        ret = self._session.query(url).get('success')
-        return ret
-
     @property
     def user_role(self):
         """Return userRole."""
@@ -138,73 +136,6 @@ class ArloCamera(object):
             return self._attrs.get('userRole')
         return None
 
-    @property
-    def last_image(self):
-        """Return last image captured by camera."""
-        if self._attrs is not None:
-            return http_get(self._attrs.get('presignedLastImageUrl'))
-        return None
-
-    @property
-    def last_image_from_cache(self):
-        """
-        Return last thumbnail present in self._cached_images.
-
-        This is useful in Home Assistant when the ArloHub has not
-        updated all information, but the camera.arlo already pulled
-        the last image. Using this method, everything is kept synced.
-        """
-        if self.last_video:
-            return http_get(self.last_video.thumbnail_url)
-        return None
-
-    @property
-    def last_video(self):
-        """Return the last <ArloVideo> object from camera."""
-        if self._cached_videos is None:
-            self.make_video_cache()
-
-        if self._cached_videos:
-            return self._cached_videos[0]
-        return None
-
-    def make_video_cache(self, days=None):
-        """Save videos on _cache_videos to avoid dups."""
-        if days is None:
-            days = self._min_days_vdo_cache
-        self._cached_videos = self.videos(days)
-
-    def videos(self, days=None):
-        """
-        Return all <ArloVideo> objects from camera given days range
-
-        :param days: number of days to retrieve
-        """
-        if days is None:
-            days = self._min_days_vdo_cache
-        library = ArloMediaLibrary(self._session, preload=False)
-        try:
-            return library.load(only_cameras=[self], days=days)
-        except (AttributeError, IndexError):
-            # make sure we are returning an empty list istead of None
-            # returning an empty list, cache will be forced only when calling
-            # the update method. Changing this can impact badly
-            # in the Home Assistant performance
-            return []
-
-    @property
-    def captured_today(self):
-        """Return list of <ArloVideo> object captured today."""
-        if self._cached_videos is None:
-            self.make_video_cache()
-
-        return [vdo for vdo in self._cached_videos if vdo.created_today]
-
-    def play_last_video(self):
-        """Play last <ArloVideo> recorded from camera."""
-        video = self.last_video
-        return video.download_video()
-
     @property
     def xcloud_id(self):
         """Return X-Cloud-ID attribute."""
@@ -332,6 +263,130 @@ class ArloCamera(object):
 
         return None
 
+    @property
+    def snapshot_url(self):
+        """Return the snapshot url."""
+        # Snapshot should be scheduled first.  It will
+        # available a couple seconds after.
+        # If a GET request fails on this URL, trying
+        # again is logical since the snapshot isn't
+        # taken immediately.  Snapshots will be cached for a
+        # predefined amount of time.
+        return self._attrs.get('presignedFullFrameSnapshotUrl')
+
+
+class ArloCamera(ArloCameraBase):
+    """Arlo Camera module implementation."""
+
+    def __init__(self, name, attrs, arlo_session,
+                 min_days_vdo_cache=PRELOAD_DAYS):
+        """Initialize Arlo camera object.
+
+        :param name: Camera name
+        :param attrs: Camera attributes
+        :param arlo_session: PyArlo shared session
+        :param min_days_vdo_cache: min. days to preload in video cache
+        """
+        super(ArloCamera, self).__init__(
+            name, attrs, arlo_session, min_days_vdo_cache)
+        self._cached_videos = None
+        self._video_library = None
+
+    def unseen_videos_reset(self):
+        """Reset the unseen videos counter."""
+        url = RESET_CAM_ENDPOINT.format(self.unique_id)
+        ret = self._session.query(url).get('success')
+        return ret
+
+    @property
+    def last_image(self):
+        """Return last image captured by camera."""
+        if self._attrs is not None:
+            return http_get(self._attrs.get('presignedLastImageUrl'),
+                            session=self._session.session)
+        return None
+
+    @property
+    def last_image_from_cache(self):
+        """
+        Return last thumbnail present in self._cached_images.
+
+        This is useful in Home Assistant when the ArloHub has not
+        updated all information, but the camera.arlo already pulled
+        the last image. Using this method, everything is kept synced.
+        """
+        if self.last_video:
+            return http_get(self.last_video.thumbnail_url,
+                            session=self._session.session)
+        return None
+
+    @property
+    def last_video(self):
+        """Return the last <ArloVideo> object from camera."""
+        if self._cached_videos is None:
+            self.make_video_cache()
+
+        if self._cached_videos:
+            return self._cached_videos[0]
+        return None
+
+    def make_video_cache(self, days=None, videos=None):
+        """Save videos on _cache_videos to avoid dups.
+
+        Only the videos recorded since the last call are downloaded.
+
+        :param days: number of days to keep
+        :param videos: <ArloVideo> objects of this camera already fetched,
+                       cached as they are. See PyArlo.sync_videos()
+        """
+        if videos is not None:
+            self._cached_videos = videos
+            return
+        if days is None:
+            days = self._min_days_vdo_cache
+        if self._video_library is None:
+            self._video_library = ArloMediaLibrary(
+                self._session, preload=False,
+                index=getattr(self._session, 'media_index', None))
+        try:
+            self._video_library.sync(days, only_cameras=[self])
+            self._cached_videos = self._video_library.videos
+        except (AttributeError, IndexError):
+            # keep the cache of the last sync, see videos()
+            if self._cached_videos is None:
+                self._cached_videos = []
+
+    def videos(self, days=None):
+        """
+        Return all <ArloVideo> objects from camera given days range
+
+        :param days: number of days to retrieve
+        """
+        if days is None:
+            days = self._min_days_vdo_cache
+        library = ArloMediaLibrary(self._session, preload=False)
+        try:
+            return library.load(only_cameras=[self], days=days)
+        except (AttributeError, IndexError):
+            # make sure we are returning an empty list istead of None
+            # returning an empty list, cache will be forced only when calling
+            # the update method. Changing this can impact badly
+            # in the Home Assistant performance
+            return []
+
+    @property
+    def captured_today(self):
+        """Return list of <ArloVideo> object captured today."""
+        if self._cached_videos is None:
+            self.make_video_cache()
+
+        return [vdo for vdo in self._cached_videos if vdo.created_today]
+
+    def play_last_video(self):
+        """Play last <ArloVideo> recorded from camera."""
+        video = self.last_video
+        return video.download_video()
+
     def live_streaming(self):
         """Return live streaming generator."""
         url = STREAM_ENDPOINT
@@ -360,17 +415,6 @@ class ArloCamera(object):
             return ret.get('data').get('url')
         return ret.get('data')
 
-    @property
-    def snapshot_url(self):
-        """Return the snapshot url."""
-        # Snapshot should be scheduled first.  It will
-        # available a couple seconds after.
-        # If a GET request fails on this URL, trying
-        # again is logical since the snapshot isn't
-        # taken immediately.  Snapshots will be cached for a
-        # predefined amount of time.
-        return self._attrs.get('presignedFullFrameSnapshotUrl')
-
     def schedule_snapshot(self):
         """Trigger snapshot to be uploaded to AWS.
         Return success state."""
@@ -404,6 +448,30 @@ class ArloCamera(object):
 
         return ret is not None and ret.get('success')
 
+    def register_callback(self, callback, key=None):
+        """Call callback(camera, resource, properties) on changes.
+
+        Callbacks run on the event stream thread. The event stream of
+        the base station is kept open until every callback is
+        unregistered.
+
+        :param callback: Function to call
+        :param key: Resource or property to watch, e.g. 'battery',
+                    'motion' or 'connection'. Default: every change
+        """
+        hub = self._session.event_hub
+        hub.add_callback(self, callback, key)
+        if self.base_station:
+            hub.hold(self.base_station)
+
+    def unregister_callback(self, callback):
+        """Stop calling callback on changes."""
+        hub = self._session.event_hub
+        removed = hub.remove_callback(self, callback)
+        if self.base_station:
+            for _ in range(removed):
+                hub.release()
+
     def update(self):
         """Update object properties."""
         self._attrs = self._session.refresh_attributes(self.name)
@@ -2,6 +2,7 @@
 
 # API Endpoints
 API_URL = "https://my.arlo.com"
+AUTH_URL = "https://ocapi-app.arlo.com"
 
 DEVICE_SUPPORT_ENDPOINT = API_URL + "/hmsweb/devicesupport/v2"
 SUBSCRIBE_ENDPOINT = API_URL + "/hmsweb/client/subscribe"
@@ -10,7 +11,7 @@ BILLING_ENDPOINT = API_URL + "/hmsweb/users/serviceLevel/v2"
 DEVICES_ENDPOINT = API_URL + "/hmsweb/users/devices"
 FRIENDS_ENDPOINT = API_URL + "/hmsweb/users/friends"
 LIBRARY_ENDPOINT = API_URL + "/hmsweb/users/library"
-LOGIN_ENDPOINT = "https://ocapi-app.arlo.com/api/auth"
+LOGIN_ENDPOINT = AUTH_URL + "/api/auth"
 LOGOUT_ENDPOINT = API_URL + "/hmsweb/logout"
 NOTIFY_ENDPOINT = API_URL + "/hmsweb/users/devices/notify/{0}"
 PROFILE_ENDPOINT = API_URL + "/hmsweb/users/profile"
@@ -22,6 +23,68 @@ SNAPSHOTS_ENDPOINT = API_URL + "/hmsweb/users/devices/fullFrameSnapshot"
 # number of days to preload video
 PRELOAD_DAYS = 30
 
+# preload the video library on first access or on a background thread
+PRELOAD_LAZY = 'lazy'
+PRELOAD_BACKGROUND = 'background'
+
+# seconds a fetched device list is shared by device refreshes
+DEVICES_TTL = 5
+
+# seconds publish_and_get_event() waits for the base station event
+EVENT_TIMEOUT = 10
+
+# events kept per base station when nobody waits for them and the
+# policy applied when full: drop the oldest event or keep only the
+# latest event of each resource
+EVENT_BUFFER_SIZE = 100
+EVENT_DROP_OLDEST = 'drop_oldest'
+EVENT_COALESCE = 'coalesce'
+
+# friendly names of the resources and properties callbacks can watch
+CALLBACK_KEYS = {
+    'mode': 'modes',
+    'battery': 'batteryLevel',
+    'signal': 'signalStrength',
+    'motion': 'motionDetected',
+    'connection': 'connectionState',
+    'ambient': 'ambientSensors',
+}
+
+# seconds to wait for the event stream to connect
+EVENT_STREAM_TIMEOUT = 5
+
+# seconds the event stream may stay silent, keepalive pings included,
+# before it is considered stalled and reconnected
+EVENT_STREAM_READ_TIMEOUT = 90
+
+# seconds between subscription renewals of a persistent event stream
+EVENT_HEARTBEAT = 60
+
+# base and max seconds to wait before reconnecting a dropped event stream
+EVENT_RECONNECT_BACKOFF = 1
+EVENT_RECONNECT_MAX_BACKOFF = 60
+
+# HTTP connection pool shared by API queries and media downloads
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 10
+
+# upper bounds in seconds of the latency histograms
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# default port of the Prometheus metrics exporter
+EXPORTER_PORT = 9888
+
+# session token lifetime when not reported by the login endpoint
+TOKEN_EXPIRATION = 3600 * 12
+TOKEN_EXPIRATION_MARGIN = 300
+TOKEN_CACHE_ITERATIONS = 100000
+
+# query retry policy
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_MAX_BACKOFF = 30
+RETRY_METHODS = ('GET', 'PUT', 'DELETE')
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
 # modes not returned with the Arlo API's available modes
 FIXED_MODES = {
     'schedule': 'true'
@@ -0,0 +1,162 @@
+# coding: utf-8
+"""Asynchronous iterator over the event stream of a PyArlo session.
+
+Requires Python 3.5+ but no optional package: the events are read by
+the ArloEventHub thread and handed over to the asyncio event loop.
+"""
+import asyncio
+import logging
+
+from pyarlo.const import EVENT_BUFFER_SIZE
+from pyarlo.events import ArloEventHub
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _as_set(value):
+    """Return a filter value as a frozenset, None matching everything."""
+    if value is None:
+        return None
+    if isinstance(value, (str, bytes)) or hasattr(value, 'device_id'):
+        value = [value]
+    return frozenset(getattr(item, 'device_id', item) for item in value)
+
+
+class ArloEventIterator(object):
+    """Asynchronous iterator over the events of a PyArlo session.
+
+    Events are filtered on the stream thread of the ArloEventHub and
+    handed to the event loop with call_soon_threadsafe, so no thread or
+    polling is needed on the asyncio side:
+
+        async with arlo.events(resource='modes') as events:
+            async for event in events:
+                ...
+
+    Once maxsize events are waiting, the oldest ones are dropped.
+    """
+
+    def __init__(self, arlo_session, device=None, resource=None,
+                 action=None, maxsize=EVENT_BUFFER_SIZE, loop=None):
+        """Initialize the iterator.
+
+        :param arlo_session: PyArlo shared session
+        :param device: Device, deviceId or list of them to keep events of
+        :param resource: Resource or list of resources to keep events of,
+                         'cameras' also matching 'cameras/<deviceId>'
+        :param action: Action or list of actions to keep, e.g. 'is'
+        :param maxsize: Number of events kept until they are consumed
+        :param loop: Event loop to deliver to. Default: the current one
+        """
+        self._session = arlo_session
+        self._hub = arlo_session.event_hub
+        self._devices = _as_set(device)
+        self._resources = _as_set(resource)
+        self._actions = _as_set(action)
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize)
+        self._stations = []
+        self._opened = False
+        self._closed = False
+        self.dropped = 0
+
+    def __repr__(self):
+        """Representation string of object."""
+        return "<{0}: {1} pending>".format(
+            self.__class__.__name__, self._queue.qsize())
+
+    def matches(self, event):
+        """Return True if event passes the device, resource and action."""
+        if self._actions is not None and \
+                event.get('action') not in self._actions:
+            return False
+
+        if self._resources is not None:
+            segments = (event.get('resource') or '').split('/')
+            if not any('/'.join(segments[:i]) in self._resources
+                       for i in range(1, len(segments) + 1)):
+                return False
+
+        if self._devices is not None:
+            devices = set([event.get('from')])
+            devices.update(change[0]
+                           for change in ArloEventHub.changes(event))
+            if self._devices.isdisjoint(devices):
+                return False
+        return True
+
+    async def open(self):
+        """Subscribe the base stations and start receiving events."""
+        if self._opened:
+            return
+        self._opened = True
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+        self._hub.add_listener(self._listener)
+        # connecting the stream blocks, keep it off the event loop
+        await self._loop.run_in_executor(None, self._acquire)
+
+    def _acquire(self):
+        """Subscribe every base station of the session to the stream."""
+        for base in self._session.base_stations:
+            self._hub.hold(base)
+            self._stations.append(base)
+
+    def _release(self):
+        """Release the subscriptions taken by _acquire()."""
+        while self._stations:
+            self._stations.pop()
+            self._hub.release()
+
+    async def close(self):
+        """Stop receiving events and end the iteration."""
+        if self._closed:
+            return
+        self._closed = True
+        self._hub.remove_listener(self._listener)
+        if self._opened:
+            await self._loop.run_in_executor(None, self._release)
+        self._deliver(None)
+
+    def _listener(self, event):
+        """Hand a matching event to the event loop. Stream thread."""
+        if self._closed or not self.matches(event):
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._deliver, event)
+        except RuntimeError:
+            # the event loop is closed
+            self._hub.remove_listener(self._listener)
+
+    def _deliver(self, event):
+        """Queue an event, dropping the oldest one when full."""
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(event)
+
+    def __aiter__(self):
+        """Return the iterator."""
+        return self
+
+    async def __anext__(self):
+        """Return the next matching event."""
+        if not self._opened:
+            await self.open()
+        if self._closed and self._queue.empty():
+            raise StopAsyncIteration
+        event = await self._queue.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+    async def __aenter__(self):
+        """Open the iterator."""
+        await self.open()
+        return self
+
+    async def __aexit__(self, *args):
+        """Close the iterator."""
+        await self.close()
+
+# vim:sw=4:ts=4:et:
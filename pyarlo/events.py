@@ -0,0 +1,562 @@
+# coding: utf-8
+"""Implementation of the Arlo event stream shared by the base stations."""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+import sseclient
+
+from pyarlo.const import (
+    CALLBACK_KEYS, EVENT_BUFFER_SIZE, EVENT_COALESCE, EVENT_DROP_OLDEST,
+    EVENT_HEARTBEAT, EVENT_RECONNECT_BACKOFF, EVENT_RECONNECT_MAX_BACKOFF,
+    EVENT_STREAM_READ_TIMEOUT, EVENT_STREAM_TIMEOUT, SUBSCRIBE_ENDPOINT,
+    UNSUBSCRIBE_ENDPOINT)
+from pyarlo.retry import RetryPolicy
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ArloEventBuffer(object):
+    """Bounded queue of the events nobody was waiting for."""
+
+    def __init__(self, capacity=EVENT_BUFFER_SIZE, policy=EVENT_DROP_OLDEST):
+        """Initialize the buffer.
+
+        :param capacity: Max number of events kept
+        :param policy: EVENT_DROP_OLDEST to drop the oldest event when
+                       full or EVENT_COALESCE to keep only the latest
+                       event of each resource
+        """
+        if policy not in (EVENT_DROP_OLDEST, EVENT_COALESCE):
+            raise ValueError("Unknown event buffer policy: %s" % policy)
+        self.capacity = capacity
+        self.policy = policy
+        self.dropped = 0
+        self._lock = threading.Lock()
+        if policy == EVENT_COALESCE:
+            self._events = OrderedDict()
+        else:
+            self._events = deque()
+
+    def __repr__(self):
+        """Representation string of object."""
+        return "<{0}: {1}/{2} {3}>".format(self.__class__.__name__,
+                                           len(self), self.capacity,
+                                           self.policy)
+
+    def __len__(self):
+        """Return number of buffered events."""
+        return len(self._events)
+
+    def __iter__(self):
+        """Iterate over a copy of the buffered events, oldest first."""
+        with self._lock:
+            if self.policy == EVENT_COALESCE:
+                return iter(list(self._events.values()))
+            return iter(list(self._events))
+
+    def append(self, event):
+        """Buffer an event and return the number of events dropped."""
+        dropped = 0
+        with self._lock:
+            if self.policy == EVENT_COALESCE:
+                resource = event.get('resource')
+                if resource in self._events:
+                    del self._events[resource]
+                    dropped += 1
+                self._events[resource] = event
+                while len(self._events) > self.capacity:
+                    self._events.popitem(last=False)
+                    dropped += 1
+            else:
+                self._events.append(event)
+                while len(self._events) > self.capacity:
+                    self._events.popleft()
+                    dropped += 1
+            self.dropped += dropped
+        return dropped
+
+    def pop_all(self):
+        """Return and remove the buffered events, oldest first."""
+        with self._lock:
+            if self.policy == EVENT_COALESCE:
+                events = list(self._events.values())
+            else:
+                events = list(self._events)
+            self._events.clear()
+        return events
+
+    def clear(self):
+        """Drop the buffered events without counting them."""
+        with self._lock:
+            self._events.clear()
+
+
+class ArloEventFuture(object):
+    """Event awaited by a publish_and_get_event() call."""
+
+    def __init__(self, resource, trans_id=None):
+        """Initialize the future.
+
+        :param resource: Resource the event is expected for
+        :param trans_id: transId of the publish the event answers
+        """
+        self.resource = resource
+        self.trans_id = trans_id
+        self.event = None
+        self.received = None
+        self._done = threading.Event()
+
+    def __repr__(self):
+        """Representation string of object."""
+        return "<{0}: {1} {2}>".format(self.__class__.__name__,
+                                       self.resource, self.trans_id)
+
+    def done(self):
+        """Return True once the event arrived."""
+        return self._done.is_set()
+
+    def set_result(self, event):
+        """Complete the future with an event."""
+        self.received = time.time()
+        self.event = event
+        self._done.set()
+
+    def result(self, timeout=None):
+        """Return the event or None if it did not arrive in time."""
+        self._done.wait(timeout)
+        return self.event
+
+
+class ArloEventHub(object):
+    """Single event stream of a PyArlo session.
+
+    Arlo sends the events of every device of the account on the same
+    stream, so one connection and one thread are shared by all base
+    stations and each event is routed to its base station.
+
+    By default the stream is opened for each read and closed once no
+    base station is waiting. A persistent hub keeps the stream and the
+    base station subscriptions open, sending the subscription again
+    every heartbeat seconds, until close() is called.
+
+    A stream dropped while still in use is reconnected with exponential
+    backoff and jitter, resuming from the last received event id. So is
+    a stream silent for longer than read_timeout, e.g. half-open.
+    """
+
+    def __init__(self, arlo_session, persistent=False,
+                 heartbeat=EVENT_HEARTBEAT,
+                 reconnect_backoff=EVENT_RECONNECT_BACKOFF,
+                 reconnect_max_backoff=EVENT_RECONNECT_MAX_BACKOFF,
+                 read_timeout=EVENT_STREAM_READ_TIMEOUT):
+        """Initialize the event hub.
+
+        :param arlo_session: PyArlo shared session
+        :param persistent: Boolean to keep the stream open between reads
+        :param heartbeat: Seconds between subscription renewals
+        :param reconnect_backoff: Base delay in seconds before
+                                  reconnecting a dropped stream
+        :param reconnect_max_backoff: Upper bound of the reconnect delay
+        :param read_timeout: Seconds without data, keepalive pings
+                             included, before the stream is reconnected
+        """
+        self._session = arlo_session
+        self.persistent = persistent
+        self.heartbeat = heartbeat
+        self.read_timeout = read_timeout
+        self._lock = threading.Lock()
+        self._stations = {}
+        self._callbacks = {}
+        self._listeners = []
+        self._subscribed = set()
+        self._users = 0
+        self._generation = 0
+        self._thread = None
+        self._heartbeat_thread = None
+        self._closing = threading.Event()
+        self._stopped = threading.Event()
+        self._ready = threading.Event()
+        self._reconnect = RetryPolicy(backoff_factor=reconnect_backoff,
+                                      max_backoff=reconnect_max_backoff)
+        self.last_event_id = None
+        self.connected = False
+
+    def __repr__(self):
+        """Representation string of object."""
+        return "<{0}: {1} base stations>".format(
+            self.__class__.__name__, len(self._stations))
+
+    @property
+    def subscribed(self):
+        """Return True while the stream is wanted by a base station."""
+        return self._users > 0
+
+    def register(self, base_station):
+        """Route the events of base_station to it."""
+        with self._lock:
+            self._stations[base_station.device_id] = base_station
+
+    def unregister(self, base_station):
+        """Stop routing events to base_station."""
+        with self._lock:
+            self._stations.pop(base_station.device_id, None)
+
+    def _is_alive(self):
+        """Return True if the stream thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def is_subscribed(self, base_station):
+        """Return True if base_station receives events on a live stream."""
+        return self._is_alive() and \
+            base_station.device_id in self._subscribed
+
+    def subscribe(self, base_station, timeout=EVENT_STREAM_TIMEOUT):
+        """Keep base_station subscribed on the persistent stream.
+
+        Opens the stream and subscribes base_station on first use or
+        after the stream was closed, else returns immediately.
+
+        :param base_station: <ArloBaseStation> to receive events for
+        :param timeout: Seconds to wait for the stream to connect
+        """
+        if self.is_subscribed(base_station):
+            return True
+
+        self.register(base_station)
+        with self._lock:
+            self._closing.clear()
+            if not self._is_alive():
+                self._start()
+        self._ready.wait(timeout)
+
+        if not self._subscribe_station(base_station):
+            return False
+
+        self._start_heartbeat()
+        return self.connected
+
+    def _start_heartbeat(self):
+        """Spawn the thread renewing the subscriptions if not running."""
+        with self._lock:
+            if self._heartbeat_thread is None or \
+                    not self._heartbeat_thread.is_alive():
+                self._heartbeat_thread = threading.Thread(
+                    target=self.heartbeat_function, name='ArloEventHeartbeat')
+                self._heartbeat_thread.daemon = True
+                self._heartbeat_thread.start()
+
+    def _subscribe_station(self, base_station):
+        """Ask base_station to send its events to this stream."""
+        # pylint: disable=protected-access
+        if base_station._subscribe_myself() != 'success':
+            _LOGGER.debug("Could not subscribe %s", base_station.name)
+            return False
+        with self._lock:
+            self._subscribed.add(base_station.device_id)
+        return True
+
+    def close(self):
+        """Unsubscribe and close the stream even if persistent."""
+        with self._lock:
+            self._closing.set()
+            self._users = 0
+            self._subscribed.clear()
+            if self._thread is None:
+                return
+            self._stop()
+
+        self._session.query(UNSUBSCRIBE_ENDPOINT, method='GET', raw=True,
+                            stream=False)
+
+    def heartbeat_function(self):
+        """Renew the subscriptions until the hub is closed."""
+        while not self._closing.wait(self.heartbeat):
+            if not self._is_alive():
+                break
+            for device_id in list(self._subscribed):
+                station = self._stations.get(device_id)
+                # pylint: disable=protected-access
+                if station is not None and \
+                        station._subscribe_myself() != 'success':
+                    _LOGGER.debug("Could not renew %s subscription",
+                                  station.name)
+
+    def acquire(self, base_station, timeout=EVENT_STREAM_TIMEOUT):
+        """Open the stream if needed and route events to base_station.
+
+        :param base_station: <ArloBaseStation> waiting for events
+        :param timeout: Seconds to wait for the stream to connect
+        """
+        self.register(base_station)
+        with self._lock:
+            self._users += 1
+            if not self._is_alive():
+                self._start()
+        self._ready.wait(timeout)
+        if not self.is_subscribed(base_station):
+            self._subscribe_station(base_station)
+        return self.connected
+
+    def hold(self, base_station, timeout=EVENT_STREAM_TIMEOUT):
+        """Acquire the stream for a long lived consumer.
+
+        Like acquire(), also renewing the subscriptions every heartbeat
+        seconds until the matching release().
+
+        :param base_station: <ArloBaseStation> waiting for events
+        :param timeout: Seconds to wait for the stream to connect
+        """
+        connected = self.acquire(base_station, timeout)
+        self._start_heartbeat()
+        return connected
+
+    def release(self):
+        """Close the stream once no base station is using it."""
+        with self._lock:
+            self._users = max(0, self._users - 1)
+            if self._users or self.persistent:
+                return False
+            self._stop()
+
+        self._session.query(UNSUBSCRIBE_ENDPOINT, method='GET', raw=True,
+                            stream=False)
+        return True
+
+    def _start(self):
+        """Spawn the stream thread. Called with the lock held."""
+        self._generation += 1
+        self._subscribed.clear()
+        self._stopped.clear()
+        self._ready.clear()
+        self._thread = threading.Thread(
+            target=self.thread_function, args=(self._generation,),
+            name='ArloEventHub')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _stop(self):
+        """Detach the stream thread. Called with the lock held."""
+        self._generation += 1
+        self._subscribed.clear()
+        self._stopped.set()
+        self.connected = False
+        self._thread = None
+
+    def route(self, event):
+        """Return the base stations an event belongs to.
+
+        Events come from the base station deviceId. Events of unknown
+        senders go to the base station named in the resource, else to all.
+        """
+        station = self._stations.get(event.get('from'))
+        if station is not None:
+            return [station]
+
+        resource = event.get('resource') or ''
+        for segment in resource.split('/'):
+            station = self._stations.get(segment)
+            if station is not None:
+                return [station]
+
+        return list(self._stations.values())
+
+    def dispatch(self, event):
+        """Deliver an event received from the stream.
+
+        Base stations and callbacks get the 'is' events carrying state,
+        listeners get the events of every action.
+        """
+        if event.get('action') == 'is':
+            for station in self.route(event):
+                # pylint: disable=protected-access
+                station._receive_event(event)
+            if self._callbacks:
+                self.run_callbacks(event)
+        for listener in list(self._listeners):
+            try:
+                listener(event)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error running event listener")
+
+    def add_listener(self, listener):
+        """Call listener(event) with every event of the stream.
+
+        :param listener: Function called from the stream thread
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Stop calling listener with the events."""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def add_callback(self, device, callback, key=None):
+        """Call callback(device, resource, properties) on device changes.
+
+        :param device: <ArloBaseStation> or <ArloCamera> to watch
+        :param callback: Function called from the stream thread
+        :param key: Resource or property to watch, e.g. 'modes' or
+                    'batteryLevel', a CALLBACK_KEYS alias like 'mode' or
+                    'battery', or None for every change of the device
+        """
+        key = CALLBACK_KEYS.get(key, key)
+        with self._lock:
+            self._callbacks.setdefault(device.device_id, []).append(
+                (device, key, callback))
+
+    def remove_callback(self, device, callback):
+        """Stop calling callback on device changes.
+
+        :returns number of registrations removed
+        """
+        with self._lock:
+            registered = self._callbacks.get(device.device_id, [])
+            callbacks = [item for item in registered
+                         if item[2] != callback]
+            if callbacks:
+                self._callbacks[device.device_id] = callbacks
+            else:
+                self._callbacks.pop(device.device_id, None)
+        return len(registered) - len(callbacks)
+
+    @staticmethod
+    def changes(event):
+        """Return (deviceId, resource, properties) changed by an event.
+
+        The 'cameras' resource holds the properties of every camera of
+        the base station, 'cameras/<deviceId>' the ones of one camera and
+        other resources the ones of the base station sending the event.
+        """
+        resource = event.get('resource') or ''
+        properties = event.get('properties')
+        if resource == 'cameras' and isinstance(properties, list):
+            return [(prop.get('serialNumber'), resource, prop)
+                    for prop in properties if isinstance(prop, dict)]
+        if resource.startswith('cameras/'):
+            return [(resource.split('/')[1], resource, properties)]
+        return [(event.get('from'), resource, properties)]
+
+    def run_callbacks(self, event):
+        """Call the callbacks watching the changes of an event."""
+        for device_id, resource, properties in self.changes(event):
+            callbacks = self._callbacks.get(device_id)
+            if not callbacks:
+                continue
+            segments = resource.split('/')
+            for device, key, callback in list(callbacks):
+                if key is not None and key not in segments and \
+                        not (isinstance(properties, dict) and
+                             key in properties):
+                    continue
+                try:
+                    callback(device, resource, properties)
+                except Exception:  # pylint: disable=broad-except
+                    _LOGGER.exception("Error running %s callback",
+                                      resource)
+
+    def _wanted(self, generation):
+        """Return True while the stream of generation is still in use."""
+        return generation == self._generation and \
+            (self._users > 0 or self.persistent)
+
+    def thread_function(self, generation):
+        """Keep the event stream connected until it is closed.
+
+        Dropped streams are reconnected with backoff and jitter and the
+        base stations subscribed again, resuming after last_event_id.
+        """
+        attempt = 0
+        while True:
+            connected = self._read_stream(generation, attempt > 0)
+            if connected:
+                attempt = 0
+            if connected is None or not self._wanted(generation):
+                break
+
+            attempt += 1
+            delay = self._reconnect.backoff(attempt)
+            _LOGGER.debug("Event stream dropped, reconnecting in %.1fs",
+                          delay)
+            if self._stopped.wait(delay) or not self._wanted(generation):
+                break
+            self._session.metrics.incr('sse_reconnects')
+
+        if generation == self._generation:
+            self.connected = False
+            self._ready.set()
+
+    def _read_stream(self, generation, reconnect=False):
+        """Read one event stream connection until it ends.
+
+        Returns True if the stream connected, False if it could not and
+        None when the session was logged out.
+
+        :param generation: Stream generation the thread belongs to
+        :param reconnect: Boolean to subscribe the base stations again
+        """
+        url = SUBSCRIBE_ENDPOINT + "?token=" + self._session.token
+        headers = None
+        if self.last_event_id:
+            headers = {'Last-Event-ID': self.last_event_id}
+
+        connected = False
+        try:
+            data = self._session.query(url, method='GET', raw=True,
+                                       stream=True, extra_headers=headers,
+                                       retry=0, read_timeout=self.read_timeout)
+            if not data or not data.ok:
+                _LOGGER.debug("Did not receive a valid response.")
+                return False
+
+            client = sseclient.SSEClient(data)
+            self._session.metrics.incr('sse_connections')
+
+            for event in client.events():
+                if generation != self._generation:
+                    break
+                if event.id:
+                    self.last_event_id = event.id
+                data = json.loads(event.data)
+                if data.get('status') == "connected":
+                    _LOGGER.debug("Successfully subscribed the event stream")
+                    connected = True
+                    self.connected = True
+                    if reconnect:
+                        self._resubscribe()
+                    self._ready.set()
+                elif data.get('action'):
+                    action = data.get('action')
+                    resource = data.get('resource')
+                    self._session.metrics.record_event(resource)
+                    if action == "logout":
+                        _LOGGER.debug("Logged out by some other entity")
+                        return None
+                    elif "subscriptions/" not in (resource or ""):
+                        self.dispatch(data)
+
+        except (TypeError, ValueError, IOError) as error:
+            _LOGGER.debug("Event stream error: %s", error)
+
+        finally:
+            if generation == self._generation:
+                self.connected = False
+                self._ready.clear()
+
+        return connected
+
+    def _resubscribe(self):
+        """Subscribe the base stations again after a reconnect."""
+        with self._lock:
+            stations = [self._stations.get(device_id)
+                        for device_id in self._subscribed]
+            self._subscribed.clear()
+        for station in stations:
+            if station is not None:
+                self._subscribe_station(station)
+
+# vim:sw=4:ts=4:et:
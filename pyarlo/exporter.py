@@ -0,0 +1,190 @@
+# coding: utf-8
+"""Prometheus exporter of the Arlo client metrics."""
+import logging
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from pyarlo.const import EXPORTER_PORT
+
+_LOGGER = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _labels(**labels):
+    """Return Prometheus labels text."""
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{0}="{1}"'.format(key, str(value).replace('\\', '\\\\')
+                           .replace('"', '\\"'))
+        for key, value in sorted(labels.items())) + '}'
+
+
+def _histogram(lines, name, histogram, **labels):
+    """Append the samples of a histogram snapshot."""
+    for bound, count in histogram['buckets']:
+        bucket = dict(labels, le=bound)
+        lines.append('{0}_bucket{1} {2}'.format(name, _labels(**bucket),
+                                                count))
+    lines.append('{0}_sum{1} {2}'.format(name, _labels(**labels),
+                                         histogram['sum']))
+    lines.append('{0}_count{1} {2}'.format(name, _labels(**labels),
+                                           histogram['count']))
+
+
+def render_prometheus(stats, prefix='pyarlo'):
+    """Return PyArlo.stats() in the Prometheus text exposition format.
+
+    :param stats: Dictionary returned by PyArlo.stats()
+    :param prefix: Prefix of every metric name
+    """
+    lines = []
+
+    def header(name, kind, text):
+        lines.append('# HELP {0}_{1} {2}'.format(prefix, name, text))
+        lines.append('# TYPE {0}_{1} {2}'.format(prefix, name, kind))
+
+    requests = stats.get('requests', {})
+    header('request_duration_seconds', 'histogram',
+           'Latency of Arlo API queries including retries.')
+    for endpoint, data in sorted(requests.items()):
+        _histogram(lines, prefix + '_request_duration_seconds',
+                   data['latency'], endpoint=endpoint)
+
+    header('requests_total', 'counter', 'Arlo API queries by status.')
+    for endpoint, data in sorted(requests.items()):
+        for status, count in sorted(data['statuses'].items()):
+            lines.append('{0}_requests_total{1} {2}'.format(
+                prefix, _labels(endpoint=endpoint, status=status), count))
+
+    header('request_retries_total', 'counter', 'Arlo API query retries.')
+    for endpoint, data in sorted(requests.items()):
+        lines.append('{0}_request_retries_total{1} {2}'.format(
+            prefix, _labels(endpoint=endpoint), data['retries']))
+
+    header('response_bytes_total', 'counter', 'Arlo API response bytes.')
+    for endpoint, data in sorted(requests.items()):
+        lines.append('{0}_response_bytes_total{1} {2}'.format(
+            prefix, _labels(endpoint=endpoint), data['bytes']))
+
+    waits = stats.get('event_waits', {})
+    header('event_wait_seconds', 'histogram',
+           'Time waited for base station events.')
+    for resource, data in sorted(waits.items()):
+        _histogram(lines, prefix + '_event_wait_seconds', data['wait'],
+                   resource=resource)
+
+    header('event_wait_timeouts_total', 'counter',
+           'Base station events not received before the timeout.')
+    for resource, data in sorted(waits.items()):
+        lines.append('{0}_event_wait_timeouts_total{1} {2}'.format(
+            prefix, _labels(resource=resource), data['timeouts']))
+
+    header('events_total', 'counter', 'Events received from the stream.')
+    events = stats.get('events', {}).get('by_resource', {})
+    for resource, count in sorted(events.items()):
+        lines.append('{0}_events_total{1} {2}'.format(
+            prefix, _labels(resource=resource), count))
+
+    counters = stats.get('counters', {})
+    for name, value in sorted(counters.items()):
+        header(name + '_total', 'counter', name.replace('_', ' ') + '.')
+        lines.append('{0}_{1}_total {2}'.format(prefix, name, value))
+
+    caches = sorted(set(name[:-len('_cache_hits')] for name in counters
+                        if name.endswith('_cache_hits')))
+    if caches:
+        header('cache_hit_ratio', 'gauge', 'Ratio of cache hits.')
+    for cache in caches:
+        hits = counters.get(cache + '_cache_hits', 0)
+        misses = counters.get(cache + '_cache_misses', 0)
+        ratio = float(hits) / (hits + misses) if hits + misses else 0.0
+        lines.append('{0}_cache_hit_ratio{1} {2}'.format(
+            prefix, _labels(cache=cache), ratio))
+
+    for name, value in sorted(stats.get('gauges', {}).items()):
+        header(name, 'gauge', name.replace('_', ' ') + '.')
+        lines.append('{0}_{1} {2}'.format(prefix, name, value))
+
+    retry = stats.get('retry_policy')
+    if retry:
+        for name in ('attempts', 'retries', 'failures'):
+            header('retry_policy_' + name + '_total', 'counter',
+                   'Retry policy ' + name + '.')
+            lines.append('{0}_retry_policy_{1}_total {2}'.format(
+                prefix, name, retry.get(name, 0)))
+
+    return '\n'.join(lines) + '\n'
+
+
+class ArloMetricsExporter(object):
+    """Serve the PyArlo metrics in Prometheus format on a local port."""
+
+    def __init__(self, arlo_session, port=EXPORTER_PORT, host='127.0.0.1'):
+        """Initialize the exporter.
+
+        :param arlo_session: PyArlo session exposing stats()
+        :param port: TCP port to listen on, 0 picks a free port
+        :param host: Address to bind. Default: localhost only
+        """
+        self._session = arlo_session
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def __repr__(self):
+        """Representation string of object."""
+        return "<{0}: {1}:{2}>".format(self.__class__.__name__,
+                                       self.host, self.port)
+
+    def render(self):
+        """Return the current metrics as text."""
+        return render_prometheus(self._session.stats())
+
+    def start(self):
+        """Start serving /metrics on a daemon thread."""
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Handle scrapes."""
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """Serve the metrics."""
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+
+                body = exporter.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                """Log scrapes on debug level only."""
+                _LOGGER.debug(*args)
+
+        self._server = HTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='ArloMetricsExporter')
+        self._thread.daemon = True
+        self._thread.start()
+        _LOGGER.debug("Serving Arlo metrics on %s:%s", self.host, self.port)
+
+    def stop(self):
+        """Stop serving the metrics."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
+
+# vim:sw=4:ts=4:et:
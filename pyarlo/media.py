@@ -1,12 +1,16 @@
 # coding: utf-8
 """Implementation of Arlo Media object."""
 import logging
+import threading
+import time
+from datetime import date
 from datetime import datetime
 from datetime import timedelta
-from pyarlo.const import LIBRARY_ENDPOINT, PRELOAD_DAYS
+from pyarlo.const import (
+    LIBRARY_ENDPOINT, PRELOAD_BACKGROUND, PRELOAD_DAYS, PRELOAD_LAZY)
+from pyarlo.media_index import SYNCED_FROM
 from pyarlo.utils import (
-    http_get, http_stream, to_datetime, pretty_timestamp,
-    assert_is_dict)
+    http_get, http_stream, to_datetime, pretty_timestamp)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -14,29 +18,98 @@ _LOGGER = logging.getLogger(__name__)
 class ArloMediaLibrary(object):
     """Arlo Library Media module implementation."""
 
-    def __init__(self, arlo_session, preload=True, days=PRELOAD_DAYS):
+    def __init__(self, arlo_session, preload=True, days=PRELOAD_DAYS,
+                 index=None):
         """Initialiaze Arlo Media Library object.
 
         :param arlo_session: PyArlo shared session
-        :param preload: Boolean to pre-load video library.
+        :param preload: Boolean to pre-load video library, 'lazy' to load
+                        it on first access to videos or 'background' to
+                        load it on a thread. See wait().
         :param days: If preload, number of days to lookup.
+        :param index: <ArloMediaIndex> storing the loaded videos
 
         :returns ArloMediaLibrary object
         """
         self._session = arlo_session
-
-        if preload and days:
-            self.videos = self.load(days)
-        else:
-            self.videos = []
+        self._days = days
+        self._videos = None
+        self.index = index
+        self._lock = threading.Lock()
+        self._loader = None
+        self._synced_days = None
+        self._synced_filter = None
+        self.load_time = None
+        self.watermark = None
+
+        if not (preload and days):
+            self._videos = []
+        elif preload == PRELOAD_BACKGROUND:
+            self._loader = threading.Thread(target=self._preload,
+                                            name='ArloMediaLibrary')
+            self._loader.daemon = True
+            self._loader.start()
+        elif preload != PRELOAD_LAZY:
+            self._preload()
 
     def __repr__(self):
         """Representation string of object."""
         return "<{0}: {1}>".format(self.__class__.__name__,
                                    self._session.userid)
 
+    def _preload(self):
+        """Load videos from the preload days and record the time spent."""
+        with self._lock:
+            if self._videos is not None:
+                return
+
+            started = time.time()
+            try:
+                # warm from the index when it covers the preload days
+                self._sync(self._days, None)
+                videos = self._videos
+            except (AttributeError, TypeError) as error:
+                _LOGGER.error("Unable to preload video library: %s", error)
+                videos = []
+                self._synced_days = None
+                self.watermark = None
+            self.load_time = time.time() - started
+            self._videos = videos
+            _LOGGER.debug("Preloaded %s videos in %.3fs",
+                          len(videos), self.load_time)
+
+    @property
+    def videos(self):
+        """Return preloaded <ArloVideo> objects, loading them if needed."""
+        if self._videos is None:
+            if self._loader is not None:
+                self.wait()
+            else:
+                self._preload()
+        return self._videos
+
+    @videos.setter
+    def videos(self, value):
+        """Override preloaded videos."""
+        self._videos = value
+
+    @property
+    def loaded(self):
+        """Return True if the videos were already loaded."""
+        return self._videos is not None
+
+    def wait(self, timeout=None):
+        """Wait for the background preload to finish.
+
+        :param timeout: max seconds to wait. Default: forever
+        :returns True if the videos are loaded
+        """
+        if self._loader is not None:
+            self._loader.join(timeout)
+        return self.loaded
+
     def load(self, days=PRELOAD_DAYS, only_cameras=None,
-             date_from=None, date_to=None, limit=None):
+             date_from=None, date_to=None, limit=None, columns=False):
         """Load  Arlo videos from the given criteria
 
         :param days: number of days to retrieve
@@ -44,54 +117,241 @@ class ArloMediaLibrary(object):
         :param date_from: refine from initial date
         :param date_to: refine final date
         :param limit: define number of objects to return
+        :param columns: Boolean to return an <ArloVideoColumns> view
         """
-        videos = []
         url = LIBRARY_ENDPOINT
+        params = self._library_params(days, date_from, date_to)
+        data = self._session.query(url,
+                                   method='POST',
+                                   extra_params=params,
+                                   idempotent=True).get('data')
+        if self.index is not None and data:
+            self.index.add(data)
+
+        # get all cameras to append to create ArloVideo object
+        all_cameras = self._session.cameras
+        return self._build_videos(data, all_cameras, only_cameras, limit,
+                                  columns)
+
+    def query(self, only_cameras=None, date_from=None, date_to=None,
+              reason=None, motion_type=None, limit=None):
+        """Return <ArloVideo> objects of the index, newest first.
+
+        :param only_cameras: retrieve only <ArloCamera> on that list
+        :param date_from: datetime or epoch ms of the oldest video
+        :param date_to: datetime or epoch ms of the newest video
+        :param reason: trigger reason or list of them, e.g. 'motionRecord'
+        :param motion_type: objCategory or list of them, e.g. 'Person'
+        :param limit: define number of objects to return
+        """
+        if self.index is None:
+            return []
+        data = self.index.query(only_cameras, date_from, date_to,
+                                reason, motion_type, limit)
+        return self._build_videos(data, self._session.cameras)
+
+    def sync(self, days=PRELOAD_DAYS, only_cameras=None):
+        """Bring the videos up to date, fetching only the new ones.
+
+        The first sync loads the whole window of days. Later ones only
+        request the days since the watermark, the newest video seen, merge
+        the videos recorded after it and drop the ones older than days.
+
+        :param days: number of days to keep
+        :param only_cameras: keep only <ArloCamera> on that list
+        :returns list of the new <ArloVideo> objects
+        """
+        if self._loader is not None:
+            self.wait()
+        with self._lock:
+            return self._sync(days, only_cameras)
+
+    def _sync(self, days, only_cameras):
+        """Run sync() with the lock held.
+
+        The watermark only holds for the days and cameras it was synced
+        with, any other window is loaded again.
+        """
+        if only_cameras and not isinstance(only_cameras, list):
+            only_cameras = [only_cameras]
+        synced_filter = self._coverage_key(only_cameras)
+        oldest = (datetime.today() - timedelta(days=days)).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        oldest = int(time.mktime(oldest.timetuple()) * 1000)
+
+        warm = []
+        if self.watermark is None or self._synced_days != days or \
+                self._synced_filter != synced_filter or \
+                self._videos is None:
+            warm = self._warm_videos(oldest, only_cameras)
+            self._synced_days = days
+            self._synced_filter = synced_filter
+            if not warm:
+                videos = self.load(days, only_cameras)
+                self._videos = videos
+                self.watermark = self._watermark(videos)
+                if self.index is not None:
+                    self.index.set_meta(synced_filter, oldest)
+                return videos
+            self._videos = warm
+            self.watermark = self._watermark(warm)
+
+        date_from = to_datetime(self.watermark[0]).strftime('%Y%m%d')
+        date_to = datetime.today().strftime('%Y%m%d')
+        fetched = self.load(days, only_cameras, date_from, date_to)
+        new = [video for video in fetched
+               if self._video_key(video) > self.watermark]
+
+        self._videos = new + [video for video in self._videos
+                              if (video.created_at or 0) >= oldest]
+        self.watermark = self._watermark(new, self.watermark)
+        _LOGGER.debug("Synced %s new videos since %s",
+                      len(new), date_from)
+        return new + warm
+
+    @staticmethod
+    def _coverage_key(only_cameras):
+        """Return the index key of the oldest date synced for cameras."""
+        return SYNCED_FROM + ','.join(
+            sorted(cam.device_id for cam in only_cameras or []))
+
+    def _warm_videos(self, oldest, only_cameras):
+        """Return the videos of the index if it covers the window.
+
+        Presigned URLs expire, so the days of the indexed videos carrying
+        an expired one are fetched again first, see _refresh_urls().
+
+        :param oldest: epoch ms of the start of the window
+        :param only_cameras: retrieve only <ArloCamera> on that list
+        """
+        if self.index is None:
+            return []
+        covered = [self.index.get_meta(self._coverage_key(None))]
+        if only_cameras:
+            covered.append(
+                self.index.get_meta(self._coverage_key(only_cameras)))
+        if not any(value is not None and value <= oldest
+                   for value in covered):
+            return []
+        expired = self.index.expired_range(date_from=oldest)
+        if expired is not None:
+            self._refresh_urls(*expired)
+        data = self.index.query(only_cameras, date_from=oldest)
+        return self._build_videos(data, self._session.cameras, only_cameras)
+
+    def _refresh_urls(self, date_from, date_to):
+        """Fetch the days of the indexed videos with expired URLs again.
+
+        The videos returned replace their rows of the index, the ones
+        recorded on other days keep theirs.
+
+        :param date_from: epoch ms of the oldest video with an expired URL
+        :param date_to: epoch ms of the newest video with an expired URL
+        """
+        _LOGGER.debug("Refreshing the indexed video URLs from %s to %s",
+                      date_from, date_to)
+        params = self._library_params(
+            None, to_datetime(date_from).strftime('%Y%m%d'),
+            to_datetime(date_to).strftime('%Y%m%d'))
+        response = self._session.query(LIBRARY_ENDPOINT,
+                                       method='POST',
+                                       extra_params=params,
+                                       idempotent=True)
+        data = response.get('data') if response else None
+        if data:
+            self.index.add(data)
+
+    @staticmethod
+    def _video_key(video):
+        """Return the (localCreatedDate, name) ordering a video."""
+        return (video.created_at or 0, video.id or '')
+
+    @classmethod
+    def _watermark(cls, videos, watermark=None):
+        """Return the newest video key of videos and watermark."""
+        for video in videos:
+            key = cls._video_key(video)
+            if watermark is None or key > watermark:
+                watermark = key
+        return watermark
+
+    @staticmethod
+    def _library_params(days, date_from=None, date_to=None):
+        """Return the library query body for the given criteria."""
         if not (date_from and date_to):
             now = datetime.today()
             date_from = (now - timedelta(days=days)).strftime('%Y%m%d')
             date_to = now.strftime('%Y%m%d')
 
-        params = {'dateFrom': date_from, 'dateTo': date_to}
-        data = self._session.query(url,
-                                   method='POST',
-                                   extra_params=params).get('data')
+        return {'dateFrom': date_from, 'dateTo': date_to}
 
-        # get all cameras to append to create ArloVideo object
-        all_cameras = self._session.cameras
+    def _build_videos(self, data, all_cameras, only_cameras=None, limit=None,
+                      columns=False):
+        """Create <ArloVideo> objects from the library JSON data.
+
+        :param data: list of videos returned by the library endpoint
+        :param all_cameras: <ArloCamera> objects linked to the account
+        :param only_cameras: retrieve only <ArloCamera> on that list
+        :param limit: define number of objects to return
+        :param columns: Boolean to return an <ArloVideoColumns> view
+        """
+        cameras = dict((cam.device_id, cam) for cam in all_cameras)
+
+        # make sure only_cameras is a list
+        if only_cameras and not isinstance(only_cameras, list):
+            only_cameras = [only_cameras]
+
+        # filter by camera only
+        if only_cameras:
+            wanted = set(cam.device_id for cam in only_cameras)
+            cameras = dict((device_id, cam)
+                           for device_id, cam in cameras.items()
+                           if device_id in wanted)
+
+        if columns:
+            rows = [video for video in data
+                    if video.get('deviceId') in cameras]
+            return ArloVideoColumns(rows[:limit] if limit else rows,
+                                    cameras, self._session)
+
+        session = self._session
+        if not limit:
+            return [ArloVideo(video, cameras[video.get('deviceId')], session)
+                    for video in data if video.get('deviceId') in cameras]
 
+        videos = []
         for video in data:
-            # pylint: disable=cell-var-from-loop
-            try:
-                srccam = \
-                    list(filter(
-                        lambda cam: cam.device_id == video.get('deviceId'),
-                        all_cameras)
-                        )[0]
-            except IndexError:
+            srccam = cameras.get(video.get('deviceId'))
+            if srccam is None:
                 continue
+            videos.append(ArloVideo(video, srccam, session))
+            if len(videos) >= limit:
+                break
 
-            # make sure only_cameras is a list
-            if only_cameras and \
-               not isinstance(only_cameras, list):
-                only_cameras = [(only_cameras)]
-
-            # filter by camera only
-            if only_cameras:
-                if list(filter(lambda cam: cam.device_id == srccam.device_id,
-                               list(only_cameras))):
-                    videos.append(ArloVideo(video, srccam, self._session))
-            else:
-                videos.append(ArloVideo(video, srccam, self._session))
+        return videos
 
-        if limit:
-            return videos[:limit]
 
-        return videos
+def _to_seconds(timestamp):
+    """Return epoch seconds of a timestamp in seconds or milliseconds."""
+    if isinstance(timestamp, int) and timestamp >= 10000000000:
+        return timestamp // 1000
+    try:
+        return int(str(timestamp)[:10])
+    except ValueError:
+        return None
 
 
 class ArloVideo(object):
-    """Object for Arlo Video file."""
+    """Object for Arlo Video file.
+
+    Only the fields used by the properties are kept, extracted once, and
+    the creation timestamp is parsed on first use.
+    """
+
+    __slots__ = ('_id', '_created_at', '_timestamp', '_content_type',
+                 '_media_duration', '_media_duration_seconds', '_reason',
+                 '_motion_type', '_thumbnail_url', '_video_url', '_camera',
+                 '_session')
 
     def __init__(self, attrs, camera, arlo_session):
         """Initialiaze Arlo Video object.
@@ -100,10 +360,21 @@ class ArloVideo(object):
         :param camera: Arlo camera which recorded the video
         :param arlo_session: Arlo shared session
         """
-        self._attrs = attrs
-        self._attrs = assert_is_dict(self._attrs)
+        # inlined assert_is_dict(), called for every library video
+        if not isinstance(attrs, dict):
+            attrs = {}
+        get = attrs.get
         self._camera = camera
         self._session = arlo_session
+        self._id = get('name')
+        self._created_at = get('localCreatedDate')
+        self._content_type = get('contentType')
+        self._media_duration = get('mediaDuration')
+        self._media_duration_seconds = get('mediaDurationSecond')
+        self._reason = get('reason')
+        self._motion_type = get('objCategory')
+        self._thumbnail_url = get('presignedThumbnailUrl')
+        self._video_url = get('presignedContentUrl')
 
     def __repr__(self):
         """Representation string of object."""
@@ -114,48 +385,55 @@ class ArloVideo(object):
         """Define object name."""
         return "{0} {1} {2}".format(
             self._camera.name,
-            pretty_timestamp(self.created_at),
-            self._attrs.get('mediaDuration'))
+            self.created_at_pretty(),
+            self._media_duration)
 
     # pylint: disable=invalid-name
     @property
     def id(self):
         """Return object id."""
-        if self._attrs is not None:
-            return self._attrs.get('name')
-        return None
+        return self._id
 
     @property
     def created_at(self):
         """Return timestamp."""
-        if self._attrs is not None:
-            return self._attrs.get('localCreatedDate')
-        return None
+        return self._created_at
+
+    @property
+    def _seconds(self):
+        """Return the creation epoch seconds, parsed once."""
+        try:
+            return self._timestamp
+        except AttributeError:
+            self._timestamp = _to_seconds(self._created_at)
+            return self._timestamp
 
     def created_at_pretty(self, date_format=None):
         """Return pretty timestamp."""
         if date_format:
-            return pretty_timestamp(self.created_at, date_format=date_format)
-        return pretty_timestamp(self.created_at)
+            return pretty_timestamp(self._seconds, date_format=date_format)
+        return pretty_timestamp(self._seconds)
 
     @property
     def created_today(self):
         """Return True if created today."""
-        if self.datetime.date() == datetime.today().date():
-            return True
-        return False
+        seconds = self._seconds
+        if seconds is None:
+            return False
+        return date.fromtimestamp(seconds) == date.today()
 
     @property
     def datetime(self):
         """Return datetime when video was created."""
-        return to_datetime(self.created_at)
+        seconds = self._seconds
+        if seconds is None:
+            return None
+        return datetime.fromtimestamp(seconds)
 
     @property
     def content_type(self):
         """Return content_type."""
-        if self._attrs is not None:
-            return self._attrs.get('contentType')
-        return None
+        return self._content_type
 
     @property
     def camera(self):
@@ -165,55 +443,106 @@ class ArloVideo(object):
     @property
     def media_duration_seconds(self):
         """Return media duration in seconds."""
-        if self._attrs is not None:
-            return self._attrs.get('mediaDurationSecond')
-        return None
+        return self._media_duration_seconds
 
     @property
     def triggered_by(self):
         """Return the reason why video was recorded."""
-        if self._attrs is not None:
-            return self._attrs.get('reason')
-        return None
+        return self._reason
 
     @property
     def thumbnail_url(self):
         """Return thumbnail url."""
-        if self._attrs is not None:
-            return self._attrs.get('presignedThumbnailUrl')
-        return None
+        return self._thumbnail_url
 
     @property
     def video_url(self):
         """Return video content url."""
-        if self._attrs is not None:
-            return self._attrs.get('presignedContentUrl')
-        return None
+        return self._video_url
 
     @property
     def motion_type(self):
         """Returns the type of motion that triggered the camera. Requires subscription."""
-        if self._attrs is not None:
-            return self._attrs.get("objCategory")
-        return None
+        return self._motion_type
 
     def download_thumbnail(self, filename=None):
         """Download JPEG thumbnail.
 
         :param filename: File to save thumbnail. Default: stdout
         """
-        return http_get(self.thumbnail_url, filename)
+        return http_get(self.thumbnail_url, filename,
+                        session=self._session.session)
 
     def download_video(self, filename=None):
         """Download video content.
 
         :param filename: File to save video. Default: stdout
         """
-        return http_get(self.video_url, filename)
+        return http_get(self.video_url, filename,
+                        session=self._session.session)
 
     @property
     def stream_video(self):
         """Stream video."""
-        return http_stream(self.video_url)
+        return http_stream(self.video_url, session=self._session.session)
+
+
+class ArloVideoColumns(object):
+    """Column-wise view of library videos.
+
+    Every field is kept in a list indexed by video, avoiding one object
+    per video. ArloVideo objects are only built when a row is accessed.
+    """
+
+    # column name and library attribute
+    FIELDS = (
+        ('id', 'name'),
+        ('device_id', 'deviceId'),
+        ('created_at', 'localCreatedDate'),
+        ('content_type', 'contentType'),
+        ('media_duration', 'mediaDuration'),
+        ('media_duration_seconds', 'mediaDurationSecond'),
+        ('triggered_by', 'reason'),
+        ('motion_type', 'objCategory'),
+        ('thumbnail_url', 'presignedThumbnailUrl'),
+        ('video_url', 'presignedContentUrl'),
+    )
+
+    def __init__(self, data, cameras, arlo_session):
+        """Initialize the view.
+
+        :param data: list of videos returned by the library endpoint
+        :param cameras: dict of deviceId to <ArloCamera>
+        :param arlo_session: Arlo shared session
+        """
+        self._cameras = cameras
+        self._session = arlo_session
+        self.columns = dict(
+            (name, [video.get(key) for video in data])
+            for name, key in self.FIELDS)
+
+    def __repr__(self):
+        """Representation string of object."""
+        return "<{0}: {1} videos>".format(self.__class__.__name__, len(self))
+
+    def __len__(self):
+        """Return the number of videos."""
+        return len(self.columns['id'])
+
+    def __getitem__(self, index):
+        """Return the <ArloVideo> of a row."""
+        attrs = dict((key, self.columns[name][index])
+                     for name, key in self.FIELDS)
+        return ArloVideo(attrs, self._cameras.get(attrs['deviceId']),
+                         self._session)
+
+    def __iter__(self):
+        """Iterate over the rows as <ArloVideo> objects."""
+        for index in range(len(self)):
+            yield self[index]
+
+    def column(self, name):
+        """Return the values of a column, e.g. 'created_at'."""
+        return self.columns[name]
 
 # vim:sw=4:ts=4:et:
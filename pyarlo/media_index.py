@@ -0,0 +1,275 @@
+# coding: utf-8
+"""Implementation of the on-disk index of the Arlo media library."""
+import calendar
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+try:
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    from urlparse import parse_qs, urlparse
+
+_LOGGER = logging.getLogger(__name__)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS videos ("
+    " id TEXT PRIMARY KEY,"
+    " device_id TEXT,"
+    " created INTEGER,"
+    " duration INTEGER,"
+    " reason TEXT,"
+    " category TEXT,"
+    " content_url TEXT,"
+    " thumbnail_url TEXT,"
+    " url_expires INTEGER,"
+    " attrs TEXT)",
+    "CREATE INDEX IF NOT EXISTS videos_created ON videos (created)",
+    "CREATE INDEX IF NOT EXISTS videos_device"
+    " ON videos (device_id, created)",
+    "CREATE INDEX IF NOT EXISTS videos_reason ON videos (reason, created)",
+    "CREATE INDEX IF NOT EXISTS videos_category"
+    " ON videos (category, created)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+)
+
+# meta key prefix of the oldest date a library window was synced from
+SYNCED_FROM = 'synced_from:'
+
+
+def url_expiry(url):
+    """Return the epoch seconds a presigned URL expires at, else None.
+
+    :param url: URL signed with Expires or X-Amz-Date and X-Amz-Expires
+    """
+    if not url:
+        return None
+    params = parse_qs(urlparse(url).query)
+    try:
+        if 'Expires' in params:
+            return int(params['Expires'][0])
+        if 'X-Amz-Date' in params and 'X-Amz-Expires' in params:
+            signed = time.strptime(params['X-Amz-Date'][0], '%Y%m%dT%H%M%SZ')
+            return calendar.timegm(signed) + \
+                int(params['X-Amz-Expires'][0])
+    except ValueError:
+        _LOGGER.debug("Invalid expiration on %s", url)
+    return None
+
+
+def _to_millis(value):
+    """Return a datetime or epoch milliseconds as epoch milliseconds."""
+    if isinstance(value, datetime):
+        return int(time.mktime(value.timetuple()) * 1000)
+    return value
+
+
+def _as_list(value):
+    """Return a filter value as a list, None matching everything."""
+    if value is None:
+        return None
+    if not isinstance(value, (list, tuple, set, frozenset)):
+        value = [value]
+    return [getattr(item, 'device_id', item) for item in value]
+
+
+class ArloMediaIndex(object):
+    """SQLite index of the library videos, kept across restarts.
+
+    Every video loaded by an ArloMediaLibrary is stored with the fields
+    used to look it up, so history-wide queries by camera, time range,
+    trigger reason or motion type are answered locally.
+
+    Videos are kept until pruned, the library sync window does not
+    apply to the index. Set retention_days to drop the older ones.
+    """
+
+    def __init__(self, path=':memory:', retention_days=None):
+        """Initialize the media index.
+
+        :param path: SQLite database file. Default: in memory
+        :param retention_days: Days of videos kept, older ones are pruned
+                               when videos are added. Default: forever
+        """
+        self.path = path
+        self.retention_days = retention_days
+        if path != ':memory:':
+            self.path = os.path.expanduser(path)
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            for statement in SCHEMA:
+                self._conn.execute(statement)
+
+    def __repr__(self):
+        """Representation string of object."""
+        return "<{0}: {1}>".format(self.__class__.__name__, self.path)
+
+    def __len__(self):
+        """Return the number of indexed videos."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    def close(self):
+        """Close the database."""
+        with self._lock:
+            self._conn.close()
+
+    def add(self, videos):
+        """Index or refresh videos of the library endpoint.
+
+        :param videos: list of video attributes
+        :returns number of videos indexed
+        """
+        rows = []
+        for video in videos or []:
+            if not isinstance(video, dict) or not video.get('name'):
+                continue
+            content_url = video.get('presignedContentUrl')
+            rows.append((
+                video.get('name'),
+                video.get('deviceId'),
+                video.get('localCreatedDate'),
+                video.get('mediaDurationSecond'),
+                video.get('reason'),
+                video.get('objCategory'),
+                content_url,
+                video.get('presignedThumbnailUrl'),
+                url_expiry(content_url),
+                json.dumps(video)))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO videos VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        if self.retention_days:
+            self.prune(datetime.now() - timedelta(days=self.retention_days))
+        return len(rows)
+
+    def query(self, device=None, date_from=None, date_to=None,
+              reason=None, motion_type=None, limit=None):
+        """Return the attributes of the matching videos, newest first.
+
+        :param device: <ArloCamera>, deviceId or list of them
+        :param date_from: datetime or epoch ms of the oldest video
+        :param date_to: datetime or epoch ms of the newest video
+        :param reason: trigger reason or list of them, e.g. 'motionRecord'
+        :param motion_type: objCategory or list of them, e.g. 'Person'
+        :param limit: define number of videos to return
+        """
+        clauses = []
+        params = []
+        for column, values in (('device_id', _as_list(device)),
+                               ('reason', _as_list(reason)),
+                               ('category', _as_list(motion_type))):
+            if values is not None:
+                clauses.append("{0} IN ({1})".format(
+                    column, ', '.join('?' * len(values))))
+                params.extend(values)
+        if date_from is not None:
+            clauses.append("created >= ?")
+            params.append(_to_millis(date_from))
+        if date_to is not None:
+            clauses.append("created <= ?")
+            params.append(_to_millis(date_to))
+
+        sql = "SELECT attrs FROM videos"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created DESC, id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_meta(self, key, default=None):
+        """Return a value saved with set_meta()."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        """Save a JSON value along the videos."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                (key, json.dumps(value)))
+
+    def meta_keys(self, prefix=''):
+        """Return the keys saved with set_meta() starting with prefix."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM meta WHERE substr(key, 1, ?) = ?",
+                (len(prefix), prefix)).fetchall()
+        return [row[0] for row in rows]
+
+    def expired(self, now=None, date_from=None):
+        """Return the ids of the videos whose presigned URLs expired.
+
+        :param now: epoch seconds to compare to. Default: now
+        :param date_from: datetime or epoch ms of the oldest video
+        """
+        where, params = self._expired_where(now, date_from)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM videos" + where + " ORDER BY created DESC",
+                params).fetchall()
+        return [row[0] for row in rows]
+
+    def expired_range(self, now=None, date_from=None):
+        """Return when the oldest and newest videos with expired presigned
+        URLs were recorded, in epoch ms, or None if no URL expired.
+
+        :param now: epoch seconds to compare to. Default: now
+        :param date_from: datetime or epoch ms of the oldest video
+        """
+        where, params = self._expired_where(now, date_from)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(created), MAX(created) FROM videos" + where,
+                params).fetchone()
+        return None if row[0] is None else row
+
+    @staticmethod
+    def _expired_where(now, date_from):
+        """Return the WHERE clause and parameters of the expired videos."""
+        if now is None:
+            now = time.time()
+        where = " WHERE url_expires < ?"
+        params = [now]
+        if date_from is not None:
+            where += " AND created >= ?"
+            params.append(_to_millis(date_from))
+        return where, params
+
+    def prune(self, before):
+        """Remove the videos recorded before a date.
+
+        The library windows synced from an earlier date now start at it,
+        so they are not warmed from the index with videos missing.
+
+        :param before: datetime or epoch ms
+        :returns number of videos removed
+        """
+        before = _to_millis(before)
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                "DELETE FROM videos WHERE created < ?", (before,)).rowcount
+            self._conn.execute(
+                "UPDATE meta SET value = ? WHERE substr(key, 1, ?) = ?"
+                " AND CAST(value AS INTEGER) < ?",
+                (json.dumps(before), len(SYNCED_FROM), SYNCED_FROM, before))
+        return removed
+
+# vim:sw=4:ts=4:et:
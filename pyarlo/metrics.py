@@ -0,0 +1,224 @@
+# coding: utf-8
+"""Implementation of the Arlo client metrics registry."""
+import re
+import threading
+import time
+
+from pyarlo import const
+from pyarlo.const import LATENCY_BUCKETS
+
+# resource path segments holding device ids, e.g. cameras/48B14CBBBBBBB
+_DEVICE_ID_RE = re.compile(r'^[0-9A-Z]{10,}$')
+
+
+def _endpoints():
+    """Return (name, url prefix) of the endpoints defined in const.py.
+
+    Longest prefixes first so LIBRARY_ENDPOINT does not shadow
+    RESET_ENDPOINT nor RESET_ENDPOINT shadow RESET_CAM_ENDPOINT.
+    """
+    endpoints = []
+    for name in dir(const):
+        value = getattr(const, name)
+        if name.endswith('_ENDPOINT') and isinstance(value, str):
+            endpoints.append((name, value.split('{')[0]))
+    return sorted(endpoints, key=lambda item: len(item[1]), reverse=True)
+
+
+class Histogram(object):
+    """Fixed bucket histogram."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """Initialize the histogram.
+
+        :param buckets: Sorted upper bounds of the buckets
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """Record a value."""
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def snapshot(self):
+        """Return the histogram as a dictionary with cumulative buckets."""
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return {'count': self.count,
+                'sum': self.sum,
+                'max': self.max,
+                'avg': self.sum / self.count if self.count else 0.0,
+                'buckets': cumulative}
+
+
+class ArloMetrics(object):
+    """Per endpoint latency, status, retry and event metrics."""
+
+    def __init__(self, enabled=True):
+        """Initialize the registry.
+
+        :param enabled: Boolean to record metrics. Disabled registries
+                        ignore every record call.
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._endpoints = _endpoints()
+        self._names = {}
+        self.reset()
+
+    def __repr__(self):
+        """Representation string of object."""
+        return "<{0}: {1} endpoints>".format(self.__class__.__name__,
+                                             len(self._requests))
+
+    def reset(self):
+        """Clear all recorded metrics."""
+        with self._lock:
+            self._started = time.time()
+            self._requests = {}
+            self._event_waits = {}
+            self._events = {}
+            self._counters = {}
+            self._gauges = {}
+
+    def endpoint_name(self, url):
+        """Return the const.py endpoint name matching the url."""
+        name = self._names.get(url)
+        if name is not None:
+            return name
+
+        name = 'OTHER'
+        for endpoint, prefix in self._endpoints:
+            if url.startswith(prefix):
+                name = endpoint
+                break
+
+        if len(self._names) < 1024:
+            self._names[url] = name
+        return name
+
+    @staticmethod
+    def resource_name(resource):
+        """Return the resource without device ids."""
+        if not resource:
+            return 'unknown'
+        return '/'.join(segment for segment in resource.split('/')
+                        if not _DEVICE_ID_RE.match(segment))
+
+    def record_request(self, url, status, latency, attempts=1, nbytes=0):
+        """Record a query() call.
+
+        :param url: Queried URL
+        :param status: HTTP status of the last attempt or None on error
+        :param latency: Seconds spent including retries
+        :param attempts: Number of attempts made
+        :param nbytes: Size of the response body
+        """
+        if not self.enabled:
+            return
+
+        name = self.endpoint_name(url)
+        with self._lock:
+            stats = self._requests.get(name)
+            if stats is None:
+                stats = self._requests[name] = {
+                    'requests': 0, 'retries': 0, 'errors': 0, 'bytes': 0,
+                    'statuses': {}, 'latency': Histogram()}
+            stats['requests'] += 1
+            stats['retries'] += max(0, attempts - 1)
+            stats['bytes'] += nbytes
+            if status != 200:
+                stats['errors'] += 1
+            key = str(status) if status is not None else 'error'
+            stats['statuses'][key] = stats['statuses'].get(key, 0) + 1
+            stats['latency'].observe(latency)
+
+    def record_event_wait(self, resource, seconds, found):
+        """Record the time publish_and_get_event() waited for an event.
+
+        :param resource: Requested resource
+        :param seconds: Seconds waited
+        :param found: Boolean if the event arrived before the timeout
+        """
+        if not self.enabled:
+            return
+
+        name = self.resource_name(resource)
+        with self._lock:
+            stats = self._event_waits.get(name)
+            if stats is None:
+                stats = self._event_waits[name] = {
+                    'timeouts': 0, 'wait': Histogram()}
+            if not found:
+                stats['timeouts'] += 1
+            stats['wait'].observe(seconds)
+
+    def record_event(self, resource):
+        """Record an event received from the event stream."""
+        if not self.enabled:
+            return
+
+        name = self.resource_name(resource)
+        with self._lock:
+            self._events[name] = self._events.get(name, 0) + 1
+
+    def incr(self, name, value=1):
+        """Increment a generic counter."""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Set a generic gauge."""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._gauges[name] = value
+
+    def snapshot(self):
+        """Return all metrics as a dictionary."""
+        with self._lock:
+            elapsed = max(time.time() - self._started, 1e-6)
+            requests = {}
+            for name, stats in self._requests.items():
+                stats = dict(stats)
+                stats['statuses'] = dict(stats['statuses'])
+                stats['latency'] = stats['latency'].snapshot()
+                requests[name] = stats
+
+            waits = {}
+            for name, stats in self._event_waits.items():
+                waits[name] = {'timeouts': stats['timeouts'],
+                               'wait': stats['wait'].snapshot()}
+
+            total = sum(self._events.values())
+            return {
+                'uptime': elapsed,
+                'requests': requests,
+                'event_waits': waits,
+                'events': {
+                    'total': total,
+                    'rate': total / elapsed,
+                    'by_resource': dict(self._events)},
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges)}
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,112 @@
+# coding: utf-8
+"""Implementation of the Arlo query retry policy."""
+import logging
+import random
+import threading
+import time
+from email.utils import mktime_tz, parsedate_tz
+from pyarlo.const import (
+    RETRY_BACKOFF_FACTOR, RETRY_MAX_BACKOFF, RETRY_METHODS, RETRY_STATUSES)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class RetryPolicy(object):
+    """Exponential backoff with jitter used by PyArlo.query()."""
+
+    def __init__(self, retries=3, backoff_factor=RETRY_BACKOFF_FACTOR,
+                 max_backoff=RETRY_MAX_BACKOFF, jitter=True,
+                 retry_statuses=RETRY_STATUSES, retry_methods=RETRY_METHODS,
+                 respect_retry_after=True, deadline=None):
+        """Initialize the retry policy.
+
+        :param retries: Default number of retries after the first attempt
+        :param backoff_factor: Base delay in seconds, doubled per attempt
+        :param max_backoff: Upper bound in seconds for a single delay
+        :param jitter: Boolean to randomize delays (full jitter)
+        :param retry_statuses: HTTP status codes worth retrying
+        :param retry_methods: HTTP methods considered idempotent
+        :param respect_retry_after: Boolean to honour Retry-After headers
+        :param deadline: Default max seconds spent on a single query()
+        """
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_methods = frozenset(retry_methods)
+        self.respect_retry_after = respect_retry_after
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'attempts': 0,
+                       'retries': 0, 'failures': 0}
+
+    def __repr__(self):
+        """Representation string of object."""
+        return "<{0}: retries={1} backoff={2}>".format(
+            self.__class__.__name__, self.retries, self.backoff_factor)
+
+    def is_idempotent(self, method):
+        """Return True if requests using method can be safely repeated."""
+        return method in self.retry_methods
+
+    def is_retryable(self, status=None, error=None):
+        """Return True if a failed attempt is worth repeating.
+
+        :param status: HTTP status code of the failed attempt
+        :param error: Exception raised by the failed attempt
+        """
+        if error is not None:
+            return True
+        return status in self.retry_statuses
+
+    def backoff(self, attempt, retry_after=None):
+        """Return seconds to sleep before the given retry attempt.
+
+        :param attempt: Number of attempts already made, starting at 1
+        :param retry_after: Value of the Retry-After response header
+        """
+        if self.respect_retry_after and retry_after:
+            delay = self.parse_retry_after(retry_after)
+            if delay is not None:
+                return min(delay, self.max_backoff)
+
+        delay = min(self.max_backoff,
+                    self.backoff_factor * (2 ** (attempt - 1)))
+        if self.jitter:
+            return random.uniform(0, delay)
+        return delay
+
+    @staticmethod
+    def parse_retry_after(value):
+        """Return seconds from a Retry-After header (delta or HTTP date)."""
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            pass
+
+        parsed = parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(0.0, mktime_tz(parsed) - time.time())
+
+    def record(self, attempts, success):
+        """Record the outcome of a query().
+
+        :param attempts: Number of attempts made
+        :param success: Boolean if the last attempt succeeded
+        """
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['attempts'] += attempts
+            self._stats['retries'] += max(0, attempts - 1)
+            if not success:
+                self._stats['failures'] += 1
+
+    @property
+    def stats(self):
+        """Return a copy of the attempt counters."""
+        with self._lock:
+            return dict(self._stats)
+
+# vim:sw=4:ts=4:et:
@@ -0,0 +1,120 @@
+# coding: utf-8
+"""Implementation of the Arlo encrypted token cache."""
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+
+from pyarlo.const import TOKEN_CACHE_ITERATIONS, TOKEN_EXPIRATION_MARGIN
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = InvalidToken = None
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ArloTokenCache(object):
+    """Store Arlo session tokens on disk, encrypted per account.
+
+    Each account is saved on its own file named after a hash of the
+    username and encrypted with a key derived from the account password,
+    so the file is useless without the credentials.
+    """
+
+    def __init__(self, path, margin=TOKEN_EXPIRATION_MARGIN):
+        """Initialize the token cache.
+
+        :param path: Directory to store the cached tokens
+        :param margin: Seconds before expiration to consider a token stale
+        """
+        self.path = os.path.expanduser(path)
+        self.margin = margin
+
+    def __repr__(self):
+        """Representation string of object."""
+        return "<{0}: {1}>".format(self.__class__.__name__, self.path)
+
+    @property
+    def available(self):
+        """Return True if the encryption backend is installed."""
+        return Fernet is not None
+
+    def _filename(self, username):
+        """Return the cache file used by the account."""
+        digest = hashlib.sha256(username.encode()).hexdigest()
+        return os.path.join(self.path, "{0}.token".format(digest))
+
+    @staticmethod
+    def _cipher(username, password):
+        """Return the cipher keyed by the account credentials."""
+        key = hashlib.pbkdf2_hmac('sha256', password.encode(),
+                                  username.encode(), TOKEN_CACHE_ITERATIONS)
+        return Fernet(base64.urlsafe_b64encode(key))
+
+    def load(self, username, password):
+        """Return the cached session if it is still valid, else None.
+
+        :param username: Arlo user email
+        :param password: Arlo user password
+        """
+        if not self.available or not username or not password:
+            return None
+
+        filename = self._filename(username)
+        if not os.path.isfile(filename):
+            return None
+
+        try:
+            with open(filename, 'rb') as data:
+                payload = self._cipher(username, password).decrypt(
+                    data.read())
+            session = json.loads(payload.decode())
+        except (IOError, OSError, ValueError, InvalidToken) as error:
+            _LOGGER.debug("Ignoring unreadable token cache: %s", error)
+            return None
+
+        if session.get('expires', 0) - self.margin <= time.time():
+            _LOGGER.debug("Cached token expired for %s", username)
+            return None
+
+        return session
+
+    def save(self, username, password, session):
+        """Encrypt and store the session.
+
+        :param username: Arlo user email
+        :param password: Arlo user password
+        :param session: Dictionary with token, userId and expires keys
+        """
+        if not self.available or not username or not password:
+            return False
+
+        payload = self._cipher(username, password).encrypt(
+            json.dumps(session).encode())
+
+        filename = self._filename(username)
+        tmpfile = filename + '.tmp'
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            fdesc = os.open(tmpfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                            0o600)
+            with os.fdopen(fdesc, 'wb') as data:
+                data.write(payload)
+            getattr(os, 'replace', os.rename)(tmpfile, filename)
+        except (IOError, OSError) as error:
+            _LOGGER.error("Unable to save token cache: %s", error)
+            return False
+        return True
+
+    def clear(self, username):
+        """Remove the cached session of the account."""
+        filename = self._filename(username)
+        if os.path.isfile(filename):
+            os.remove(filename)
+
+# vim:sw=4:ts=4:et:
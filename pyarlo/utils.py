@@ -4,6 +4,7 @@ import logging
 import time
 from datetime import datetime as dt
 import requests
+from pyarlo.const import API_URL, AUTH_URL
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,10 +21,14 @@ def pretty_timestamp(timestamp, date_format='%a-%m_%d_%y:%H:%M:%S'):
                          time.localtime(int(str(timestamp)[:10])))
 
 
-def http_get(url, filename=None):
-    """Download HTTP data."""
+def http_get(url, filename=None, session=None):
+    """Download HTTP data.
+
+    :param filename: File to save data. Default: return bytes
+    :param session: requests.Session to reuse pooled connections
+    """
     try:
-        ret = requests.get(url)
+        ret = (session or requests).get(url)
     except requests.exceptions.SSLError as error:
         _LOGGER.error(error)
         return False
@@ -39,18 +44,33 @@ def http_get(url, filename=None):
     return True
 
 
-def http_stream(url, chunk=4096):
+def http_stream(url, chunk=4096, session=None):
     """Generate stream for a given record video.
 
     :param chunk: chunk bytes to read per time
+    :param session: requests.Session to reuse pooled connections
     :returns generator object
     """
-    ret = requests.get(url, stream=True)
+    ret = (session or requests).get(url, stream=True)
     ret.raise_for_status()
     for data in ret.iter_content(chunk):
         yield data
 
 
+def rebase_url(url, base_url):
+    """Return url pointing to base_url instead of the Arlo cloud.
+
+    :param url: Arlo API URL built from the endpoints in const.py
+    :param base_url: Scheme and host replacing API_URL and AUTH_URL
+    """
+    if not base_url:
+        return url
+    for prefix in (API_URL, AUTH_URL):
+        if url.startswith(prefix):
+            return base_url.rstrip('/') + url[len(prefix):]
+    return url
+
+
 def assert_is_dict(var):
     """Assert variable is from the type dictionary."""
     if var is None or not isinstance(var, dict):
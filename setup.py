@@ -21,6 +21,8 @@ setup(
     license='LGPLv3+',
     include_package_data=True,
     install_requires=['requests', 'sseclient-py'],
+    extras_require={'async': ['aiohttp'],
+                    'token_cache': ['cryptography']},
     test_suite='tests',
     keywords=[
         'arlo',
@@ -23,6 +23,16 @@ def load_fixture_json(filename):
     return json.loads(fixture)
 
 
+def load_events(load, *answered):
+    """Return a publish_and_get_events stand-in answering with load."""
+    def publish_and_get_events(self, resources, *args, **kwargs):
+        """Answer the answered resources with the loaded event."""
+        return dict((resource, load(self, resource)
+                     if resource in answered else None)
+                    for resource in resources)
+    return publish_and_get_events
+
+
 def load_base_properties(*args, **kwargs):
     """Load base station properties into a dict."""
     return load_fixture_json("pyarlo_base_station_properties.json")
@@ -0,0 +1,10 @@
+"""Configuration of the PyArlo test collection."""
+import sys
+
+# the asyncio client uses async generators, added on Python 3.6,
+# the event iterator async methods, added on Python 3.5
+collect_ignore = []
+if sys.version_info < (3, 6):
+    collect_ignore.append('test_aio.py')
+if sys.version_info < (3, 5):
+    collect_ignore.append('test_event_iterator.py')
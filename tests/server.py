@@ -0,0 +1,495 @@
+"""Local stand-in for the Arlo cloud used by tests and benchmarks.
+
+The server is seeded from the JSON files in tests/fixtures and covers the
+auth, devices, library, notify, subscribe/SSE, startStream and snapshot
+endpoints. Point PyArlo at it with PyArlo(..., base_url=server.url).
+"""
+import copy
+import json
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+try:
+    import queue
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse
+except ImportError:
+    import Queue as queue
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse
+
+from tests.common import load_fixture, load_fixture_json
+
+# fixtures returned by the base station for a given notify resource
+RESOURCE_FIXTURES = {
+    'basestation': 'pyarlo_base_station_properties.json',
+    'cameras': 'pyarlo_camera_properties.json',
+    'modes': 'pyarlo_modes.json',
+    'rules': 'pyarlo_camera_rules.json',
+    'schedule': 'pyarlo_camera_schedule.json',
+    'audioPlayback': 'pyarlo_audio_playback.json',
+}
+
+HEARTBEAT = 1.0
+
+# queued to an event stream to stop writing to it
+STALL = object()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """HTTP server handling each request on a thread."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ArloStandInServer(object):
+    """In-process stand-in of the Arlo cloud."""
+
+    def __init__(self, cameras=None, videos=None, days=1, latency=0,
+                 error_rate=0, error_status=503, seed=0, port=0,
+                 base_stations=None, event_delay=0):
+        """Initialize the server.
+
+        :param cameras: Number of cameras. Default: the fixture cameras
+        :param videos: Number of library videos. Default: fixture videos
+        :param days: Days the generated videos are spread over
+        :param latency: Seconds added to every request
+        :param error_rate: Ratio of requests failing with error_status
+        :param error_status: HTTP status of the injected errors
+        :param seed: Seed of the error injection
+        :param port: TCP port to listen on, 0 picks a free port
+        :param base_stations: Number of base stations. Default: fixture
+        :param event_delay: Seconds the base stations take to answer a get
+        """
+        self.latency = latency
+        self.event_delay = event_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.port = port
+        self.requests = {}
+        self.notifications = []
+        self.library_queries = []
+        self._random = random.Random(seed)
+        self._fail_next = []
+        self._subscribers = []
+        self._pending = []
+        self._history = deque(maxlen=1000)
+        self._event_id = 0
+        self.last_event_ids = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._running = False
+
+        self.auth = load_fixture_json('pyarlo_authentication.json')
+        self.devices = self._make_devices(cameras, base_stations)
+        self.videos = self._make_videos(videos, days)
+        self.resources = dict(
+            (name, load_fixture_json(fixture)['properties'])
+            for name, fixture in RESOURCE_FIXTURES.items())
+        self.resources['cameras'] = self._make_camera_properties()
+        self.extended_properties = \
+            load_fixture_json('pyarlo_extended_properties.json')['properties']
+        self.ambient_sensors = \
+            load_fixture_json('pyarlo_ambient_sensors.json')['properties']
+        self.image = load_fixture('last_image.jpg', binary=True)
+
+    def __enter__(self):
+        """Start the server as a context manager."""
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop the server as a context manager."""
+        self.stop()
+
+    @property
+    def url(self):
+        """Return the base URL to pass to PyArlo."""
+        return 'http://127.0.0.1:{0}'.format(self.port)
+
+    @property
+    def base_station(self):
+        """Return the base station device."""
+        return [dev for dev in self.devices
+                if dev['deviceType'] == 'basestation'][0]
+
+    @property
+    def cameras(self):
+        """Return the camera devices."""
+        return [dev for dev in self.devices
+                if dev['deviceType'] == 'camera']
+
+    def _make_devices(self, count, stations):
+        """Return the device list, scaled to count cameras and stations."""
+        devices = load_fixture_json('pyarlo_devices.json')['data']
+        for device in devices:
+            self._rebase_device(device)
+        if count is None and stations is None:
+            return devices
+
+        cameras = [dev for dev in devices if dev['deviceType'] == 'camera']
+        base = [dev for dev in devices if dev['deviceType'] == 'basestation']
+        if stations is not None:
+            template = base[0]
+            base = []
+            for i in range(stations):
+                station = copy.deepcopy(template)
+                station['deviceId'] = '48B14CB{0:06d}'.format(i)
+                station['deviceName'] = 'Arlo Station {0}'.format(i)
+                station['uniqueId'] = '235-' + station['deviceId']
+                base.append(station)
+
+        if count is not None:
+            template = cameras[0]
+            cameras = []
+            for i in range(count):
+                camera = copy.deepcopy(template)
+                camera['deviceId'] = '48B14C{0:07d}'.format(i)
+                camera['deviceName'] = 'Camera {0}'.format(i)
+                camera['uniqueId'] = '235-' + camera['deviceId']
+                camera['displayOrder'] = i
+                cameras.append(camera)
+
+        for i, camera in enumerate(cameras):
+            camera['parentId'] = base[i % len(base)]['deviceId']
+            self._rebase_device(camera)
+        return cameras + base
+
+    def _rebase_device(self, device):
+        """Point the presigned URLs of a device to the server."""
+        for key in ('presignedLastImageUrl', 'presignedSnapshotUrl',
+                    'presignedFullFrameSnapshotUrl'):
+            if key in device:
+                device[key] = '{{url}}/media/{0}/{1}.jpg'.format(
+                    device['deviceId'], key)
+
+    def _make_videos(self, count, days):
+        """Return the library videos, scaled to count videos."""
+        if count is None:
+            videos = load_fixture_json('pyarlo_videos.json')['data']
+            now = int(time.time() * 1000)
+            for i, video in enumerate(videos):
+                video['localCreatedDate'] = now - i * 60000
+                self._rebase_video(video)
+            return videos
+
+        template = load_fixture_json('pyarlo_videos.json')['data'][0]
+        cameras = self.cameras
+        now = int(time.time() * 1000)
+        step = max(1, int(days * 86400000 / max(count, 1)))
+        videos = []
+        for i in range(count):
+            video = dict(template)
+            created = now - i * step
+            video['name'] = str(created)
+            video['localCreatedDate'] = created
+            video['utcCreatedDate'] = created
+            video['deviceId'] = cameras[i % len(cameras)]['deviceId']
+            video['reason'] = 'motionRecord'
+            video['objCategory'] = ('Person', 'Vehicle', 'Animal')[i % 3]
+            self._rebase_video(video)
+            videos.append(video)
+        return videos
+
+    @staticmethod
+    def _rebase_video(video):
+        """Point the presigned URLs of a video to the server."""
+        expires = int(time.time()) + 3600
+        video['presignedContentUrl'] = \
+            '{{url}}/media/{0}.mp4?Expires={1}'.format(video['name'], expires)
+        video['presignedThumbnailUrl'] = \
+            '{{url}}/media/{0}_thumb.jpg?Expires={1}'.format(
+                video['name'], expires)
+
+    def _make_camera_properties(self):
+        """Return the cameras resource matching the camera devices."""
+        template = load_fixture_json(
+            'pyarlo_camera_properties.json')['properties']
+        properties = []
+        for i, camera in enumerate(self.cameras):
+            prop = copy.deepcopy(template[i % len(template)])
+            prop['serialNumber'] = camera['deviceId']
+            properties.append(prop)
+        return properties
+
+    def fail_next(self, count=1, status=503):
+        """Fail the next requests with the given status."""
+        with self._lock:
+            self._fail_next.extend([status] * count)
+
+    def start(self):
+        """Start serving on a daemon thread."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Dispatch requests to the server."""
+
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """Handle GET requests."""
+                server.handle(self, 'GET')
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                """Handle POST requests."""
+                server.handle(self, 'POST')
+
+            def do_PUT(self):  # pylint: disable=invalid-name
+                """Handle PUT requests."""
+                server.handle(self, 'PUT')
+
+            def log_message(self, *args):
+                """Do not log requests."""
+
+        self._running = True
+        self._server = _ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving and close the event streams."""
+        self._running = False
+        self.drop_streams()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def drop_streams(self):
+        """End every open event stream, like a network failure would."""
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.put(None)
+
+    def stall_streams(self):
+        """Stop writing to every open event stream, keepalive pings too,
+        without closing it, like a half-open connection."""
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.put(STALL)
+
+    @property
+    def open_streams(self):
+        """Return number of connected event streams."""
+        return len(self._subscribers)
+
+    def count(self, path):
+        """Return number of requests received on path."""
+        return self.requests.get(path, 0)
+
+    def push_event(self, event):
+        """Send an event to every open event stream.
+
+        Events sent while no stream is open are kept for the next one,
+        like the cloud does between a notify and the subscribe.
+        """
+        with self._lock:
+            self._event_id += 1
+            item = (self._event_id, event)
+            self._history.append(item)
+            if not self._subscribers:
+                self._pending.append(item)
+            for subscriber in self._subscribers:
+                subscriber.put(item)
+
+    def handle(self, request, method):
+        """Route a request."""
+        parsed = urlparse(request.path)
+        path = parsed.path
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            forced = self._fail_next.pop(0) if self._fail_next else None
+
+        length = int(request.headers.get('Content-Length') or 0)
+        body = json.loads(request.rfile.read(length).decode() or 'null') \
+            if length else None
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if forced is None and self.error_rate and \
+                self._random.random() < self.error_rate:
+            forced = self.error_status
+        if forced is not None:
+            return self._send(request, {'success': False}, forced)
+
+        if path == '/api/auth':
+            return self._send(request, self.auth)
+        if path == '/hmsweb/users/devices':
+            return self._send(request, {'data': self._json(self.devices),
+                                        'success': True})
+        if path == '/hmsweb/users/library':
+            return self._send(request, {'data': self._library(body),
+                                        'success': True})
+        if path.startswith('/hmsweb/users/library/reset'):
+            return self._send(request, {'success': True})
+        if path.startswith('/hmsweb/users/devices/notify/'):
+            return self._notify(request, path.split('/')[-1], body)
+        if path == '/hmsweb/client/subscribe':
+            return self._stream(request)
+        if path == '/hmsweb/client/unsubscribe':
+            self.drop_streams()
+            return self._send(request, {'success': True})
+        if path == '/hmsweb/users/devices/startStream':
+            return self._send(request, load_fixture_json(
+                'pyarlo_camera_live_streaming.json'))
+        if path == '/hmsweb/users/devices/fullFrameSnapshot':
+            return self._send(request, {'success': True})
+        if path.startswith('/media/'):
+            return self._send_bytes(request, self.image)
+        return self._send(request, {'success': False}, 404)
+
+    def _json(self, data):
+        """Return data with the server URL in the presigned URLs."""
+        return json.loads(json.dumps(data).replace('{url}', self.url))
+
+    def _library(self, body):
+        """Return the videos between dateFrom and dateTo."""
+        body = body or {}
+        self.library_queries.append(body)
+        date_from = body.get('dateFrom', '00000000')
+        date_to = body.get('dateTo', '99999999')
+        videos = []
+        for video in self.videos:
+            created = datetime.fromtimestamp(
+                video['localCreatedDate'] / 1000.0).strftime('%Y%m%d')
+            if date_from <= created <= date_to:
+                videos.append(video)
+        return self._json(videos)
+
+    def resource_properties(self, resource):
+        """Return the properties the base station reports for resource."""
+        if resource in self.resources:
+            return self.resources[resource]
+        if resource.endswith('/ambientSensors/history'):
+            return self.ambient_sensors
+        if resource.startswith('cameras/'):
+            return self.extended_properties
+        return {}
+
+    def _notify(self, request, device_id, body):
+        """Handle base station actions and reply on the event stream."""
+        body = body or {}
+        self.notifications.append(body)
+        action = body.get('action')
+        resource = body.get('resource') or ''
+        event = {
+            'action': 'is',
+            'from': device_id,
+            'to': body.get('from'),
+            'transId': body.get('transId'),
+            'resource': resource}
+
+        if action == 'get':
+            event['properties'] = self.resource_properties(resource)
+            if self.event_delay:
+                timer = threading.Timer(
+                    self.event_delay, self.push_event, (event,))
+                timer.daemon = True
+                timer.start()
+            else:
+                self.push_event(event)
+        elif action == 'set':
+            properties = body.get('properties') or {}
+            if resource == 'modes':
+                self.resources['modes']['active'] = properties.get('active')
+            elif resource == 'schedule':
+                self.resources['schedule']['active'] = \
+                    properties.get('active')
+            if not resource.startswith('subscriptions/'):
+                event['properties'] = properties
+                self.push_event(event)
+        return self._send(request, {'success': True})
+
+    def _stream(self, request):
+        """Serve the Server-Sent Events stream.
+
+        Streams sending Last-Event-ID get the events sent after it.
+        """
+        subscriber = queue.Queue()
+        last_event_id = request.headers.get('Last-Event-ID')
+        with self._lock:
+            self._subscribers.append(subscriber)
+            if last_event_id:
+                self.last_event_ids.append(last_event_id)
+                missed = [item for item in self._history
+                          if item[0] > int(last_event_id)]
+            else:
+                missed = self._pending
+            for item in missed:
+                subscriber.put(item)
+            del self._pending[:]
+
+        request.send_response(200)
+        request.send_header('Content-Type', 'text/event-stream')
+        request.send_header('Cache-Control', 'no-cache')
+        request.send_header('Transfer-Encoding', 'chunked')
+        request.send_header('Connection', 'close')
+        request.end_headers()
+        request.close_connection = True
+
+        try:
+            self._write_event(request, None, {'status': 'connected'})
+            while self._running:
+                try:
+                    item = subscriber.get(timeout=HEARTBEAT)
+                except queue.Empty:
+                    self._write_chunk(request, b': ping\n\n')
+                    continue
+                if item is None:
+                    break
+                if item is STALL:
+                    while self._running:
+                        time.sleep(0.05)
+                    break
+                self._write_event(request, item[0], item[1])
+            self._write_chunk(request, b'')
+        except (IOError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self._subscribers.remove(subscriber)
+
+    @staticmethod
+    def _write_event(request, event_id, event):
+        """Write one event to the stream."""
+        data = ''
+        if event_id is not None:
+            data += 'id: {0}\n'.format(event_id)
+        data += 'data: {0}\n\n'.format(json.dumps(event))
+        ArloStandInServer._write_chunk(request, data.encode())
+
+    @staticmethod
+    def _write_chunk(request, data):
+        """Write one chunk of a chunked response."""
+        request.wfile.write('{0:x}\r\n'.format(len(data)).encode() +
+                            data + b'\r\n')
+        request.wfile.flush()
+
+    @staticmethod
+    def _send(request, data, status=200):
+        """Send a JSON response."""
+        body = json.dumps(data).encode()
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    @staticmethod
+    def _send_bytes(request, data):
+        """Send a binary response."""
+        request.send_response(200)
+        request.send_header('Content-Type', 'image/jpeg')
+        request.send_header('Content-Length', str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
@@ -0,0 +1,230 @@
+"""The tests for the PyArlo asyncio client."""
+import asyncio
+import json
+import unittest
+
+import pytest
+
+from tests.common import load_fixture_json, load_camera_properties
+from tests.server import ArloStandInServer
+
+from pyarlo.const import (
+    DEVICES_ENDPOINT, LIBRARY_ENDPOINT, LOGIN_ENDPOINT, NOTIFY_ENDPOINT,
+    UNSUBSCRIBE_ENDPOINT)
+
+pytest.importorskip('aiohttp')
+
+USERNAME = 'foo'
+PASSWORD = 'bar'
+USERID = '999-123456'
+BASE_STATION_ID = '48B14CBBBBBBB'
+
+FIXTURES = {
+    LOGIN_ENDPOINT: 'pyarlo_authentication.json',
+    DEVICES_ENDPOINT: 'pyarlo_devices.json',
+    LIBRARY_ENDPOINT: 'pyarlo_videos.json',
+}
+
+
+def run(coro):
+    """Run a coroutine on a fresh event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class FakeQuery(object):
+    """Coroutine replacing AsyncPyArlo.query with fixtures."""
+
+    def __init__(self):
+        self.calls = []
+        self.base = None
+
+    async def __call__(self, url, method='GET', extra_params=None, **kwargs):
+        self.calls.append((method, url, extra_params))
+        if url in FIXTURES:
+            return load_fixture_json(FIXTURES[url])
+        if url == NOTIFY_ENDPOINT.format(BASE_STATION_ID):
+            if extra_params.get('action') == 'get':
+                self.base._receive_event(load_camera_properties())
+            return {'success': True}
+        return None
+
+
+class TestAsyncPyArlo(unittest.TestCase):
+    """Tests for AsyncPyArlo component."""
+
+    def load_arlo(self, preload=True):
+        from pyarlo.aio import AsyncPyArlo
+
+        arlo = AsyncPyArlo(USERNAME, PASSWORD, preload=preload, days=1,
+                           websession=object())
+        arlo.query = FakeQuery()
+        return arlo
+
+    def test_login_and_devices(self):
+        """Test AsyncPyArlo login, preload and device discovery."""
+        from pyarlo.aio import AsyncArloBaseStation, AsyncArloCamera
+
+        arlo = self.load_arlo()
+
+        async def scenario():
+            await arlo.login()
+            return await arlo.get_devices()
+
+        devices = run(scenario())
+        self.assertEqual(arlo.userid, USERID)
+        self.assertTrue(arlo.is_connected)
+        self.assertEqual(arlo.__repr__(), '<AsyncPyArlo: 999-123456>')
+        self.assertEqual(len(devices['cameras']), 2)
+        self.assertIsInstance(arlo.cameras[0], AsyncArloCamera)
+        self.assertIsInstance(arlo.base_stations[0], AsyncArloBaseStation)
+        self.assertEqual(len(arlo.ArloMediaLibrary.videos), 3)
+        self.assertIsNone(arlo.lookup_camera_by_id('FAKEID'))
+
+    def test_library_load_only_cameras(self):
+        """Test AsyncArloMediaLibrary.load filtering by camera."""
+        arlo = self.load_arlo(preload=False)
+
+        async def scenario():
+            await arlo.login()
+            await arlo.get_devices()
+            camera = arlo.lookup_camera_by_id('48B14C1299999')
+            return await arlo.ArloMediaLibrary.load(
+                days=1, only_cameras=camera)
+
+        self.assertEqual(len(run(scenario())), 2)
+        self.assertListEqual(arlo.ArloMediaLibrary.videos, [])
+
+    def test_publish_and_get_event(self):
+        """Test AsyncArloBaseStation.publish_and_get_event."""
+        from pyarlo.aio import AsyncArloBaseStation
+
+        arlo = self.load_arlo(preload=False)
+
+        async def fake_start(base):
+            return True
+
+        async def scenario():
+            await arlo.login()
+            await arlo.get_devices()
+            base = arlo.base_stations[0]
+            arlo.query.base = base
+            base._start_event_stream = lambda: fake_start(base)
+            return await base.publish_and_get_event('cameras', timeout=1)
+
+        event = run(scenario())
+        self.assertEqual(event, load_camera_properties())
+
+        actions = [params.get('action') for method, url, params
+                   in arlo.query.calls if url.endswith(BASE_STATION_ID)]
+        self.assertEqual(actions, ['set', 'get'])
+        self.assertEqual(arlo.query.calls[-1][1], UNSUBSCRIBE_ENDPOINT)
+        self.assertIsInstance(arlo.base_stations[0], AsyncArloBaseStation)
+
+    def test_concurrent_reads_share_stream(self):
+        """Test overlapping reads keep the stream until the last one ends."""
+        from pyarlo.aio import AsyncPyArlo
+
+        async def scenario(url):
+            arlo = AsyncPyArlo(USERNAME, PASSWORD, preload=False,
+                               base_url=url)
+            await arlo.login()
+            await arlo.get_devices()
+            base = arlo.base_stations[0]
+
+            async def late_read():
+                await asyncio.sleep(0.2)
+                return await base.publish_and_get_event('cameras', timeout=3)
+
+            events = await asyncio.gather(
+                base.publish_and_get_event('modes', timeout=3), late_read())
+            await arlo.close()
+            return base, events
+
+        with ArloStandInServer(event_delay=0.3) as server:
+            base, events = run(scenario(server.url))
+            self.assertEqual(events[0]['resource'], 'modes')
+            self.assertEqual(events[1]['resource'], 'cameras')
+            self.assertEqual(server.count('/hmsweb/client/subscribe'), 1)
+            self.assertEqual(server.count('/hmsweb/client/unsubscribe'), 1)
+            self.assertIsNone(base._stream_task)
+            self.assertEqual(base._waiters, {})
+
+    def test_device_properties(self):
+        """Test the devices of AsyncPyArlo serve cached properties."""
+        import warnings
+
+        arlo = self.load_arlo(preload=False)
+
+        async def fake_start(base):
+            return True
+
+        async def scenario():
+            await arlo.login()
+            await arlo.get_devices()
+            base = arlo.base_stations[0]
+            camera = arlo.cameras[0]
+            arlo.query.base = base
+            base._start_event_stream = lambda: fake_start(base)
+            self.assertIsNone(camera.battery_level)
+            await camera.async_update()
+            self.assertIs(arlo.cameras[0], camera)
+            self.assertIs(camera.base_station, base)
+            return camera
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            camera = run(scenario())
+
+        self.assertEqual(camera.battery_level, 77)
+        self.assertEqual(camera.signal_strength, 3)
+        self.assertTrue(camera.is_camera_connected)
+        self.assertEqual(camera.base_station.get_cameras_battery_level(),
+                         {'48B14CAAAAAAA': 77, '48B14C1299999': 95})
+
+        # the blocking API of the sync devices is not inherited
+        for name in ('update', 'videos', 'last_video', 'register_callback'):
+            self.assertFalse(hasattr(camera, name))
+        for name in ('update', 'mode', 'properties', 'publish_and_get_events',
+                     'set_volume', 'subscribe'):
+            self.assertFalse(hasattr(camera.base_station, name))
+
+    def test_iter_sse(self):
+        """Test parsing of Server-Sent Events."""
+        from pyarlo.aio import _iter_sse
+
+        class FakeResponse(object):
+            """Response exposing content lines."""
+
+            def __init__(self, lines):
+                self.lines = lines
+
+            @property
+            def content(self):
+                return self
+
+            def __aiter__(self):
+                self._iter = iter(self.lines)
+                return self
+
+            async def __anext__(self):
+                try:
+                    return next(self._iter)
+                except StopIteration:
+                    raise StopAsyncIteration
+
+        lines = [b'event: message\n',
+                 b'data: {"status": "connected"}\n', b'\n',
+                 b'data: {"action": "is",\n', b'data: "resource": "x"}\n',
+                 b'\n']
+
+        async def scenario():
+            return [json.loads(data) async for data in
+                    _iter_sse(FakeResponse(lines))]
+
+        self.assertEqual(run(scenario()),
+                         [{'status': 'connected'},
+                          {'action': 'is', 'resource': 'x'}])
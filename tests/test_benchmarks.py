@@ -0,0 +1,52 @@
+"""The tests for the benchmark regression check."""
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Tests for the benchmarks runner."""
+
+    def test_compare(self):
+        """Test only cases beyond the threshold are regressions."""
+        from benchmarks.run import compare
+
+        results = {'fast': {'relative': 1.2},
+                   'slow': {'relative': 1.3},
+                   'new': {'relative': 5}}
+        self.assertEqual(compare(results, {'fast': 1, 'slow': 1}, 0.25),
+                         ['slow'])
+
+    def test_compare_min_delta(self):
+        """Test microsecond cases only regress beyond the noise floor."""
+        from benchmarks.run import compare
+
+        results = {'noisy': {'relative': 0.001},
+                   'slow': {'relative': 0.004}}
+        baseline = {'noisy': 0.0007, 'slow': 0.0007}
+        self.assertEqual(compare(results, baseline, 0.25, 0.002), ['slow'])
+
+    def test_record(self):
+        """Test the baseline keeps cases not run."""
+        from benchmarks.run import load_baseline, save_baseline
+
+        path = tempfile.mkdtemp()
+        try:
+            baseline = os.path.join(path, 'baseline.json')
+            self.assertEqual(load_baseline(baseline), {})
+            save_baseline({'a': {'relative': 1.0}}, baseline)
+            save_baseline({'b': {'relative': 0.00087654321}}, baseline)
+            self.assertEqual(load_baseline(baseline),
+                             {'a': 1.0, 'b': 0.00087654321})
+        finally:
+            shutil.rmtree(path)
+
+    def test_cases_run(self):
+        """Test the benchmark cases run offline."""
+        from benchmarks.cases import CASES
+
+        for name, _, setup in CASES:
+            if name in ('library_load_10k', 'library_load_100k'):
+                continue
+            setup()()
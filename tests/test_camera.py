@@ -7,6 +7,7 @@ from tests.common import (
     load_fixture_json,
     load_camera_live_streaming,
     load_camera_properties as load_camera_props,
+    load_events,
     load_camera_schedule_snapshot,
     open_fixture
 )
@@ -43,6 +44,8 @@ class TestArloCamera(unittest.TestCase):
 
     @requests_mock.Mocker()
     @patch.object(ArloBaseStation, "publish_and_get_event", load_camera_props)
+    @patch.object(ArloBaseStation, "publish_and_get_events",
+                  load_events(load_camera_props, 'cameras'))
     @patch.object(ArloBaseStation, "get_ambient_sensor_data", MagicMock())
     def test_camera_properties(self, mock):
         """Test ArloCamera properties."""
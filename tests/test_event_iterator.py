@@ -0,0 +1,91 @@
+"""The tests for the PyArlo event iterator."""
+import asyncio
+import unittest
+
+from tests.server import ArloStandInServer
+
+USERNAME = 'foo'
+PASSWORD = 'bar'
+
+
+def run(coro):
+    """Run a coroutine on a fresh event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class TestArloEventIterator(unittest.TestCase):
+    """Tests for ArloEventIterator component."""
+
+    def test_events_iterator(self):
+        """Test PyArlo.events filters the stream into an async iterator."""
+        from pyarlo import PyArlo
+
+        with ArloStandInServer() as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                          base_url=server.url)
+            base = arlo.base_stations[0]
+            camera = arlo.cameras[0]
+
+            async def scenario():
+                received = []
+                events = arlo.events(device=camera, action='is',
+                                     resource='cameras', maxsize=2)
+                async with events:
+                    self.assertTrue(arlo.event_hub.subscribed)
+                    for event in (
+                            {'from': base.device_id, 'action': 'is',
+                             'resource': 'modes'},
+                            {'from': base.device_id, 'action': 'set',
+                             'resource': 'cameras/' + camera.device_id},
+                            {'from': base.device_id, 'action': 'is',
+                             'resource': 'cameras/' + camera.device_id,
+                             'properties': {'batteryLevel': 10}},
+                            {'from': base.device_id, 'action': 'is',
+                             'resource': 'cameras/OTHERCAMERA'}):
+                        server.push_event(event)
+                    async for event in events:
+                        received.append(event)
+                        break
+                self.assertEqual([event async for event in events], [])
+                return received
+
+            received = run(asyncio.wait_for(scenario(), 10))
+            self.assertEqual(len(received), 1)
+            self.assertEqual(received[0]['properties'],
+                             {'batteryLevel': 10})
+            self.assertFalse(arlo.event_hub.subscribed)
+            self.assertEqual(server.count('/hmsweb/client/unsubscribe'), 1)
+
+    def test_events_iterator_overflow(self):
+        """Test a full ArloEventIterator drops the oldest events."""
+        from pyarlo.event_iterator import ArloEventIterator
+
+        class FakeSession(object):
+            event_hub = None
+            base_stations = []
+
+        async def scenario():
+            events = ArloEventIterator(FakeSession(), maxsize=2)
+            for i in range(5):
+                events._deliver({'i': i})
+            return events
+
+        events = run(scenario())
+        self.assertEqual(events.dropped, 3)
+        self.assertEqual([events._queue.get_nowait()['i'] for _ in range(2)],
+                         [3, 4])
+        self.assertTrue(events.matches({'action': 'is'}))
+        events = ArloEventIterator(FakeSession(), device='48B14CAAAAAAA',
+                                   resource=['modes', 'cameras'])
+        self.assertTrue(events.matches(
+            {'resource': 'cameras', 'from': 'BASE',
+             'properties': [{'serialNumber': '48B14CAAAAAAA'}]}))
+        self.assertTrue(events.matches(
+            {'resource': 'cameras/48B14CAAAAAAA/ambientSensors',
+             'from': 'BASE'}))
+        self.assertFalse(events.matches(
+            {'resource': 'schedule', 'from': '48B14CAAAAAAA'}))
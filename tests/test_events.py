@@ -0,0 +1,489 @@
+"""The tests for the PyArlo event hub."""
+import threading
+import time
+import unittest
+from tests.common import load_fixture
+from tests.server import ArloStandInServer
+import requests_mock
+
+from pyarlo.const import DEVICES_ENDPOINT, LOGIN_ENDPOINT
+
+USERNAME = 'foo'
+PASSWORD = 'bar'
+
+
+class FakeStation(object):
+    """Base station stand-in recording routed events."""
+
+    def __init__(self, device_id):
+        """Initialize the fake base station."""
+        self.device_id = device_id
+        self.events = []
+
+    def _receive_event(self, event):
+        """Record an event."""
+        self.events.append(event)
+
+
+class TestArloEventHub(unittest.TestCase):
+    """Tests for ArloEventHub component."""
+
+    def test_route(self):
+        """Test events are routed by sender, then resource."""
+        from pyarlo.events import ArloEventHub
+
+        hub = ArloEventHub(None)
+        first = FakeStation('48B14CBBBBBBB')
+        second = FakeStation('48B14CCCCCCCC')
+        hub.register(first)
+        hub.register(second)
+
+        listened = []
+        hub.add_listener(listened.append)
+        hub.dispatch({'from': '48B14CCCCCCCC', 'action': 'is',
+                      'resource': 'modes'})
+        hub.dispatch({'action': 'is', 'resource': 'cameras/48B14CBBBBBBB'})
+        hub.dispatch({'from': 'unknown', 'action': 'is',
+                      'resource': 'cameras'})
+        hub.dispatch({'from': '48B14CCCCCCCC', 'action': 'set',
+                      'resource': 'modes'})
+        self.assertEqual([event['resource'] for event in first.events],
+                         ['cameras/48B14CBBBBBBB', 'cameras'])
+        self.assertEqual([event['resource'] for event in second.events],
+                         ['modes', 'cameras'])
+        # listeners also get the events of the other actions
+        self.assertEqual([event['action'] for event in listened],
+                         ['is', 'is', 'is', 'set'])
+
+        hub.unregister(second)
+        self.assertEqual(hub.route({'from': '48B14CCCCCCCC'}), [first])
+
+    def test_event_buffer(self):
+        """Test buffer policies bound the unclaimed events."""
+        from pyarlo.const import EVENT_COALESCE
+        from pyarlo.events import ArloEventBuffer
+
+        buffer = ArloEventBuffer(capacity=3)
+        for i in range(5):
+            self.assertEqual(buffer.append({'resource': 'cameras', 'i': i}),
+                             1 if i >= 3 else 0)
+        self.assertEqual([event['i'] for event in buffer], [2, 3, 4])
+        self.assertEqual(buffer.dropped, 2)
+
+        buffer = ArloEventBuffer(capacity=2, policy=EVENT_COALESCE)
+        for resource in ('modes', 'cameras', 'modes', 'rules'):
+            buffer.append({'resource': resource})
+        self.assertEqual([event['resource'] for event in buffer],
+                         ['modes', 'rules'])
+        self.assertEqual(buffer.dropped, 2)
+        buffer.clear()
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(buffer.dropped, 2)
+
+        self.assertRaises(ValueError, ArloEventBuffer, 1, 'unknown')
+
+    @requests_mock.Mocker()
+    def test_dropped_events(self, mock):
+        """Test base stations account for dropped events."""
+        from pyarlo import PyArlo
+
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+        mock.get(DEVICES_ENDPOINT, text=load_fixture('pyarlo_devices.json'))
+
+        arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                      event_buffer_size=10)
+        base = arlo.base_stations[0]
+        for i in range(25):
+            base._receive_event({'resource': 'cameras/{0}'.format(i)})
+        self.assertEqual(base.pending_events, 10)
+        self.assertEqual(base.dropped_events, 15)
+
+        stats = arlo.stats()
+        self.assertEqual(stats['counters']['events_dropped'], 15)
+        self.assertEqual(stats['gauges']['event_queue_depth'], 10)
+
+        events = base.pop_events()
+        self.assertEqual(len(events), 10)
+        self.assertEqual(events[0]['resource'], 'cameras/15')
+        self.assertEqual(base.pending_events, 0)
+        self.assertEqual(base.dropped_events, 15)
+
+    def test_one_stream_for_all_base_stations(self):
+        """Test base stations share the session event stream."""
+        from pyarlo import PyArlo
+
+        with ArloStandInServer(base_stations=3, cameras=6) as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                          base_url=server.url)
+            self.assertEqual(len(arlo.base_stations), 3)
+
+            hub = arlo.event_hub
+            self.assertTrue(hub.acquire(arlo.base_stations[0]))
+            for base in arlo.base_stations:
+                self.assertEqual(base.mode, 'disarmed')
+                self.assertEqual(server.open_streams, 1)
+            hub.release()
+
+            self.assertFalse(hub.subscribed)
+            self.assertEqual(server.count('/hmsweb/client/subscribe'), 1)
+            self.assertEqual(server.count('/hmsweb/client/unsubscribe'), 1)
+
+    def test_persistent_subscription(self):
+        """Test a persistent stream serves every read."""
+        from pyarlo import PyArlo
+
+        with ArloStandInServer() as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                          base_url=server.url, persistent_events=True)
+            hub = arlo.event_hub
+            hub.heartbeat = 0.2
+            base = arlo.base_stations[0]
+            self.assertEqual(base.mode, 'disarmed')
+            self.assertEqual(len(base.camera_properties), 2)
+            self.assertIsNotNone(base.get_ambient_sensor_data())
+            self.assertTrue(hub.is_subscribed(base))
+
+            self.assertEqual(server.count('/hmsweb/client/subscribe'), 1)
+            self.assertEqual(server.count('/hmsweb/client/unsubscribe'), 0)
+
+            def subscriptions():
+                return len([body for body in server.notifications
+                            if body['resource'].startswith('subscriptions/')])
+
+            renewals = subscriptions()
+            time.sleep(0.5)
+            self.assertGreater(subscriptions(), renewals)
+
+            hub.close()
+            self.assertFalse(hub.is_subscribed(base))
+            self.assertEqual(server.count('/hmsweb/client/unsubscribe'), 1)
+
+    def test_concurrent_reads(self):
+        """Test concurrent reads get the event of their own publish."""
+        from pyarlo import PyArlo
+        from pyarlo.events import ArloEventFuture
+
+        with ArloStandInServer() as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                          base_url=server.url, persistent_events=True)
+            base = arlo.base_stations[0]
+            resources = ['modes', 'cameras', 'schedule', 'rules'] * 3
+            results = {}
+
+            def read(index):
+                results[index] = base.publish_and_get_event(
+                    resources[index], timeout=5)
+
+            threads = [threading.Thread(target=read, args=(index,))
+                       for index in range(len(resources))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            for index, resource in enumerate(resources):
+                self.assertEqual(results[index]['resource'], resource)
+            arlo.event_hub.close()
+
+        # an answer with a different resource completes by transId
+        future = ArloEventFuture('cameras/48B14CAAAAAAA', 'web!1.1')
+        base._add_waiter(future)
+        base._receive_event({'resource': 'cameras', 'transId': 'web!1.1'})
+        self.assertTrue(future.done())
+        self.assertEqual(future.result(0)['resource'], 'cameras')
+        self.assertIsNone(
+            ArloEventFuture('modes').result(timeout=0.01))
+
+    def test_concurrent_reads_share_stream(self):
+        """Test overlapping reads keep the stream until the last one ends."""
+        from pyarlo import PyArlo
+
+        with ArloStandInServer(event_delay=0.3) as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                          base_url=server.url)
+            base = arlo.base_stations[0]
+            results = {}
+
+            def read(resource):
+                results[resource] = base.publish_and_get_event(
+                    resource, timeout=3)
+
+            threads = []
+            for resource in ('modes', 'cameras'):
+                thread = threading.Thread(target=read, args=(resource,))
+                thread.start()
+                threads.append(thread)
+                time.sleep(0.1)
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(results['modes']['resource'], 'modes')
+            self.assertEqual(results['cameras']['resource'], 'cameras')
+            self.assertFalse(arlo.event_hub.subscribed)
+            self.assertEqual(server.count('/hmsweb/client/unsubscribe'), 1)
+
+    def test_batched_update(self):
+        """Test update() waits for its resources concurrently."""
+        from pyarlo import PyArlo
+
+        with ArloStandInServer(event_delay=0.5) as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                          base_url=server.url)
+            base = arlo.base_stations[0]
+            base._last_refresh = 0
+
+            started = time.time()
+            base.update()
+            elapsed = time.time() - started
+
+            # three resources answered in 0.5s each, bound by the slowest
+            self.assertLess(elapsed, 1.2)
+            self.assertEqual(len(base._camera_properties), 2)
+            self.assertIsNotNone(base._ambient_sensor_data)
+            self.assertIsNotNone(base._camera_extended_properties)
+            self.assertEqual(server.count('/hmsweb/client/subscribe'), 1)
+            self.assertEqual(server.count('/hmsweb/client/unsubscribe'), 1)
+
+            events = base.publish_and_get_events(
+                ['modes', 'schedule', 'unknown'], timeout=1)
+            self.assertEqual(events['modes']['resource'], 'modes')
+            self.assertEqual(events['schedule']['resource'], 'schedule')
+            self.assertEqual(events['unknown']['properties'], {})
+
+    def test_mode_state(self):
+        """Test modes are resolved in one fetch and set optimistically."""
+        from pyarlo import PyArlo
+
+        with ArloStandInServer() as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                          base_url=server.url, persistent_events=True)
+            base = arlo.base_stations[0]
+
+            def notifications(action):
+                return [body['resource'] for body in server.notifications
+                        if body['action'] == action and
+                        not body['resource'].startswith('subscriptions/')]
+
+            self.assertEqual(base.mode, 'disarmed')
+            self.assertEqual(base.available_modes_with_ids['armed'], 'mode1')
+            self.assertEqual(sorted(notifications('get')),
+                             ['modes', 'schedule'])
+
+            base.mode = 'armed'
+            self.assertEqual(base.mode, 'armed')
+            self.assertEqual(notifications('set'), ['modes'])
+            self.assertEqual(len(notifications('get')), 2)
+
+            # changes made elsewhere reconcile the cached state
+            server.push_event({'from': base.device_id, 'action': 'is',
+                               'resource': 'schedule',
+                               'properties': {'active': True}})
+            for _ in range(50):
+                if base.mode == 'schedule':
+                    break
+                time.sleep(0.05)
+            self.assertEqual(base.mode, 'schedule')
+            self.assertEqual(len(notifications('get')), 2)
+            arlo.event_hub.close()
+
+    def test_callbacks(self):
+        """Test change callbacks are pushed from the stream."""
+        from pyarlo import PyArlo
+
+        with ArloStandInServer() as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                          base_url=server.url, persistent_events=True)
+            base = arlo.base_stations[0]
+            camera = [cam for cam in arlo.cameras
+                      if cam.device_id == '48B14CAAAAAAA'][0]
+            calls = []
+            done = threading.Event()
+
+            def callback(device, resource, properties):
+                calls.append((device, resource, properties))
+                done.set()
+
+            camera.register_callback(callback, 'battery')
+            camera.register_callback(lambda *args: 1 / 0, 'motion')
+            base.register_callback(callback, 'mode')
+            self.assertTrue(arlo.event_hub.is_subscribed(base))
+
+            server.push_event({
+                'action': 'is', 'from': base.device_id,
+                'resource': 'cameras/48B14CAAAAAAA',
+                'properties': {'batteryLevel': 50}})
+            self.assertTrue(done.wait(5))
+            self.assertEqual(calls[0], (camera, 'cameras/48B14CAAAAAAA',
+                                        {'batteryLevel': 50}))
+
+            done.clear()
+            server.push_event({
+                'action': 'is', 'from': base.device_id,
+                'resource': 'modes', 'properties': {'active': 'mode1'}})
+            self.assertTrue(done.wait(5))
+            self.assertEqual(calls[1][:2], (base, 'modes'))
+
+            camera.unregister_callback(callback)
+            done.clear()
+            server.push_event({
+                'action': 'is', 'from': base.device_id,
+                'resource': 'cameras',
+                'properties': server.resources['cameras']})
+            self.assertFalse(done.wait(0.3))
+            self.assertEqual(len(calls), 2)
+            arlo.event_hub.close()
+
+    def test_callbacks_hold_stream(self):
+        """Test callbacks keep a non-persistent stream open."""
+        from pyarlo import PyArlo
+
+        with ArloStandInServer() as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                          base_url=server.url)
+            hub = arlo.event_hub
+            hub.heartbeat = 0.2
+            base = arlo.base_stations[0]
+            camera = arlo.cameras[0]
+            done = threading.Event()
+
+            def callback(device, resource, properties):
+                done.set()
+
+            base.register_callback(callback, 'mode')
+            camera.register_callback(callback)
+            self.assertTrue(hub.is_subscribed(base))
+
+            # reads in between do not close the stream of the callbacks
+            self.assertEqual(len(base.camera_properties), 2)
+            self.assertTrue(hub.is_subscribed(base))
+
+            server.push_event({
+                'action': 'is', 'from': base.device_id,
+                'resource': 'modes', 'properties': {'active': 'mode1'}})
+            self.assertTrue(done.wait(5))
+
+            renewals = len(server.notifications)
+            time.sleep(0.5)
+            self.assertGreater(len(server.notifications), renewals)
+
+            base.unregister_callback(callback)
+            self.assertTrue(hub.subscribed)
+            camera.unregister_callback(callback)
+            self.assertFalse(hub.subscribed)
+            self.assertEqual(server.count('/hmsweb/client/unsubscribe'), 1)
+
+    def test_events_update_cached_state(self):
+        """Test events keep the properties served without queries."""
+        from pyarlo import PyArlo
+
+        with ArloStandInServer() as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                          base_url=server.url, persistent_events=True)
+            base = arlo.base_stations[0]
+            camera = [cam for cam in arlo.cameras
+                      if cam.device_id == '48B14CAAAAAAA'][0]
+            self.assertEqual(base.mode, 'disarmed')
+            self.assertIsNotNone(camera.battery_level)
+            notifications = len(server.notifications)
+
+            done = threading.Event()
+            base.register_callback(lambda *args: done.set(), 'mode')
+            server.push_event({
+                'action': 'is', 'from': base.device_id,
+                'resource': 'cameras/48B14CAAAAAAA',
+                'properties': {'batteryLevel': 12}})
+            server.push_event({
+                'action': 'is', 'from': base.device_id,
+                'resource': 'modes', 'properties': {'active': 'mode1'}})
+            self.assertTrue(done.wait(5))
+
+            self.assertEqual(camera.battery_level, 12)
+            self.assertEqual(base.mode, 'armed')
+            self.assertEqual(len(server.notifications), notifications)
+            arlo.event_hub.close()
+
+    def test_reconnect_and_resume(self):
+        """Test dropped streams reconnect and resume after the last id."""
+        from pyarlo import PyArlo
+
+        with ArloStandInServer() as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                          base_url=server.url, persistent_events=True)
+            hub = arlo.event_hub
+            hub._reconnect.backoff_factor = 0.05
+            base = arlo.base_stations[0]
+            self.assertEqual(base.mode, 'disarmed')
+            subscriptions = len(server.notifications)
+
+            received = []
+            done = threading.Event()
+
+            def callback(device, resource, properties):
+                received.append(properties)
+                done.set()
+
+            base.register_callback(callback, 'mode')
+            server.drop_streams()
+            time.sleep(0.02)
+            server.push_event({
+                'action': 'is', 'from': base.device_id,
+                'resource': 'modes', 'properties': {'active': 'mode1'}})
+
+            self.assertTrue(done.wait(5))
+            self.assertEqual(received, [{'active': 'mode1'}])
+            # the event pushed while disconnected was replayed on resume
+            self.assertEqual(len(server.last_event_ids), 1)
+            self.assertEqual(int(server.last_event_ids[0]) + 1,
+                             int(hub.last_event_id))
+            self.assertEqual(server.count('/hmsweb/client/subscribe'), 2)
+            self.assertEqual(arlo.stats()['counters']['sse_reconnects'], 1)
+
+            # base station subscribed again on the new stream
+            for _ in range(50):
+                if len(server.notifications) > subscriptions:
+                    break
+                time.sleep(0.05)
+            self.assertTrue(hub.is_subscribed(base))
+            self.assertEqual(server.notifications[-1]['resource'],
+                             'subscriptions/999-123456_web')
+            hub.close()
+
+    def test_reconnect_stalled_stream(self):
+        """Test a stream silent beyond read_timeout is reconnected."""
+        from pyarlo import PyArlo
+
+        with ArloStandInServer() as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                          base_url=server.url, persistent_events=True)
+            hub = arlo.event_hub
+            hub._reconnect.backoff_factor = 0.05
+            # longer than the 1s keepalive pings of the server
+            hub.read_timeout = 1.5
+            base = arlo.base_stations[0]
+
+            received = []
+            done = threading.Event()
+
+            def callback(device, resource, properties):
+                received.append(properties)
+                done.set()
+
+            base.register_callback(callback, 'mode')
+            time.sleep(2)
+            self.assertEqual(server.count('/hmsweb/client/subscribe'), 1)
+
+            server.stall_streams()
+            for _ in range(100):
+                if server.count('/hmsweb/client/subscribe') == 2:
+                    break
+                time.sleep(0.05)
+            self.assertEqual(server.count('/hmsweb/client/subscribe'), 2)
+            self.assertEqual(arlo.stats()['counters']['sse_reconnects'], 1)
+
+            server.push_event({
+                'action': 'is', 'from': base.device_id,
+                'resource': 'modes', 'properties': {'active': 'mode1'}})
+            self.assertTrue(done.wait(5))
+            self.assertEqual(received, [{'active': 'mode1'}])
+            hub.close()
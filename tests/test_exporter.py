@@ -0,0 +1,69 @@
+"""The tests for the PyArlo Prometheus exporter."""
+import unittest
+from tests.common import load_fixture
+import requests_mock
+
+from pyarlo.const import DEVICES_ENDPOINT, LOGIN_ENDPOINT
+
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+
+USERNAME = 'foo'
+PASSWORD = 'bar'
+
+
+class TestArloMetricsExporter(unittest.TestCase):
+    """Tests for ArloMetricsExporter component."""
+
+    def load_arlo(self, mock):
+        from pyarlo import PyArlo
+
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+        mock.get(DEVICES_ENDPOINT,
+                 text=load_fixture('pyarlo_devices.json'))
+        arlo = PyArlo(USERNAME, PASSWORD, preload=False)
+        arlo.cameras
+        arlo.refresh_attributes('Patio')
+        arlo.metrics.record_event_wait('modes', 0.3, True)
+        arlo.metrics.record_event('modes')
+        return arlo
+
+    @requests_mock.Mocker()
+    def test_render(self, mock):
+        """Test the Prometheus text format."""
+        from pyarlo.exporter import render_prometheus
+
+        text = render_prometheus(self.load_arlo(mock).stats())
+        lines = text.splitlines()
+        self.assertIn('# TYPE pyarlo_request_duration_seconds histogram',
+                      lines)
+        self.assertIn('pyarlo_request_duration_seconds_count'
+                      '{endpoint="DEVICES_ENDPOINT"} 1', lines)
+        self.assertIn('pyarlo_request_duration_seconds_bucket'
+                      '{endpoint="DEVICES_ENDPOINT",le="+Inf"} 1', lines)
+        self.assertIn('pyarlo_requests_total'
+                      '{endpoint="LOGIN_ENDPOINT",status="200"} 1', lines)
+        self.assertIn('pyarlo_event_wait_seconds_count'
+                      '{resource="modes"} 1', lines)
+        self.assertIn('pyarlo_events_total{resource="modes"} 1', lines)
+        self.assertIn('pyarlo_cache_hit_ratio{cache="devices"} 0.5', lines)
+        self.assertIn('pyarlo_event_queue_depth 0', lines)
+        self.assertIn('pyarlo_retry_policy_retries_total 0', lines)
+
+    @requests_mock.Mocker(real_http=True)
+    def test_serve(self, mock):
+        """Test the exporter serves /metrics on a local port."""
+        from pyarlo.exporter import ArloMetricsExporter
+
+        exporter = ArloMetricsExporter(self.load_arlo(mock), port=0)
+        exporter.start()
+        try:
+            url = 'http://127.0.0.1:{0}/metrics'.format(exporter.port)
+            response = urlopen(url)
+            self.assertEqual(response.getcode(), 200)
+            self.assertIn(b'pyarlo_requests_total', response.read())
+        finally:
+            exporter.stop()
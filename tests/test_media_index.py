@@ -0,0 +1,175 @@
+"""The tests for the PyArlo media index."""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from tests.common import load_fixture_json
+from tests.server import ArloStandInServer
+
+USERNAME = 'foo'
+PASSWORD = 'bar'
+
+
+class TestArloMediaIndex(unittest.TestCase):
+    """Tests for ArloMediaIndex component."""
+
+    def setUp(self):
+        """Create a directory for the index files."""
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the index files."""
+        shutil.rmtree(self.path)
+
+    def test_query(self):
+        """Test videos are indexed and queried."""
+        from pyarlo.media_index import ArloMediaIndex, url_expiry
+
+        videos = load_fixture_json('pyarlo_videos.json')['data']
+        videos[0]['objCategory'] = 'Person'
+        videos[1]['reason'] = 'schedule'
+        videos[1]['presignedContentUrl'] += '?Expires=1500000000'
+        filename = os.path.join(self.path, 'index', 'media.db')
+
+        index = ArloMediaIndex(filename)
+        self.assertEqual(index.add(videos + [{'deviceId': 'noname'}]), 3)
+        self.assertEqual(index.add(videos[:1]), 1)
+        self.assertEqual(len(index), 3)
+
+        self.assertEqual([video['name'] for video in index.query()],
+                         ['1498880152142', '1498879916052', '1498797882209'])
+        self.assertEqual(len(index.query(device='48B14C1299999')), 2)
+        self.assertEqual(len(index.query(device=['48B14CAAAAAAA'])), 1)
+        self.assertEqual(len(index.query(reason='motionRecord')), 2)
+        self.assertEqual(index.query(motion_type='Person')[0]['name'],
+                         '1498880152142')
+        self.assertEqual(len(index.query(
+            date_from=1498879916052, date_to=1498880152142)), 2)
+        self.assertEqual(len(index.query(
+            date_to=datetime.fromtimestamp(1498800000))), 1)
+        self.assertEqual(len(index.query(limit=1)), 1)
+        self.assertEqual(index.expired(), ['1498879916052'])
+        self.assertEqual(index.expired(date_from=1498880000000), [])
+        self.assertEqual(index.expired_range(),
+                         (1498879916052, 1498879916052))
+        self.assertIsNone(index.expired_range(date_from=1498880000000))
+
+        index.set_meta('key', 1)
+        index.set_meta('other', 2)
+        self.assertEqual(index.meta_keys('k'), ['key'])
+        self.assertEqual(index.prune(1498800000000), 1)
+        index.close()
+
+        # the videos are kept across restarts
+        index = ArloMediaIndex(filename)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.get_meta('key'), 1)
+        self.assertIsNone(index.get_meta('unknown'))
+        index.close()
+
+        self.assertEqual(url_expiry(
+            'https://s3/a.mp4?X-Amz-Date=20200101T000000Z&X-Amz-Expires=60'),
+            1577836860)
+        self.assertIsNone(url_expiry('https://s3/a.mp4?Expires=never'))
+        self.assertIsNone(url_expiry(None))
+
+    def test_warm_restart(self):
+        """Test a restarted session loads the videos from the index."""
+        from pyarlo import PyArlo
+
+        filename = os.path.join(self.path, 'media.db')
+
+        with ArloStandInServer(cameras=3, videos=30, days=5) as server:
+            arlo = PyArlo(USERNAME, PASSWORD, days=7, base_url=server.url,
+                          media_index=filename)
+            self.assertEqual(len(arlo.ArloMediaLibrary.videos), 30)
+            self.assertEqual(len(arlo.media_index), 30)
+            self.assertEqual(server.count('/hmsweb/users/library'), 1)
+
+            camera = arlo.cameras[0]
+            since = datetime.today() - timedelta(days=2)
+            videos = arlo.ArloMediaLibrary.query(
+                only_cameras=camera, date_from=since, motion_type='Person')
+            self.assertTrue(videos)
+            for video in videos:
+                self.assertIs(video.camera, camera)
+                self.assertEqual(video.motion_type, 'Person')
+                self.assertGreaterEqual(video.created_at,
+                                        time.mktime(since.timetuple()) * 1000)
+            arlo.media_index.close()
+
+            server.videos.insert(0, dict(
+                server.videos[0], name='new',
+                localCreatedDate=int(time.time() * 1000) + 1000))
+            arlo = PyArlo(USERNAME, PASSWORD, days=7, base_url=server.url,
+                          media_index=filename)
+            self.assertEqual(len(arlo.ArloMediaLibrary.videos), 31)
+            self.assertEqual(arlo.ArloMediaLibrary.videos[0].id, 'new')
+            self.assertEqual(server.count('/hmsweb/users/library'), 2)
+            # only the days since the newest indexed video are requested
+            self.assertEqual(server.library_queries[-1]['dateFrom'],
+                             datetime.fromtimestamp(
+                                 server.videos[1]['localCreatedDate'] / 1000
+                             ).strftime('%Y%m%d'))
+            self.assertEqual(len(arlo.media_index), 31)
+            arlo.media_index.close()
+
+            # a longer window than the index covers is loaded in full
+            arlo = PyArlo(USERNAME, PASSWORD, days=30, base_url=server.url,
+                          media_index=filename)
+            self.assertEqual(len(arlo.ArloMediaLibrary.videos), 31)
+            self.assertEqual(server.count('/hmsweb/users/library'), 3)
+
+            # only the days of the expired presigned URLs are fetched again
+            # before warming, then the days since the watermark
+            expired = server.videos[-1]
+            arlo.media_index.add([dict(
+                expired, presignedContentUrl='https://s3/old.mp4?Expires=1')])
+            arlo.media_index.close()
+            arlo = PyArlo(USERNAME, PASSWORD, days=30, base_url=server.url,
+                          media_index=filename)
+            self.assertEqual(server.count('/hmsweb/users/library'), 5)
+            day = datetime.fromtimestamp(
+                expired['localCreatedDate'] / 1000).strftime('%Y%m%d')
+            self.assertEqual(server.library_queries[-2],
+                             {'dateFrom': day, 'dateTo': day})
+            self.assertEqual(server.library_queries[-1]['dateFrom'],
+                             datetime.today().strftime('%Y%m%d'))
+            self.assertEqual(arlo.media_index.expired(), [])
+            self.assertEqual(len(arlo.ArloMediaLibrary.videos), 31)
+            self.assertEqual(
+                arlo.ArloMediaLibrary.videos[-1].video_url,
+                expired['presignedContentUrl'].replace('{url}', server.url))
+
+            # a shorter window keeps the history of the index
+            oldest = arlo.ArloMediaLibrary.videos[-1].created_at
+            arlo.ArloMediaLibrary.sync(days=2)
+            self.assertLess(len(arlo.ArloMediaLibrary.videos), 31)
+            self.assertEqual(len(arlo.media_index), 31)
+            self.assertEqual(len(arlo.media_index.query(date_to=oldest)), 1)
+            arlo.media_index.close()
+
+    def test_retention(self):
+        """Test the index only keeps retention_days of videos."""
+        from pyarlo.media_index import ArloMediaIndex
+
+        video = load_fixture_json('pyarlo_videos.json')['data'][0]
+        now = int(time.time() * 1000)
+        day = 24 * 3600 * 1000
+
+        index = ArloMediaIndex()
+        index.set_meta('synced_from:', now - 10 * day)
+        index.set_meta('synced_from:48B14C1299999', now - day)
+        index.add([dict(video, name='old', localCreatedDate=now - 5 * day)])
+        self.assertEqual(len(index), 1)
+
+        index.retention_days = 3
+        index.add([dict(video, name='new', localCreatedDate=now)])
+        self.assertEqual([video['name'] for video in index.query()], ['new'])
+        # the account window no longer covers the pruned days
+        self.assertGreater(index.get_meta('synced_from:'), now - 4 * day)
+        self.assertEqual(index.get_meta('synced_from:48B14C1299999'),
+                         now - day)
+        index.close()
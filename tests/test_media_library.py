@@ -1,6 +1,9 @@
 """The tests for the PyArlo Media component."""
+import time
 import unittest
-from tests.common import load_fixture
+from datetime import datetime
+from tests.common import load_fixture, load_fixture_json
+from tests.server import ArloStandInServer
 import requests_mock
 
 from pyarlo.const import (
@@ -45,3 +48,127 @@ class TestArloMediaLibrary(unittest.TestCase):
         camera = arlo.lookup_camera_by_id('48B14C1299999')
         videos = library.load(days=1, limit=3, only_cameras=camera)
         self.assertEqual(len(videos), 2)
+
+    @requests_mock.Mocker()
+    def test_lazy_preload(self, mock):
+        """Test PyArlo lazy preload loads videos on first access."""
+        from pyarlo import PyArlo
+
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+        mock.get(DEVICES_ENDPOINT,
+                 text=load_fixture('pyarlo_devices.json'))
+        mock.post(LIBRARY_ENDPOINT,
+                  text=load_fixture('pyarlo_videos.json'))
+
+        arlo = PyArlo(USERNAME, PASSWORD, preload='lazy', days=1)
+        self.assertEqual(mock.call_count, 1)
+        self.assertFalse(arlo.ArloMediaLibrary.loaded)
+        self.assertIsNone(arlo.ArloMediaLibrary.load_time)
+        self.assertGreaterEqual(arlo.startup_time, 0)
+
+        self.assertEqual(len(arlo.ArloMediaLibrary.videos), 3)
+        self.assertEqual(len(arlo.ArloMediaLibrary.videos), 3)
+        self.assertTrue(arlo.ArloMediaLibrary.loaded)
+        self.assertGreaterEqual(arlo.ArloMediaLibrary.load_time, 0)
+        self.assertEqual(mock.call_count, 3)
+
+    @requests_mock.Mocker()
+    def test_background_preload(self, mock):
+        """Test PyArlo background preload can be awaited."""
+        from pyarlo import PyArlo
+
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+        mock.get(DEVICES_ENDPOINT,
+                 text=load_fixture('pyarlo_devices.json'))
+        mock.post(LIBRARY_ENDPOINT,
+                  text=load_fixture('pyarlo_videos.json'))
+
+        arlo = PyArlo(USERNAME, PASSWORD, preload='background', days=1)
+        self.assertTrue(arlo.ArloMediaLibrary.wait(timeout=5))
+        self.assertEqual(len(arlo.ArloMediaLibrary.videos), 3)
+        self.assertGreaterEqual(arlo.ArloMediaLibrary.load_time, 0)
+
+    def test_background_preload_devices(self):
+        """Test devices read during a background preload are complete."""
+        from pyarlo import PyArlo
+
+        with ArloStandInServer(cameras=2, videos=10, days=1,
+                               latency=0.3) as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload='background', days=1,
+                          base_url=server.url)
+            # builds the devices while the preload thread queries the
+            # library, it then needs the same devices
+            time.sleep(0.1)
+            self.assertEqual(len(arlo.cameras), 2)
+            self.assertEqual(len(arlo.base_stations), 1)
+            self.assertTrue(arlo.ArloMediaLibrary.wait(timeout=10))
+            self.assertEqual(len(arlo.ArloMediaLibrary.videos), 10)
+            self.assertEqual(server.count('/hmsweb/users/devices'), 1)
+
+    @requests_mock.Mocker()
+    def test_sync(self, mock):
+        """Test ArloMediaLibrary.sync() only merges the new videos."""
+        from pyarlo import PyArlo
+        from pyarlo.media import ArloMediaLibrary
+
+        now = int(time.time() * 1000)
+        videos = load_fixture_json('pyarlo_videos.json')['data']
+        for i, video in enumerate(videos):
+            video['localCreatedDate'] = now - (i + 1) * 60000
+            video['name'] = str(video['localCreatedDate'])
+        old = dict(videos[0], localCreatedDate=now - 40 * 86400000,
+                   name='old')
+        requests = []
+
+        def library(request, context):
+            requests.append(request.json())
+            return {'data': list(videos), 'success': True}
+
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+        mock.get(DEVICES_ENDPOINT,
+                 text=load_fixture('pyarlo_devices.json'))
+        mock.post(LIBRARY_ENDPOINT, json=library)
+
+        arlo = PyArlo(USERNAME, PASSWORD, preload=False)
+        library = ArloMediaLibrary(arlo, preload=False)
+        videos.append(old)
+        self.assertEqual(len(library.sync(days=30)), 4)
+        self.assertEqual(library.watermark, (now - 60000, str(now - 60000)))
+        self.assertEqual(library.sync(days=30), [])
+
+        videos.insert(0, dict(videos[0], localCreatedDate=now,
+                              name=str(now)))
+        new = library.sync(days=30)
+        self.assertEqual([video.id for video in new], [str(now)])
+        self.assertEqual(library.watermark, (now, str(now)))
+        # the video out of the 30 days window is dropped
+        self.assertEqual(len(library.videos), 4)
+        self.assertEqual(library.videos[0].id, str(now))
+
+        today = datetime.today().strftime('%Y%m%d')
+        self.assertNotEqual(requests[0]['dateFrom'], today)
+        self.assertEqual(requests[-1]['dateTo'], today)
+        self.assertEqual(
+            requests[-1]['dateFrom'],
+            datetime.fromtimestamp((now - 60000) / 1000).strftime('%Y%m%d'))
+
+        # a different window is loaded again in full
+        self.assertEqual(len(library.sync(days=1)), 5)
+        self.assertEqual(len(requests), 4)
+
+        # so is a different camera filter, not to miss the videos of the
+        # other cameras recorded meanwhile
+        camera = arlo.lookup_camera_by_id('48B14CAAAAAAA')
+        videos.insert(0, dict(videos[0], localCreatedDate=now + 1000,
+                              name='newB', deviceId='48B14C1299999'))
+        videos.insert(0, dict(videos[0], localCreatedDate=now + 2000,
+                              name='newA', deviceId='48B14CAAAAAAA'))
+        synced = library.sync(days=1, only_cameras=[camera])
+        self.assertEqual(synced[0].id, 'newA')
+        self.assertEqual(set(video.camera for video in synced), {camera})
+        self.assertIn('newB', [video.id for video in library.sync(days=1)])
+        self.assertIn('newB', [video.id for video in library.videos])
+        self.assertEqual(len(requests), 6)
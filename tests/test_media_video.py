@@ -38,3 +38,39 @@ class TestArloVideo(unittest.TestCase):
             if video.id == '1498880152142':
                 vstr = '<ArloVideo: Patio'
                 self.assertTrue(video.__repr__().startswith(vstr))
+
+    @requests_mock.Mocker()
+    def test_compact_videos(self, mock):
+        """Test videos keep only their fields and the column view."""
+        from datetime import datetime
+        from pyarlo import PyArlo
+        from pyarlo.media import ArloVideo, ArloVideoColumns
+
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+        mock.get(DEVICES_ENDPOINT, text=load_fixture('pyarlo_devices.json'))
+        mock.post(LIBRARY_ENDPOINT, text=load_fixture('pyarlo_videos.json'))
+
+        arlo = PyArlo(USERNAME, PASSWORD, days=1)
+        video = arlo.ArloMediaLibrary.videos[0]
+        self.assertFalse(hasattr(video, '__dict__'))
+        self.assertEqual(video.id, '1498880152142')
+        self.assertEqual(video.created_at, 1498880152142)
+        self.assertEqual(video.datetime, datetime.fromtimestamp(1498880152))
+        self.assertFalse(video.created_today)
+
+        video = ArloVideo({'localCreatedDate': None}, None, None)
+        self.assertIsNone(video.datetime)
+        self.assertFalse(video.created_today)
+
+        view = arlo.ArloMediaLibrary.load(days=1, columns=True)
+        self.assertIsInstance(view, ArloVideoColumns)
+        self.assertEqual(len(view), 3)
+        self.assertEqual(view.column('id'),
+                         ['1498880152142', '1498879916052', '1498797882209'])
+        self.assertEqual(view[1].id, '1498879916052')
+        self.assertIs(view[1].camera, arlo.ArloMediaLibrary.videos[1].camera)
+        self.assertEqual([item.id for item in view], view.column('id'))
+
+        view = arlo.ArloMediaLibrary.load(days=1, limit=1, columns=True)
+        self.assertEqual(len(view), 1)
@@ -0,0 +1,99 @@
+"""The tests for the PyArlo metrics registry."""
+import unittest
+from tests.common import load_fixture
+import requests_mock
+
+from pyarlo.const import (
+    DEVICES_ENDPOINT, LOGIN_ENDPOINT, NOTIFY_ENDPOINT, RESET_CAM_ENDPOINT,
+    SUBSCRIBE_ENDPOINT)
+
+USERNAME = 'foo'
+PASSWORD = 'bar'
+
+
+class TestArloMetrics(unittest.TestCase):
+    """Tests for ArloMetrics component."""
+
+    def test_endpoint_name(self):
+        """Test urls are mapped to the endpoint constants."""
+        from pyarlo.metrics import ArloMetrics
+
+        metrics = ArloMetrics()
+        self.assertEqual(metrics.endpoint_name(DEVICES_ENDPOINT),
+                         'DEVICES_ENDPOINT')
+        self.assertEqual(
+            metrics.endpoint_name(NOTIFY_ENDPOINT.format('48B14CBBBBBBB')),
+            'NOTIFY_ENDPOINT')
+        self.assertEqual(
+            metrics.endpoint_name(RESET_CAM_ENDPOINT.format('123')),
+            'RESET_CAM_ENDPOINT')
+        self.assertEqual(
+            metrics.endpoint_name(SUBSCRIBE_ENDPOINT + '?token=abc'),
+            'SUBSCRIBE_ENDPOINT')
+        self.assertEqual(metrics.endpoint_name('https://example.com'),
+                         'OTHER')
+        self.assertEqual(
+            metrics.resource_name('cameras/48B14CBBBBBBB/ambientSensors'),
+            'cameras/ambientSensors')
+
+    def test_histogram(self):
+        """Test histogram buckets are cumulative."""
+        from pyarlo.metrics import Histogram
+
+        histogram = Histogram(buckets=(1, 5))
+        for value in (0.5, 2, 3, 10):
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 4)
+        self.assertEqual(snapshot['sum'], 15.5)
+        self.assertEqual(snapshot['max'], 10)
+        self.assertEqual(snapshot['buckets'],
+                         [(1, 1), (5, 3), ('+Inf', 4)])
+
+    def test_events_and_disabled(self):
+        """Test event metrics and disabled registries."""
+        from pyarlo.metrics import ArloMetrics
+
+        metrics = ArloMetrics()
+        metrics.record_event('cameras/48B14CBBBBBBB')
+        metrics.record_event('modes')
+        metrics.record_event_wait('modes', 0.2, True)
+        metrics.record_event_wait('modes', 10, False)
+        stats = metrics.snapshot()
+        self.assertEqual(stats['events']['total'], 2)
+        self.assertEqual(stats['events']['by_resource']['cameras'], 1)
+        self.assertEqual(stats['event_waits']['modes']['timeouts'], 1)
+        self.assertEqual(stats['event_waits']['modes']['wait']['count'], 2)
+
+        metrics = ArloMetrics(enabled=False)
+        metrics.record_event('modes')
+        metrics.incr('devices_cache_hits')
+        self.assertEqual(metrics.snapshot()['events']['total'], 0)
+        self.assertEqual(metrics.snapshot()['counters'], {})
+
+    @requests_mock.Mocker()
+    def test_pyarlo_stats(self, mock):
+        """Test PyArlo.stats() records queries per endpoint."""
+        from pyarlo import PyArlo
+
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+        mock.get(DEVICES_ENDPOINT,
+                 text=load_fixture('pyarlo_devices.json'))
+
+        arlo = PyArlo(USERNAME, PASSWORD, preload=False)
+        arlo.cameras
+        arlo.refresh_attributes('Patio')
+
+        stats = arlo.stats()
+        devices = stats['requests']['DEVICES_ENDPOINT']
+        self.assertEqual(devices['requests'], 1)
+        self.assertEqual(devices['statuses'], {'200': 1})
+        self.assertEqual(devices['bytes'],
+                         len(load_fixture('pyarlo_devices.json')))
+        self.assertEqual(devices['latency']['count'], 1)
+        self.assertEqual(stats['requests']['LOGIN_ENDPOINT']['requests'], 1)
+        self.assertEqual(stats['counters'],
+                         {'devices_cache_misses': 1,
+                          'devices_cache_hits': 1})
+        self.assertEqual(stats['retry_policy']['requests'], 2)
@@ -3,7 +3,7 @@ import unittest
 from functools import partial
 from mock import patch, MagicMock
 from pyarlo import ArloBaseStation, PyArlo
-from tests.common import load_fixture, load_camera_schedule
+from tests.common import load_fixture, load_camera_schedule, load_events
 
 import json
 import requests_mock
@@ -32,6 +32,8 @@ class TestArloBaseStationModes(unittest.TestCase):
 
     @requests_mock.Mocker()
     @patch.object(ArloBaseStation, "publish_and_get_event", load_modes)
+    @patch.object(ArloBaseStation, "publish_and_get_events",
+                  load_events(load_modes, "modes", "schedule"))
     def test_current_mode(self, mock):
         """Test PyArlo BaseStation.mode property for non-scheduled modes."""
         base_station = self.load_base_station(mock)
@@ -40,6 +42,9 @@ class TestArloBaseStationModes(unittest.TestCase):
     @requests_mock.Mocker()
     @patch.object(ArloBaseStation, "publish_and_get_event",
                   partial(load_camera_schedule, active=True))
+    @patch.object(ArloBaseStation, "publish_and_get_events",
+                  load_events(partial(load_camera_schedule, active=True),
+                              "schedule"))
     def test_current_mode_is_scheduled(self, mock):
         """Test PyArlo BaseStation.mode property for scheduled mode."""
         base_station = self.load_base_station(mock)
@@ -56,6 +61,8 @@ class TestArloBaseStationModes(unittest.TestCase):
 
     @requests_mock.Mocker()
     @patch.object(ArloBaseStation, "publish_and_get_event", load_modes)
+    @patch.object(ArloBaseStation, "publish_and_get_events",
+                  load_events(load_modes, "modes", "schedule"))
     def test_available_modes_with_ids(self, mock):
         """Test PyArlo BaseStation.available_modes_with_ids property."""
         base_station = self.load_base_station(mock)
@@ -73,6 +80,8 @@ class TestArloBaseStationModes(unittest.TestCase):
 
     @requests_mock.Mocker()
     @patch.object(ArloBaseStation, "publish_and_get_event", load_modes)
+    @patch.object(ArloBaseStation, "publish_and_get_events",
+                  load_events(load_modes, "modes", "schedule"))
     def test_available_modes(self, mock):
         """Test PyArlo BaseStation.available_modes property."""
         base_station = self.load_base_station(mock)
@@ -84,6 +93,8 @@ class TestArloBaseStationModes(unittest.TestCase):
 
     @requests_mock.Mocker()
     @patch.object(ArloBaseStation, "publish_and_get_event", load_modes)
+    @patch.object(ArloBaseStation, "publish_and_get_events",
+                  load_events(load_modes, "modes", "schedule"))
     @patch.object(ArloBaseStation, "get_ambient_sensor_data", MagicMock())
     def test_set_mode(self, mock):
         """Test PyArlo BaseStation.mode property."""
@@ -93,8 +104,7 @@ class TestArloBaseStationModes(unittest.TestCase):
         base_station = self.load_base_station(mock)
 
         base_station.mode = "Inside"
-        request_number = mock.call_count - 2
-        request = mock.request_history[request_number]
+        request = mock.request_history[-1]
         self.assertEqual(
             "{}://{}{}".format(request.scheme, request.netloc, request.path),
             notify_url
@@ -109,6 +119,8 @@ class TestArloBaseStationModes(unittest.TestCase):
     @requests_mock.Mocker()
     @patch.object(ArloBaseStation, "publish_and_get_event",
                   partial(load_camera_schedule, active=True))
+    @patch.object(ArloBaseStation, "publish_and_get_events",
+                  load_events(load_modes, "modes", "schedule"))
     @patch.object(ArloBaseStation, "get_ambient_sensor_data", MagicMock)
     def test_set_schedule_mode(self, mock):
         """Test PyArlo BaseStation.mode property."""
@@ -118,8 +130,7 @@ class TestArloBaseStationModes(unittest.TestCase):
         base_station = self.load_base_station(mock)
 
         base_station.mode = "schedule"
-        request_number = mock.call_count - 2
-        request = mock.request_history[request_number]
+        request = mock.request_history[-1]
         self.assertEqual(
             "{}://{}{}".format(request.scheme, request.netloc, request.path),
             notify_url
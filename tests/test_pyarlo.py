@@ -1,6 +1,8 @@
 """The tests for the PyArlo platform."""
+import re
 import unittest
 from tests.common import load_fixture
+from tests.server import ArloStandInServer
 import requests_mock
 
 from pyarlo.const import (
@@ -108,3 +110,110 @@ class TestPyArlo(unittest.TestCase):
         self.assertTrue(arlo.is_connected)
         self.assertTrue(arlo.unseen_videos_reset)
         self.assertIsNone(arlo.update())
+
+    @requests_mock.Mocker()
+    def test_connection_pool(self, mock):
+        """Test PyArlo connection pool shared by media downloads."""
+        from pyarlo import PyArlo
+
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+        mock.get(DEVICES_ENDPOINT,
+                 text=load_fixture('pyarlo_devices.json'))
+        mock.post(LIBRARY_ENDPOINT,
+                  text=load_fixture('pyarlo_videos.json'))
+        mock.get(re.compile('amazonaws.com'), content=b'jpeg')
+
+        arlo = PyArlo(USERNAME, PASSWORD, days=1, pool_connections=4,
+                      pool_maxsize=20, keep_alive=False)
+        adapter = arlo.session.adapters['https://']
+        self.assertEqual(adapter.poolmanager.connection_pool_kw['maxsize'],
+                         20)
+        self.assertEqual(len(adapter.poolmanager.pools.keys()), 0)
+        self.assertEqual(arlo.pool_connections, 4)
+        self.assertEqual(arlo.session.headers['Connection'], 'close')
+
+        for video in arlo.ArloMediaLibrary.videos:
+            self.assertEqual(video.download_thumbnail(), b'jpeg')
+        self.assertEqual(mock.request_history[-1].headers['Connection'],
+                         'close')
+
+    @requests_mock.Mocker()
+    def test_query_isolated(self, mock):
+        """Test query() does not share params and headers across calls."""
+        from pyarlo import PyArlo
+
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+        mock.post(LIBRARY_ENDPOINT, text='{}')
+
+        arlo = PyArlo(USERNAME, PASSWORD, preload=False)
+        params = {'dateFrom': '20170701'}
+        arlo.query(LIBRARY_ENDPOINT, method='POST', extra_params=params,
+                   extra_headers={'xCloudId': 'ABC'})
+        arlo.query(LIBRARY_ENDPOINT, method='POST')
+
+        first, second = mock.request_history[-2:]
+        self.assertEqual(first.headers['xCloudId'], 'ABC')
+        self.assertEqual(first.json(), params)
+        self.assertNotIn('xCloudId', second.headers)
+        self.assertEqual(second.json(), {})
+        self.assertEqual(second.headers['Authorization'], arlo.token)
+
+    @requests_mock.Mocker()
+    def test_refresh_attributes_coalesced(self, mock):
+        """Test device refreshes share a single devices query."""
+        import threading
+        from pyarlo import PyArlo
+
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+        mock.get(DEVICES_ENDPOINT,
+                 text=load_fixture('pyarlo_devices.json'))
+
+        arlo = PyArlo(USERNAME, PASSWORD, preload=False)
+        devices = [camera.name for camera in arlo.cameras]
+        devices.append(arlo.base_stations[0].device_id)
+
+        threads = [threading.Thread(target=arlo.refresh_attributes,
+                                    args=(name,)) for name in devices * 5]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for name in devices:
+            self.assertIsNotNone(arlo.refresh_attributes(name))
+        self.assertEqual(
+            arlo.refresh_attributes('48B14CBBBBBBB')['deviceName'],
+            'Arlo Station')
+        self.assertEqual(len([req for req in mock.request_history
+                              if req.url == DEVICES_ENDPOINT]), 1)
+
+        arlo.devices_ttl = 0
+        arlo.refresh_attributes(devices[0])
+        self.assertEqual(len([req for req in mock.request_history
+                              if req.url == DEVICES_ENDPOINT]), 2)
+
+    def test_update_cameras_shares_library(self):
+        """Test update(update_cameras=True) fetches the library once."""
+        from pyarlo import PyArlo
+
+        with ArloStandInServer(cameras=6, videos=60, days=3) as server:
+            arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                          base_url=server.url)
+            arlo.update(update_cameras=True)
+            self.assertEqual(server.count('/hmsweb/users/library'), 1)
+
+            videos = arlo.ArloMediaLibrary.videos
+            self.assertEqual(len(videos), 60)
+            for camera in arlo.cameras:
+                self.assertEqual(len(camera._cached_videos), 10)
+                self.assertIs(camera.last_video, [
+                    video for video in videos
+                    if video.camera is camera][0])
+            self.assertEqual(server.count('/hmsweb/users/library'), 1)
+
+            arlo.update(update_cameras=True)
+            self.assertEqual(server.count('/hmsweb/users/library'), 2)
+            self.assertEqual(len(arlo.ArloMediaLibrary.videos), 60)
@@ -0,0 +1,134 @@
+"""The tests for the PyArlo retry policy."""
+import unittest
+from mock import patch
+from tests.common import load_fixture
+import requests
+import requests_mock
+
+from pyarlo.const import DEVICES_ENDPOINT, LOGIN_ENDPOINT, NOTIFY_ENDPOINT
+
+USERNAME = 'foo'
+PASSWORD = 'bar'
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """Tests for RetryPolicy."""
+
+    def test_backoff(self):
+        """Test exponential backoff with and without jitter."""
+        from pyarlo.retry import RetryPolicy
+
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+        self.assertEqual([policy.backoff(i) for i in range(1, 5)],
+                         [1, 2, 4, 5])
+
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5)
+        for attempt in range(1, 10):
+            self.assertTrue(0 <= policy.backoff(attempt) <= 5)
+
+    def test_retry_after(self):
+        """Test Retry-After parsing."""
+        from pyarlo.retry import RetryPolicy
+
+        policy = RetryPolicy(max_backoff=10, jitter=False)
+        self.assertEqual(policy.backoff(1, retry_after='3'), 3)
+        self.assertEqual(policy.backoff(1, retry_after='120'), 10)
+        self.assertEqual(
+            policy.backoff(1, retry_after='Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+        self.assertIsNone(policy.parse_retry_after('soon'))
+
+        policy = RetryPolicy(respect_retry_after=False, jitter=False)
+        self.assertEqual(policy.backoff(1, retry_after='3'), 0.5)
+
+    def test_is_retryable(self):
+        """Test retryable statuses, errors and methods."""
+        from pyarlo.retry import RetryPolicy
+
+        policy = RetryPolicy()
+        self.assertTrue(policy.is_retryable(503))
+        self.assertTrue(policy.is_retryable(429))
+        self.assertFalse(policy.is_retryable(404))
+        self.assertTrue(policy.is_retryable(error=requests.ConnectionError()))
+        self.assertTrue(policy.is_idempotent('GET'))
+        self.assertFalse(policy.is_idempotent('POST'))
+
+
+class TestPyArloQueryRetry(unittest.TestCase):
+    """Tests for PyArlo.query retry handling."""
+
+    def load_arlo(self, mock, **kwargs):
+        from pyarlo import PyArlo
+
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+        return PyArlo(USERNAME, PASSWORD, preload=False, **kwargs)
+
+    @requests_mock.Mocker()
+    @patch('pyarlo.time.sleep')
+    def test_retry_status(self, mock, mock_sleep):
+        """Test retry on 503 and attempt accounting."""
+        arlo = self.load_arlo(mock)
+        mock.get(DEVICES_ENDPOINT, [
+            {'status_code': 503},
+            {'status_code': 503, 'headers': {'Retry-After': '2'}},
+            {'text': load_fixture('pyarlo_devices.json')}])
+
+        self.assertIsNotNone(arlo.query(DEVICES_ENDPOINT))
+        self.assertEqual(mock_sleep.call_count, 2)
+        self.assertEqual(mock_sleep.call_args[0][0], 2.0)
+        self.assertEqual(arlo.retry_policy.stats,
+                         {'requests': 2, 'attempts': 4,
+                          'retries': 2, 'failures': 0})
+
+    @requests_mock.Mocker()
+    @patch('pyarlo.time.sleep')
+    def test_no_retry_client_error(self, mock, mock_sleep):
+        """Test 4xx responses are not retried."""
+        arlo = self.load_arlo(mock)
+        mock.get(DEVICES_ENDPOINT, status_code=404)
+
+        self.assertIsNone(arlo.query(DEVICES_ENDPOINT))
+        self.assertEqual(mock.call_count, 2)
+        self.assertFalse(mock_sleep.called)
+        self.assertEqual(arlo.retry_policy.stats['failures'], 1)
+
+    @requests_mock.Mocker()
+    @patch('pyarlo.time.sleep')
+    def test_no_retry_post(self, mock, mock_sleep):
+        """Test non idempotent requests are not retried."""
+        arlo = self.load_arlo(mock)
+        url = NOTIFY_ENDPOINT.format('48B14CBBBBBBB')
+        mock.post(url, status_code=503)
+
+        self.assertIsNone(arlo.query(url, method='POST'))
+        self.assertEqual(mock.call_count, 2)
+
+        self.assertIsNone(arlo.query(url, method='POST', idempotent=True,
+                                     retry=2))
+        self.assertEqual(mock.call_count, 5)
+
+    @requests_mock.Mocker()
+    @patch('pyarlo.time.sleep')
+    def test_retry_connection_error(self, mock, mock_sleep):
+        """Test connection errors are retried and reported as None."""
+        arlo = self.load_arlo(mock)
+        mock.get(DEVICES_ENDPOINT, exc=requests.exceptions.ConnectTimeout)
+
+        self.assertIsNone(arlo.query(DEVICES_ENDPOINT, retry=1))
+        self.assertEqual(mock.call_count, 3)
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    @requests_mock.Mocker()
+    @patch('pyarlo.time.sleep')
+    def test_deadline(self, mock, mock_sleep):
+        """Test deadline stops retrying when backoff would exceed it."""
+        from pyarlo.retry import RetryPolicy
+
+        policy = RetryPolicy(backoff_factor=10, jitter=False, deadline=5)
+        arlo = self.load_arlo(mock, retry_policy=policy)
+        mock.get(DEVICES_ENDPOINT, status_code=503)
+
+        self.assertIsNone(arlo.query(DEVICES_ENDPOINT))
+        self.assertEqual(mock.call_count, 2)
+        self.assertFalse(mock_sleep.called)
+        self.assertAlmostEqual(mock.request_history[-1].timeout, 5, places=1)
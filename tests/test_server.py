@@ -0,0 +1,67 @@
+"""The tests for PyArlo against the local stand-in server."""
+import unittest
+
+from tests.server import ArloStandInServer
+
+USERNAME = 'foo'
+PASSWORD = 'bar'
+
+
+class TestStandInServer(unittest.TestCase):
+    """Tests for PyArlo over real HTTP."""
+
+    def setUp(self):
+        """Start the stand-in server."""
+        self.server = ArloStandInServer()
+        self.server.start()
+
+    def tearDown(self):
+        """Stop the stand-in server."""
+        self.server.stop()
+
+    def test_devices_and_library(self):
+        """Test login, devices and library through base_url."""
+        from pyarlo import PyArlo
+
+        arlo = PyArlo(USERNAME, PASSWORD, base_url=self.server.url)
+        self.assertTrue(arlo.is_connected)
+        self.assertEqual(len(arlo.cameras), 2)
+        self.assertEqual(len(arlo.base_stations), 1)
+        self.assertEqual(len(arlo.ArloMediaLibrary.videos), 3)
+        self.assertEqual(self.server.count('/api/auth'), 1)
+
+        video = arlo.ArloMediaLibrary.videos[0]
+        self.assertTrue(video.video_url.startswith(self.server.url))
+        self.assertEqual(video.download_video(), self.server.image)
+
+    def test_publish_and_get_event(self):
+        """Test base station events are received over SSE."""
+        from pyarlo import PyArlo
+
+        arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                      base_url=self.server.url)
+        base = arlo.base_stations[0]
+        self.assertEqual(len(base.get_available_modes()), 4)
+        self.assertEqual(base.mode, 'disarmed')
+
+        base.mode = 'armed'
+        self.assertEqual(self.server.resources['modes']['active'], 'mode1')
+        self.assertEqual(base.mode, 'armed')
+        # the modes state is fetched once and the set applied to it
+        self.assertEqual(self.server.count('/hmsweb/client/subscribe'), 2)
+
+    def test_scale_and_errors(self):
+        """Test scaled devices and injected errors are retried."""
+        from pyarlo import PyArlo
+        from pyarlo.retry import RetryPolicy
+
+        self.server.stop()
+        self.server = ArloStandInServer(cameras=20, videos=500, days=2)
+        self.server.start()
+        self.server.fail_next(2)
+
+        arlo = PyArlo(USERNAME, PASSWORD, days=2, base_url=self.server.url,
+                      retry_policy=RetryPolicy(backoff_factor=0.01))
+        self.assertEqual(len(arlo.cameras), 20)
+        self.assertEqual(len(arlo.ArloMediaLibrary.videos), 500)
+        self.assertEqual(arlo.stats()['retry_policy']['retries'], 2)
@@ -0,0 +1,101 @@
+"""The tests for the PyArlo token cache."""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from tests.common import load_fixture
+import requests_mock
+
+from pyarlo.const import DEVICES_ENDPOINT, LOGIN_ENDPOINT
+
+USERNAME = 'foo'
+PASSWORD = 'bar'
+USERID = '999-123456'
+
+
+class TestArloTokenCache(unittest.TestCase):
+    """Tests for ArloTokenCache component."""
+
+    def setUp(self):
+        """Create a temporary cache directory."""
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove the temporary cache directory."""
+        shutil.rmtree(self.path)
+
+    def login_count(self, mock):
+        """Return the number of requests sent to the login endpoint."""
+        return len([req for req in mock.request_history
+                    if req.url == LOGIN_ENDPOINT])
+
+    def test_save_and_load(self):
+        """Test the cache is encrypted and keyed by account."""
+        from pyarlo.token_cache import ArloTokenCache
+
+        cache = ArloTokenCache(self.path)
+        session = {'token': 'secret-token', 'expires': time.time() + 3600}
+        self.assertTrue(cache.save(USERNAME, PASSWORD, session))
+
+        files = os.listdir(self.path)
+        self.assertEqual(len(files), 1)
+        self.assertNotIn(USERNAME, files[0])
+        with open(os.path.join(self.path, files[0]), 'rb') as data:
+            self.assertNotIn(b'secret-token', data.read())
+
+        self.assertEqual(cache.load(USERNAME, PASSWORD), session)
+        self.assertIsNone(cache.load(USERNAME, 'wrong'))
+        self.assertIsNone(cache.load('other', PASSWORD))
+
+        cache.clear(USERNAME)
+        self.assertIsNone(cache.load(USERNAME, PASSWORD))
+
+    def test_expired(self):
+        """Test expired tokens are not returned."""
+        from pyarlo.token_cache import ArloTokenCache
+
+        cache = ArloTokenCache(self.path, margin=60)
+        cache.save(USERNAME, PASSWORD,
+                   {'token': 'token', 'expires': time.time() + 30})
+        self.assertIsNone(cache.load(USERNAME, PASSWORD))
+
+    @requests_mock.Mocker()
+    def test_login_reuses_token(self, mock):
+        """Test PyArlo skips login with a cached token."""
+        from pyarlo import PyArlo
+
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+
+        arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                      token_cache=self.path)
+        self.assertEqual(self.login_count(mock), 1)
+        arlo.update()
+        self.assertEqual(self.login_count(mock), 1)
+
+        arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                      token_cache=self.path)
+        self.assertEqual(self.login_count(mock), 1)
+        self.assertEqual(arlo.userid, USERID)
+        self.assertEqual(arlo.token, '999999999999')
+        self.assertTrue(arlo.is_connected)
+
+    @requests_mock.Mocker()
+    def test_login_again_on_401(self, mock):
+        """Test PyArlo authenticates again when the token is rejected."""
+        from pyarlo import PyArlo
+
+        mock.post(LOGIN_ENDPOINT,
+                  text=load_fixture('pyarlo_authentication.json'))
+        mock.get(DEVICES_ENDPOINT, [
+            {'status_code': 401},
+            {'text': load_fixture('pyarlo_devices.json')}])
+
+        arlo = PyArlo(USERNAME, PASSWORD, preload=False,
+                      token_cache=self.path)
+        self.assertEqual(len(arlo.cameras), 2)
+        self.assertEqual(self.login_count(mock), 2)
+        self.assertEqual(
+            mock.request_history[-1].headers['Authorization'],
+            '999999999999')
@@ -58,3 +58,24 @@ class TestPyarloUtils(unittest.TestCase):
 
         self.assertIsInstance(http_stream(DEVICES_ENDPOINT),
                               types.GeneratorType)
+
+    def test_http_get_with_session(self):
+        """Test http_get reusing a pooled session."""
+        from pyarlo.utils import http_get
+
+        session = mock.MagicMock()
+        session.get.return_value.status_code = 200
+        session.get.return_value.content = b'data'
+        self.assertEqual(http_get(DEVICES_ENDPOINT, session=session), b'data')
+        session.get.assert_called_once_with(DEVICES_ENDPOINT)
+
+    def test_http_stream_with_session(self):
+        """Test http_stream reusing a pooled session."""
+        from pyarlo.utils import http_stream
+
+        session = mock.MagicMock()
+        session.get.return_value.iter_content.return_value = [b'a', b'b']
+        self.assertEqual(
+            list(http_stream(DEVICES_ENDPOINT, chunk=1, session=session)),
+            [b'a', b'b'])
+        session.get.assert_called_once_with(DEVICES_ENDPOINT, stream=True)